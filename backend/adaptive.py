@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+
+
+MODE = 'adaptive'
+
+
+class AdaptiveSchedule:
+    """按页面实际的变化频率调整抓取间隔的调度方式。
+
+    results 里每条成功结果都是一次内容变化（内容不变时不写结果），把这些时间看作泊松过程，
+    变化率的估计为 观察到的变化次数 / 从第一条结果到现在的时长；抓取间隔取平均变化间隔的
+    sampling 倍，限制在 [min_minutes, max_minutes] 内。长期不变的页面间隔随时间自然拉长，
+    连续失败的执行（按 runs 计，成功即清零）再按 error_backoff 的幂次退避。
+    """
+
+    def __init__(self, min_minutes, max_minutes, sampling=0.5, error_backoff=2.0):
+        if min_minutes < 1:
+            raise ValueError("min_minutes 不能小于 1")
+        if max_minutes < min_minutes:
+            raise ValueError("max_minutes 不能小于 min_minutes")
+        if sampling <= 0:
+            raise ValueError("sampling 必须大于 0")
+        if error_backoff < 1:
+            raise ValueError("error_backoff 不能小于 1")
+        self.min_minutes = min_minutes
+        self.max_minutes = max_minutes
+        self.sampling = sampling
+        self.error_backoff = error_backoff
+
+    @classmethod
+    def from_schedule(cls, schedule_data, defaults):
+        """schedule 为 {"mode": "adaptive", "min_minutes": .., "max_minutes": ..}，不是自适应时返回 None。
+
+        defaults 为未写字段的默认值。
+        """
+        if not isinstance(schedule_data, dict) or schedule_data.get('mode') != MODE:
+            return None
+        merged = dict(defaults)
+        merged.update({k: v for k, v in schedule_data.items() if k in defaults and v is not None})
+        try:
+            values = {key: float(value) for key, value in merged.items()}
+        except (TypeError, ValueError):
+            raise ValueError("自适应调度的参数必须是数字")
+        return cls(**values)
+
+    @property
+    def min_seconds(self):
+        return self.min_minutes * 60
+
+    @property
+    def max_seconds(self):
+        return self.max_minutes * 60
+
+    def clamp(self, seconds):
+        return max(self.min_seconds, min(self.max_seconds, seconds))
+
+    def interval(self, change_times, errors, now):
+        """change_times 为成功结果的时间戳（升序），errors 为最近连续失败的执行数，返回下次抓取的间隔（秒）。"""
+        mean = mean_change_interval(change_times, now)
+        seconds = self.min_seconds if mean is None else self.clamp(mean * self.sampling)
+        if errors:
+            seconds = self.clamp(seconds * self.error_backoff ** errors)
+        return seconds
+
+
+def mean_change_interval(change_times, now):
+    # 观察区间包括最后一次变化到现在这段还没有变化的时间；没有结果时返回 None
+    if not change_times:
+        return None
+    changes = max(len(change_times) - 1, 1)
+    return max(now - change_times[0], 0.0) / changes
+
+
+def parse_timestamp(value):
+    # results.timestamp 是 SQLite CURRENT_TIMESTAMP 写入的 UTC 时间
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+def change_times(rows):
+    """rows 为最近的 (timestamp, error)，返回成功结果（即内容变化）的时间戳，升序。"""
+    times = []
+    for timestamp, error in rows:
+        if error:
+            continue
+        try:
+            times.append(parse_timestamp(timestamp))
+        except (TypeError, ValueError):
+            continue
+    times.sort()
+    return times
+
+
+def error_streak(failed, previous_statuses):
+    """本次执行之前的执行状态从新到旧，返回包括本次在内最近连续失败的次数。
+
+    内容没变化的执行不写 results，所以要按 runs 的状态计算；任何一次成功都会结束连续失败。
+    """
+    if not failed:
+        return 0
+    streak = 1
+    for status in previous_statuses:
+        if status != 'failed':
+            break
+        streak += 1
+    return streak
@@ -1,18 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import asyncio
-from playwright.sync_api import sync_playwright
 import json
-import sqlite3
 from datetime import datetime
 from .scheduler import ScraperScheduler
-import subprocess
-import sys
-import os
-import time
-from fastapi.responses import Response
+from .resource_policy import ResourcePolicy
+from . import locators
+from . import bulk
+from .events import format_sse
+from . import pagination
+from . import config as app_config
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 app = FastAPI()
 scheduler = ScraperScheduler()
@@ -29,8 +29,50 @@ app.add_middleware(
 class ScrapeConfig(BaseModel):
     url: str
     selector: str
-    schedule: dict  # 修改为schedule字段，包含days和time
+    schedule: dict  # 修改为schedule字段，包含days和time；{"mode": "adaptive", "min_minutes", "max_minutes"} 为自适应调度
     custom_prompt: str = ""  # 添加自定义提示词字段，默认为空字符串
+    ignore_selectors: List[str] = []  # 计算内容变化时忽略的元素，例如广告位、时间戳
+    summary_mode: str = "full"  # full: 总结整个片段；delta: 只总结变化部分
+    retention_keep_last: Optional[int] = None  # 保留最近 N 条结果，为空时使用全局默认值
+    retention_days: Optional[int] = None  # 保留最近 D 天的结果，为空时使用全局默认值
+    needs_js: bool = False  # 页面需要执行 JS 才能拿到目标元素时直接使用浏览器
+    resource_policy: Optional[dict] = None  # 浏览器资源拦截策略，为空时使用全局默认值
+    selector_candidates: Optional[List[dict]] = None  # 选择器记录的候选选择器，主选择器失效时依次尝试
+
+class RetentionConfig(BaseModel):
+    keep_last: Optional[int] = None
+    days: Optional[int] = None
+
+class FetchConfig(BaseModel):
+    needs_js: Optional[bool] = None
+    fetch_tier: Optional[str] = None  # auto / http / browser
+
+FETCH_TIERS = ('auto', 'http', 'browser')
+
+def validate_selector_candidates(candidates):
+    if not candidates:
+        return None
+    try:
+        return json.dumps(locators.parse_candidates(candidates), ensure_ascii=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid selector_candidates: {str(e)}")
+
+def validate_schedule(schedule):
+    try:
+        scheduler.adaptive_schedule(schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid schedule: {str(e)}")
+    return json.dumps(schedule)
+
+def validate_resource_policy(policy):
+    # 只校验，保存时仍保存任务自己写的字段，未写的字段跟随全局默认值
+    if policy is None:
+        return None
+    try:
+        ResourcePolicy.from_dict(policy, scheduler.default_resource_policy)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid resource_policy: {str(e)}")
+    return json.dumps(policy)
 
 class TaskResult(BaseModel):
     id: int
@@ -40,134 +82,253 @@ class TaskResult(BaseModel):
 # 存储爬虫配置
 scrape_configs = []
 
-def write_selector_info(data):
-    max_retries = 3
-    for i in range(max_retries):
-        try:
-            with open('selector_info.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f)
-            return True
-        except Exception as e:
-            if i == max_retries - 1:
-                print(f"写入失败: {str(e)}")
-                return False
-            time.sleep(0.5)
-
-def read_selector_info():
-    max_retries = 3
-    for i in range(max_retries):
-        try:
-            with open('selector_info.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            try:
-                os.remove('selector_info.json')
-            except:
-                pass
-            return data
-        except FileNotFoundError:
-            return None
-        except Exception as e:
-            if i == max_retries - 1:
-                print(f"读取失败: {str(e)}")
-                return None
-            time.sleep(0.5)
-
 def get_db():
-    conn = sqlite3.connect('scraper.db')
-    try:
-        yield conn
-    finally:
-        conn.close()
+    # 从调度器的连接池借用连接，with 结束时归还
+    return scheduler.db.connection()
 
 @app.post("/add_scrape_task")
 async def add_scrape_task(config: ScrapeConfig):
-    with next(get_db()) as conn:
+    with get_db() as conn:
         c = conn.cursor()
-        c.execute('''INSERT INTO tasks (url, selector, schedule, active)
-                    VALUES (?, ?, ?, 1)''', 
-                    (config.url, config.selector, json.dumps(config.schedule)))
+        if config.summary_mode not in ('full', 'delta'):
+            raise HTTPException(status_code=400, detail="summary_mode must be 'full' or 'delta'")
+        resource_policy = validate_resource_policy(config.resource_policy)
+        selector_candidates = validate_selector_candidates(config.selector_candidates)
+        schedule = validate_schedule(config.schedule)
+        c.execute('''INSERT INTO tasks (url, selector, schedule, active, ignore_selectors, summary_mode,
+                                        retention_keep_last, retention_days, needs_js, resource_policy,
+                                        selector_candidates)
+                    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)''', 
+                    (config.url, config.selector, schedule,
+                     json.dumps(config.ignore_selectors), config.summary_mode,
+                     config.retention_keep_last, config.retention_days, int(config.needs_js),
+                     resource_policy, selector_candidates))
         task_id = c.lastrowid
         
         if config.custom_prompt:
             c.execute('''INSERT INTO prompts (task_id, custom_prompt)
                         VALUES (?, ?)''', (task_id, config.custom_prompt))
-            scheduler.set_custom_prompt(task_id, config.custom_prompt)
         
         conn.commit()
-        scheduler.add_task(task_id, config.url, config.selector, json.dumps(config.schedule))
-        return {"status": "success", "task_id": task_id}
+        run_id = scheduler.add_task(task_id, config.url, config.selector, schedule)
+        scheduler.events.publish('task', action='created', task_id=task_id)
+        return {"status": "success", "task_id": task_id, "run_id": run_id}
+
+TASK_FIELDS = ('url', 'selector', 'schedule', 'active', 'ignore_selectors', 'summary_mode',
+               'needs_js', 'fetch_tier', 'resource_policy', 'selector_candidates', 'selector_resolved',
+               'next_run_at', 'interval_seconds', 'version', 'updated_at')
+# 调度器每个周期都会改写的列，不影响任务的 version
+SCHEDULE_FIELDS = ('next_run_at', 'interval_seconds')
+RESULT_FIELDS = ('timestamp', 'summary', 'error', 'is_new', 'content_hash', 'content')
+# content 需要解压原始 HTML，默认不返回
+DEFAULT_RESULT_FIELDS = ('timestamp', 'summary', 'error', 'is_new')
+
+def parse_fields(fields, allowed, default):
+    try:
+        return pagination.select_fields(fields, allowed, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def parse_cursor(cursor, size):
+    try:
+        return pagination.decode_cursor(cursor, size)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def tasks_version(c, fields=()):
+    # 任务增删改和结果变化都会改变这三个值中的至少一个（id 自增不复用）
+    c.execute('SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(version), 0), MAX(updated_at) FROM tasks')
+    count, max_id, versions, updated_at = c.fetchone()
+    version = (count, max_id, versions)
+    if any(field in SCHEDULE_FIELDS for field in fields):
+        # 调度列不改 version，只有请求了它们时才计入 ETag
+        c.execute('SELECT TOTAL(next_run_at), TOTAL(interval_seconds) FROM tasks')
+        version += tuple(c.fetchone())
+    return version, updated_at
+
+def cached_json(request, etag, last_modified, build):
+    if pagination.is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=pagination.cache_headers(etag, last_modified))
+    content, next_cursor = build()
+    return JSONResponse(content, headers=pagination.cache_headers(etag, last_modified, next_cursor))
+
+def task_row(row, fields):
+    task = {"id": row['id']}
+    for field in fields:
+        value = row[field]
+        if field in ('active', 'needs_js'):
+            value = bool(value)
+        elif field == 'ignore_selectors':
+            value = json.loads(value or '[]')
+        elif field in ('resource_policy', 'selector_candidates'):
+            value = json.loads(value) if value else None
+        task[field] = value
+    return task
 
 @app.get("/tasks")
-async def get_tasks():
-    with next(get_db()) as conn:
+def get_tasks(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None,
+              fields: Optional[str] = None):
+    # 按 id 分页，下一页的游标放在 X-Next-Cursor 响应头里
+    fields = parse_fields(fields, TASK_FIELDS, TASK_FIELDS)
+    after = parse_cursor(cursor, 1)
+    limit = pagination.clamp_limit(limit)
+    with get_db() as conn:
         c = conn.cursor()
-        c.execute('SELECT id, url, selector, schedule, active FROM tasks')
-        return [{
-            "id": row[0],
-            "url": row[1],
-            "selector": row[2],
-            "schedule": row[3],
-            "active": bool(row[4])
-        } for row in c.fetchall()]
+        version, updated_at = tasks_version(c, fields)
+        etag = pagination.make_etag('tasks', version, cursor, limit, fields)
 
-@app.get("/task_results/{task_id}")
-async def get_task_results(task_id: int):
-    with next(get_db()) as conn:
+        def build():
+            c.execute(f'''SELECT id, {", ".join(fields) if fields else "id"} FROM tasks
+                        WHERE id > ? ORDER BY id LIMIT ?''', (after[0] if after else 0, limit + 1))
+            rows = c.fetchall()
+            next_cursor = pagination.encode_cursor(rows[limit - 1]['id']) if len(rows) > limit else None
+            return [task_row(row, fields) for row in rows[:limit]], next_cursor
+
+        return cached_json(request, etag, updated_at, build)
+
+@app.get("/api/tasks/unread")
+def get_unread_counts(request: Request):
+    # 所有任务的未读结果数，代替逐个任务查询
+    with get_db() as conn:
+        c = conn.cursor()
+        version, updated_at = tasks_version(c)
+        etag = pagination.make_etag('unread', version)
+
+        def build():
+            c.execute('SELECT task_id, COUNT(*) FROM results WHERE is_new = 1 GROUP BY task_id')
+            return {str(task_id): count for task_id, count in c.fetchall()}, None
+
+        return cached_json(request, etag, updated_at, build)
+
+def query_results(c, task_id, fields, after, limit, only_new=False):
+    # 按 (timestamp, id) 倒序做键集分页，走 (task_id, timestamp) 索引，不需要 OFFSET
+    columns = ['r.id', 'r.timestamp'] + [f'r.{field}' for field in fields
+                                         if field not in ('timestamp', 'content')]
+    joins = ''
+    if 'content' in fields:
+        columns += ['r.content', 'b.codec', 'b.data']
+        joins = 'LEFT JOIN blobs b ON b.digest = r.blob_digest'
+    query = f'SELECT {", ".join(columns)} FROM results r {joins} WHERE r.task_id = ?'
+    params = [task_id]
+    if only_new:
+        query += ' AND r.is_new = 1'
+    if after:
+        query += ' AND (r.timestamp, r.id) < (?, ?)'
+        params += after
+    c.execute(query + ' ORDER BY r.timestamp DESC, r.id DESC LIMIT ?', (*params, limit + 1))
+    rows = c.fetchall()
+
+    results = []
+    for row in rows[:limit]:
+        result = {"id": row['id']}
+        for field in fields:
+            if field == 'content':
+                result['content'] = row['content'] if row['content'] is not None or row['codec'] is None \
+                    else scheduler.blobs.decode(row['codec'], row['data'])
+            elif field == 'is_new':
+                result['is_new'] = bool(row['is_new'])
+            else:
+                result[field] = row[field]
+        results.append(result)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = pagination.encode_cursor(last['timestamp'], last['id'])
+    return results, next_cursor
+
+@app.get("/api/tasks/{task_id}/results")
+def get_results_page(task_id: int, request: Request, cursor: Optional[str] = None,
+                     limit: Optional[int] = None, fields: Optional[str] = None, only_new: bool = False):
+    fields = parse_fields(fields, RESULT_FIELDS, DEFAULT_RESULT_FIELDS)
+    after = parse_cursor(cursor, 2)
+    limit = pagination.clamp_limit(limit)
+    with get_db() as conn:
         c = conn.cursor()
-        c.execute('''SELECT summary, timestamp, is_new 
-                    FROM results 
-                    WHERE task_id = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 10''', (task_id,))
-        return [{
-            'summary': row[0], 
-            'timestamp': row[1],
-            'is_new': bool(row[2])
-        } for row in c.fetchall()]
+        c.execute('SELECT version, updated_at FROM tasks WHERE id = ?', (task_id,))
+        task = c.fetchone()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        etag = pagination.make_etag('results', task_id, task['version'], cursor, limit, fields, only_new)
+        return cached_json(request, etag, task['updated_at'],
+                           lambda: query_results(c, task_id, fields, after, limit, only_new))
+
+@app.get("/task_results/{task_id}")
+def get_task_results(task_id: int):
+    # 旧接口：最近 10 条
+    with get_db() as conn:
+        results, _ = query_results(conn.cursor(), task_id, ('summary', 'timestamp', 'is_new'), None, 10)
+        return [{'summary': r['summary'], 'timestamp': r['timestamp'], 'is_new': r['is_new']}
+                for r in results]
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    run = scheduler.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    run['changed'] = bool(run['changed'])
+    return run
 
 @app.delete("/task/{task_id}")
 async def delete_task(task_id: int):
-    with next(get_db()) as conn:
+    with get_db() as conn:
         c = conn.cursor()
         c.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
         c.execute('DELETE FROM results WHERE task_id = ?', (task_id,))
+        c.execute('DELETE FROM runs WHERE task_id = ?', (task_id,))
         conn.commit()
+        scheduler.http_fetcher.forget(task_id)
         scheduler.remove_task(task_id)
+        scheduler.events.publish('task', action='deleted', task_id=task_id)
         return {"status": "success"}
 
+def run_on_engine(coro):
+    # 选择器会话属于引擎循环，在 API 的事件循环里等待它的结果
+    return asyncio.wrap_future(scheduler.engine.run_coroutine(coro))
+
 @app.get("/preview_selector")
-def preview_selector(url: str):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    script_path = os.path.join(current_dir, "selector_script.py")
-    selector_file = os.path.join(current_dir, "selector_info.json")
-    
+async def preview_selector(url: str):
+    # 在常驻浏览器里打开一个选择窗口，结果通过 /events 的 selector 事件或 /picker/{id} 获得
     try:
-        os.remove(selector_file)
-    except FileNotFoundError:
-        pass
-    
-    subprocess.Popen([sys.executable, script_path, url, selector_file])
+        session = await run_on_engine(scheduler.picker.open(url))
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status": "success", "session_id": session.id}
+
+@app.get("/picker/{session_id}")
+async def get_picker_session(session_id: str, wait: float = 0):
+    # wait > 0 时最多等待 wait 秒，会话结束立即返回
+    wait = max(0.0, min(wait, 60.0))
+    session = await run_on_engine(scheduler.picker.wait(session_id, wait) if wait
+                                  else scheduler.picker.get(session_id))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Picker session not found")
+    return session
+
+@app.delete("/picker/{session_id}")
+async def cancel_picker_session(session_id: str):
+    if not await run_on_engine(scheduler.picker.cancel(session_id)):
+        raise HTTPException(status_code=404, detail="Picker session not found")
     return {"status": "success"}
 
 @app.get("/get_selector")
-async def get_selector():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    selector_file = os.path.join(current_dir, "selector_info.json")
-    
-    if not os.path.exists(selector_file):
+async def get_selector(session_id: Optional[str] = None, wait: float = 0):
+    # 旧接口，返回格式与原来的文件轮询一致；不带 session_id 时查询最近的会话
+    wait = max(0.0, min(wait, 60.0))
+    session = await run_on_engine(scheduler.picker.wait(session_id, wait) if wait
+                                  else scheduler.picker.get(session_id))
+    if session is None:
+        if session_id is not None:
+            raise HTTPException(status_code=404, detail="Picker session not found")
         return {"status": "waiting"}
-        
-    try:
-        with open(selector_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        os.remove(selector_file)
-        return {"status": "success", "data": data}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    if session['status'] in ('loading', 'waiting'):
+        return {"status": "waiting"}
+    if session['status'] == 'success':
+        return {"status": "success", "data": session['data']}
+    return {"status": "error", "message": session['error'] or session['status']}
 
 @app.put("/task/{task_id}/toggle")
 async def toggle_task(task_id: int):
-    with next(get_db()) as conn:
+    with get_db() as conn:
         c = conn.cursor()
         c.execute('SELECT active, url, selector, schedule FROM tasks WHERE id = ?', (task_id,))
         result = c.fetchone()
@@ -180,25 +341,247 @@ async def toggle_task(task_id: int):
         c.execute('UPDATE tasks SET active = ? WHERE id = ?', (int(new_active), task_id))
         conn.commit()
         
+        run_id = None
         if new_active:
-            scheduler.add_task(task_id, url, selector, json.dumps(schedule))
+            run_id = scheduler.add_task(task_id, url, selector, schedule)
         else:
             scheduler.remove_task(task_id)
-            
-        return {"status": "success", "active": new_active}
+
+        scheduler.events.publish('task', action='toggled', task_id=task_id, active=new_active)
+        return {"status": "success", "active": new_active, "run_id": run_id}
+
+@app.put("/task/{task_id}/retention")
+async def set_task_retention(task_id: int, retention: RetentionConfig):
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE tasks SET retention_keep_last = ?, retention_days = ? WHERE id = ?',
+                  (retention.keep_last, retention.days, task_id))
+        if c.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Task not found")
+        conn.commit()
+        scheduler.events.publish('task', action='updated', task_id=task_id)
+        return {"status": "success"}
+
+@app.put("/task/{task_id}/fetch")
+async def set_task_fetch(task_id: int, fetch: FetchConfig):
+    if fetch.fetch_tier is not None and fetch.fetch_tier not in FETCH_TIERS:
+        raise HTTPException(status_code=400, detail="fetch_tier must be 'auto', 'http' or 'browser'")
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''UPDATE tasks SET needs_js = COALESCE(?, needs_js), fetch_tier = COALESCE(?, fetch_tier)
+                    WHERE id = ?''',
+                  (None if fetch.needs_js is None else int(fetch.needs_js), fetch.fetch_tier, task_id))
+        if c.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Task not found")
+        conn.commit()
+        scheduler.events.publish('task', action='updated', task_id=task_id)
+        return {"status": "success"}
+
+@app.put("/task/{task_id}/schedule")
+async def set_task_schedule(task_id: int, schedule: dict):
+    # 在固定时间和自适应调度之间切换，或修改上下限；不会立即执行
+    schedule = validate_schedule(schedule)
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('SELECT active, url, selector FROM tasks WHERE id = ?', (task_id,))
+        result = c.fetchone()
+        if not result:
+            raise HTTPException(status_code=404, detail="Task not found")
+        active, url, selector = result
+        c.execute('UPDATE tasks SET schedule = ? WHERE id = ?', (schedule, task_id))
+        conn.commit()
+    if active:
+        scheduler.add_task(task_id, url, selector, schedule, run_now=False)
+    scheduler.events.publish('task', action='updated', task_id=task_id)
+    return {"status": "success"}
+
+@app.put("/task/{task_id}/resource_policy")
+async def set_task_resource_policy(task_id: int, policy: Optional[dict] = None):
+    resource_policy = validate_resource_policy(policy)
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE tasks SET resource_policy = ? WHERE id = ?', (resource_policy, task_id))
+        if c.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Task not found")
+        conn.commit()
+        scheduler.events.publish('task', action='updated', task_id=task_id)
+        return {"status": "success"}
+
+BULK_MEDIA_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+BULK_COLUMNS = ('url', 'selector', 'schedule', 'active', 'ignore_selectors', 'summary_mode',
+                'retention_keep_last', 'retention_days', 'needs_js', 'fetch_tier', 'resource_policy',
+                'selector_candidates')
+
+def bulk_format(format, content_type):
+    # 未指定 format 时按 Content-Type 判断，默认 JSON Lines
+    if format is None:
+        format = 'csv' if 'csv' in (content_type or '') else 'jsonl'
+    if format not in bulk.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+    return format
+
+def insert_tasks(tasks):
+    # 一个事务写入全部任务，返回 (task_ids, 需要注册调度的 [(task_id, url, selector, schedule)])
+    with get_db() as conn:
+        c = conn.cursor()
+        c.executemany(f'''INSERT INTO tasks ({", ".join(BULK_COLUMNS)})
+                        VALUES ({", ".join("?" * len(BULK_COLUMNS))})''',
+                      [[task[column] for column in BULK_COLUMNS] for task in tasks])
+        # 事务持有写锁，AUTOINCREMENT 为这批任务分配的是连续的 id
+        c.execute('SELECT last_insert_rowid()')
+        last_id = c.fetchone()[0]
+        task_ids = list(range(last_id - len(tasks) + 1, last_id + 1))
+        c.executemany('INSERT OR REPLACE INTO prompts (task_id, custom_prompt) VALUES (?, ?)',
+                      [(task_id, task['custom_prompt']) for task_id, task in zip(task_ids, tasks)
+                       if task['custom_prompt']])
+        conn.commit()
+    active = [(task_id, task['url'], task['selector'], task['schedule'])
+              for task_id, task in zip(task_ids, tasks) if task['active']]
+    return task_ids, active
+
+@app.post("/tasks/bulk")
+async def import_tasks(request: Request, format: Optional[str] = None, run_now: bool = True,
+                       warmup_minutes: Optional[float] = None, dry_run: bool = False):
+    """批量导入 JSON Lines 或 CSV，字段与 /add_scrape_task 相同。
+
+    先校验全部行，任何一行无效时整批不写入并返回各行的错误；首次执行在 warmup_minutes 内错开。
+    """
+    format = bulk_format(format, request.headers.get('content-type'))
+    warmup_minutes = app_config.BULK_WARMUP_MINUTES if warmup_minutes is None else warmup_minutes
+    if warmup_minutes < 0:
+        raise HTTPException(status_code=400, detail="warmup_minutes must not be negative")
+    try:
+        text = (await request.body()).decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+
+    def run():
+        records = bulk.parse_records(text, format)
+        if len(records) > app_config.BULK_MAX_TASKS:
+            raise HTTPException(status_code=413,
+                                detail=f"At most {app_config.BULK_MAX_TASKS} tasks per import")
+        tasks = bulk.validate(records, scheduler)
+        if dry_run:
+            return {"status": "success", "valid": len(tasks)}
+        task_ids, active = insert_tasks(tasks)
+        queued = scheduler.add_tasks(active, run_now=run_now, warmup_seconds=warmup_minutes * 60)
+        return {"status": "success", "created": len(task_ids), "queued": queued, "task_ids": task_ids}
+
+    # 校验和写入上万行时不阻塞事件循环
+    try:
+        result = await asyncio.to_thread(run)
+    except bulk.BulkError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "errors": e.errors})
+    if not dry_run and result['created']:
+        scheduler.events.publish('task', action='imported', count=result['created'])
+    return result
+
+@app.get("/tasks/bulk")
+def export_tasks(format: str = 'jsonl'):
+    # 导出全部任务，可以原样再导入；按 id 分批读取，边读边输出
+    format = bulk_format(format, None)
+    columns = ', '.join(f't.{column}' for column in BULK_COLUMNS)
+
+    def stream():
+        if format == 'csv':
+            yield bulk.csv_header()
+        after = 0
+        while True:
+            with get_db() as conn:
+                c = conn.cursor()
+                c.execute(f'''SELECT t.id, {columns}, p.custom_prompt FROM tasks t
+                            LEFT JOIN prompts p ON p.task_id = t.id
+                            WHERE t.id > ? ORDER BY t.id LIMIT 500''', (after,))
+                rows = c.fetchall()
+            if not rows:
+                return
+            after = rows[-1]['id']
+            records = [bulk.export_record(row) for row in rows]
+            yield ''.join(bulk.format_csv(r) if format == 'csv' else bulk.format_jsonl(r) for r in records)
+
+    return StreamingResponse(stream(), media_type=BULK_MEDIA_TYPES[format],
+                             headers={'Content-Disposition': f'attachment; filename="tasks.{format}"'})
+
+@app.post("/compact")
+def compact():
+    return scheduler.compact()
 
 @app.put('/api/tasks/{task_id}/mark_read')
 def mark_results_as_read(task_id: int):
-    with next(get_db()) as conn:
+    with get_db() as conn:
         c = conn.cursor()
         c.execute('UPDATE results SET is_new = 0 WHERE task_id = ? AND is_new = 1', (task_id,))
         conn.commit()
+        scheduler.events.publish('task', action='read', task_id=task_id)
         return {"status": "success"}
 
+@app.get("/events")
+async def events(request: Request):
+    # 推送任务变更、执行进度、新结果和选择器结果；断线重连时按 Last-Event-ID 补发
+    last_event_id = request.headers.get('last-event-id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscription, missed = scheduler.events.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            # 浏览器断线后 3 秒重连
+            yield 'retry: 3000\n\n'
+            for event in missed:
+                yield format_sse(event)
+            while not await request.is_disconnected():
+                event = await subscription.get(app_config.EVENTS_KEEPALIVE_SECONDS)
+                if event is not None:
+                    yield format_sse(event)
+                elif subscription.overflowed:
+                    break
+                else:
+                    yield ': ping\n\n'
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get("/events/stats")
+async def events_stats():
+    return scheduler.events.stats()
+
+@app.get("/browser_pool")
+def browser_pool_stats():
+    return scheduler.browser_stats()
+
+@app.get("/engine")
+async def engine_stats():
+    return scheduler.engine_stats()
+
+@app.get("/workers")
+async def workers():
+    # 心跳里的指标快照只给 /metrics 用
+    workers = scheduler.workers()
+    for worker in workers:
+        if worker['stats']:
+            worker['stats'] = {k: v for k, v in worker['stats'].items() if k not in ('metrics', 'gauges')}
+    return workers
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(scheduler.metrics_text(), media_type='text/plain; version=0.0.4')
+
+@app.get("/llm")
+async def llm_stats():
+    return scheduler.llm_stats()
+
 @app.on_event("startup")
 async def startup_event():
     scheduler.start()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    scheduler.shutdown()
+
 @app.get("/favicon.ico")
 async def favicon():
     return Response(status_code=204)  # 返回"无内容"状态码
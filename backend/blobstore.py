@@ -0,0 +1,67 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def blob_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class BlobStore:
+    """按内容寻址、压缩存储的原始 HTML，相同快照只存一份。
+
+    安装了 zstandard 时用 zstd 压缩，否则用 zlib；读取时按每条记录的 codec 解压。
+    写入与引用它的 results 记录放在同一个事务里，调用方传入游标。
+    """
+
+    def __init__(self, level=None):
+        if zstandard is not None:
+            self.codec = 'zstd'
+            self.level = level or 10
+        else:
+            self.codec = 'zlib'
+            self.level = level or 6
+
+    def _compress(self, data):
+        # zstd 的压缩/解压对象不是线程安全的，每次新建
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, codec, data):
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("读取 zstd 压缩的内容需要安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == 'zlib':
+            return zlib.decompress(data)
+        return data
+
+    def put(self, c, text):
+        digest = blob_digest(text)
+        # 用写语句确认 blob 存在：事务从这里起持有写锁，提交前整理数据库不能把它当作孤立的 blob 删掉
+        c.execute('UPDATE blobs SET size = size WHERE digest = ?', (digest,))
+        if c.rowcount == 0:
+            raw = text.encode('utf-8')
+            c.execute('''INSERT OR IGNORE INTO blobs (digest, codec, data, size)
+                        VALUES (?, ?, ?, ?)''', (digest, self.codec, self._compress(raw), len(raw)))
+        return digest
+
+    def get(self, c, digest):
+        if not digest:
+            return None
+        c.execute('SELECT codec, data FROM blobs WHERE digest = ?', (digest,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        return self._decompress(row[0], row[1]).decode('utf-8')
+
+    def decode(self, codec, data):
+        # 配合 LEFT JOIN blobs 的查询使用，避免逐行再查一次
+        if data is None:
+            return None
+        return self._decompress(codec, data).decode('utf-8')
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from . import metrics
+
+
+class _PooledBrowser:
+    def __init__(self, index):
+        self.index = index
+        self.browser = None
+        self.active = 0
+        self.served = 0
+        self.retiring = False
+
+    def healthy(self):
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """常驻的 Chromium 进程池，每次抓取从池中领取一个全新的 BrowserContext。
+
+    必须在同一个事件循环中使用。
+    """
+
+    def __init__(self, size=2, max_contexts_per_browser=4, max_pages_per_browser=200,
+                 health_interval=30.0, launch_options=None, context_options=None):
+        self.size = max(1, size)
+        self.max_contexts_per_browser = max(1, max_contexts_per_browser)
+        self.max_pages_per_browser = max(1, max_pages_per_browser)
+        self.health_interval = health_interval
+        self.launch_options = launch_options or {'headless': True}
+        self.context_options = context_options or {}
+
+        self._slots = [_PooledBrowser(i) for i in range(self.size)]
+        self._playwright = None
+        self._start_lock = None
+        self._lock = None
+        self._available = None
+        self._health_task = None
+        self._started = False
+
+        # 指标
+        self.restarts = 0
+        self.recycles = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+        self._checkout_samples = deque(maxlen=1000)
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._lock = asyncio.Lock()
+            self._available = asyncio.Semaphore(self.size * self.max_contexts_per_browser)
+            self._playwright = await async_playwright().start()
+            try:
+                for slot in self._slots:
+                    await self._launch(slot)
+            except Exception:
+                for slot in self._slots:
+                    await self._shutdown(slot)
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            if self.health_interval:
+                self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+            self._started = True
+
+    async def close(self):
+        if not self._started:
+            return
+        self._started = False
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for slot in self._slots:
+            await self._shutdown(slot)
+        await self._playwright.stop()
+        self._playwright = None
+
+    async def _launch(self, slot):
+        slot.browser = await self._playwright.chromium.launch(**self.launch_options)
+        slot.served = 0
+        slot.retiring = False
+
+    async def _shutdown(self, slot):
+        browser, slot.browser = slot.browser, None
+        if browser is None:
+            return
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"关闭浏览器失败: {str(e)}")
+
+    async def _restart(self, slot):
+        self.restarts += 1
+        await self._shutdown(slot)
+        await self._launch(slot)
+
+    async def _recycle(self, slot):
+        self.recycles += 1
+        await self._shutdown(slot)
+        await self._launch(slot)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            async with self._lock:
+                for slot in self._slots:
+                    # 只重启空闲且已崩溃的浏览器，正在使用的在归还时处理
+                    if slot.active == 0 and not slot.healthy():
+                        try:
+                            await self._restart(slot)
+                        except Exception as e:
+                            print(f"浏览器重启失败: {str(e)}")
+
+    def _pick(self):
+        candidates = [s for s in self._slots
+                      if not s.retiring and s.active < self.max_contexts_per_browser]
+        if not candidates:
+            candidates = [s for s in self._slots if s.active < self.max_contexts_per_browser]
+        return min(candidates, key=lambda s: s.active)
+
+    @asynccontextmanager
+    async def context(self, **options):
+        if not self._started:
+            await self.start()
+
+        started = time.perf_counter()
+        await self._available.acquire()
+        slot = None
+        try:
+            async with self._lock:
+                picked = self._pick()
+                if not picked.healthy():
+                    await self._restart(picked)
+                picked.active += 1
+                picked.served += 1
+                if picked.served >= self.max_pages_per_browser:
+                    picked.retiring = True
+                slot = picked
+
+            try:
+                context = await slot.browser.new_context(**{**self.context_options, **options})
+            except Exception:
+                self.checkout_failures += 1
+                raise
+
+            self._record_checkout(time.perf_counter() - started)
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        finally:
+            if slot is not None:
+                async with self._lock:
+                    slot.active -= 1
+                    if slot.active == 0:
+                        try:
+                            if not slot.healthy():
+                                await self._restart(slot)
+                            elif slot.retiring:
+                                await self._recycle(slot)
+                        except Exception as e:
+                            print(f"浏览器重启失败: {str(e)}")
+            self._available.release()
+
+    def _record_checkout(self, elapsed):
+        # 包含按需启动和重启浏览器的时间
+        metrics.record('browser_checkout', elapsed)
+        self.checkouts += 1
+        self._checkout_total += elapsed
+        self._checkout_max = max(self._checkout_max, elapsed)
+        self._checkout_samples.append(elapsed)
+
+    def stats(self):
+        samples = sorted(self._checkout_samples)
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+        return {
+            'size': self.size,
+            'browsers_alive': sum(1 for s in self._slots if s.healthy()),
+            'contexts_active': sum(s.active for s in self._slots),
+            'restarts': self.restarts,
+            'recycles': self.recycles,
+            'checkouts': self.checkouts,
+            'checkout_failures': self.checkout_failures,
+            'checkout_avg_ms': (self._checkout_total / self.checkouts * 1000) if self.checkouts else 0.0,
+            'checkout_p50_ms': percentile(0.5) * 1000,
+            'checkout_p99_ms': percentile(0.99) * 1000,
+            'checkout_max_ms': self._checkout_max * 1000,
+        }
@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+
+from . import locators
+from .resource_policy import ResourcePolicy
+
+
+# 导入导出的字段，顺序即 CSV 的列顺序；JSON_FIELDS 在 CSV 里写成 JSON 字符串
+FIELDS = ('url', 'selector', 'schedule', 'active', 'custom_prompt', 'ignore_selectors', 'summary_mode',
+          'retention_keep_last', 'retention_days', 'needs_js', 'fetch_tier', 'resource_policy',
+          'selector_candidates')
+JSON_FIELDS = ('schedule', 'ignore_selectors', 'resource_policy', 'selector_candidates')
+FORMATS = ('jsonl', 'csv')
+SUMMARY_MODES = ('full', 'delta')
+FETCH_TIERS = ('auto', 'http', 'browser')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'off', '')
+
+
+class BulkError(ValueError):
+    """导入内容有误，errors 为 [{"line": 行号, "error": 原因}]，整批都不会写入。"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} 行无效")
+        self.errors = errors
+
+
+def parse_records(text, format):
+    # 返回 [(行号, dict)]；行号从 1 开始，CSV 的表头是第 1 行
+    if format == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        try:
+            unknown = set(reader.fieldnames or ()) - set(FIELDS) - {'id'}
+            if unknown:
+                raise BulkError([{'line': 1, 'error': f"未知的列: {', '.join(sorted(unknown))}"}])
+            return [(reader.line_num, row) for row in reader]
+        except csv.Error as e:
+            raise BulkError([{'line': reader.line_num, 'error': f"不是有效的 CSV: {str(e)}"}])
+    records, errors = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append({'line': number, 'error': f"不是有效的 JSON: {str(e)}"})
+            continue
+        if not isinstance(record, dict):
+            errors.append({'line': number, 'error': "每行必须是一个 JSON 对象"})
+            continue
+        records.append((number, record))
+    if errors:
+        raise BulkError(errors)
+    return records
+
+
+def _json_value(record, field, default=None):
+    # CSV 里的 JSON 字段是字符串，空字符串视为未填
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return default
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ValueError(f"{field} 不是有效的 JSON")
+    return default if value is None else value
+
+
+def _bool(value, default):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value != 0
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False if text else default
+    raise ValueError(f"无法识别的布尔值: {value}")
+
+
+def _optional_int(record, field):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} 必须是整数")
+    if value < 0:
+        raise ValueError(f"{field} 不能为负数")
+    return value
+
+
+def _is_int(value):
+    # bool 是 int 的子类，true/false 不能当作 1/0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{field} 必须是字符串")
+    return value.strip()
+
+
+def validate_cron(schedule):
+    days, hour, minute = schedule.get('days'), schedule.get('hour'), schedule.get('minute')
+    if not isinstance(days, list) or not days or any(not _is_int(d) or not 0 <= d <= 6 for d in days):
+        raise ValueError("schedule.days 必须是 0-6 的非空列表")
+    if not _is_int(hour) or not 0 <= hour <= 23:
+        raise ValueError("schedule.hour 必须是 0-23 的整数")
+    if not _is_int(minute) or not 0 <= minute <= 59:
+        raise ValueError("schedule.minute 必须是 0-59 的整数")
+
+
+def normalize(record, scheduler):
+    """校验一条任务并转换成 tasks 表的取值，无效时抛出 ValueError。"""
+    url = _text(record, 'url')
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError("url 必须以 http:// 或 https:// 开头")
+    selector = _text(record, 'selector')
+    if not selector:
+        raise ValueError("selector 不能为空")
+
+    schedule = _json_value(record, 'schedule')
+    if not isinstance(schedule, dict):
+        raise ValueError("schedule 必须是对象")
+    if scheduler.adaptive_schedule(schedule) is None:
+        validate_cron(schedule)
+
+    ignore_selectors = _json_value(record, 'ignore_selectors', [])
+    if not isinstance(ignore_selectors, list) or not all(isinstance(s, str) for s in ignore_selectors):
+        raise ValueError("ignore_selectors 必须是字符串列表")
+    custom_prompt = record.get('custom_prompt') or ''
+    if not isinstance(custom_prompt, str):
+        raise ValueError("custom_prompt 必须是字符串")
+    summary_mode = _text(record, 'summary_mode') or 'full'
+    if summary_mode not in SUMMARY_MODES:
+        raise ValueError("summary_mode 必须是 full 或 delta")
+    fetch_tier = _text(record, 'fetch_tier') or 'auto'
+    if fetch_tier not in FETCH_TIERS:
+        raise ValueError("fetch_tier 必须是 auto、http 或 browser")
+
+    resource_policy = _json_value(record, 'resource_policy')
+    if resource_policy is not None:
+        if not isinstance(resource_policy, dict):
+            raise ValueError("resource_policy 必须是对象")
+        try:
+            ResourcePolicy.from_dict(resource_policy, scheduler.default_resource_policy)
+        except TypeError as e:
+            raise ValueError(str(e))
+    candidates = locators.parse_candidates(_json_value(record, 'selector_candidates'))
+
+    return {
+        'url': url,
+        'selector': selector,
+        'schedule': json.dumps(schedule),
+        'active': int(_bool(record.get('active'), True)),
+        'custom_prompt': custom_prompt,
+        'ignore_selectors': json.dumps(ignore_selectors),
+        'summary_mode': summary_mode,
+        'retention_keep_last': _optional_int(record, 'retention_keep_last'),
+        'retention_days': _optional_int(record, 'retention_days'),
+        'needs_js': int(_bool(record.get('needs_js'), False)),
+        'fetch_tier': fetch_tier,
+        'resource_policy': json.dumps(resource_policy) if resource_policy is not None else None,
+        'selector_candidates': json.dumps(candidates, ensure_ascii=False) if candidates else None,
+    }
+
+
+def validate(records, scheduler, max_errors=100):
+    # 全部校验完才返回；有任何一行无效时抛出 BulkError，最多带 max_errors 条原因
+    tasks, errors = [], []
+    for number, record in records:
+        try:
+            tasks.append(normalize(record, scheduler))
+        except (TypeError, ValueError) as e:
+            # 嵌套字段类型不对时辅助函数可能抛出 TypeError，同样按该行无效处理
+            errors.append({'line': number, 'error': str(e)})
+            if len(errors) >= max_errors:
+                break
+    if errors:
+        raise BulkError(errors)
+    return tasks
+
+
+def export_record(row):
+    # tasks 表的一行转换成导出格式，JSON 字段还原成对象，可以原样再导入
+    record = {'id': row['id']}
+    for field in FIELDS:
+        value = row[field]
+        if field in JSON_FIELDS:
+            value = json.loads(value) if value else None
+        elif field in ('active', 'needs_js'):
+            value = bool(value)
+        record[field] = value
+    record['custom_prompt'] = record['custom_prompt'] or ''
+    return record
+
+
+def format_jsonl(record):
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_header():
+    return _csv_line(('id',) + FIELDS)
+
+
+def format_csv(record):
+    values = [record['id']]
+    for field in FIELDS:
+        value = record[field]
+        if field in JSON_FIELDS:
+            value = json.dumps(value, ensure_ascii=False) if value is not None else ''
+        elif isinstance(value, bool):
+            value = 'true' if value else 'false'
+        values.append('' if value is None else value)
+    return _csv_line(values)
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
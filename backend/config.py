@@ -0,0 +1,146 @@
+import json
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"环境变量 {name} 不是整数，使用默认值 {default}")
+        return default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"环境变量 {name} 不是数字，使用默认值 {default}")
+        return default
+
+
+def _env_json(name, default):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return json.loads(value)
+    except ValueError:
+        print(f"环境变量 {name} 不是合法的 JSON，使用默认值")
+        return default
+
+
+USER_AGENT = os.environ.get(
+    'OMNI_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+)
+
+# 浏览器池
+BROWSER_POOL_SIZE = _env_int('OMNI_BROWSER_POOL_SIZE', 2)
+BROWSER_MAX_CONTEXTS = _env_int('OMNI_BROWSER_MAX_CONTEXTS', 4)
+BROWSER_MAX_PAGES = _env_int('OMNI_BROWSER_MAX_PAGES', 200)
+BROWSER_HEALTH_INTERVAL = _env_float('OMNI_BROWSER_HEALTH_INTERVAL', 30.0)
+# 等待目标元素出现的上限，所有候选选择器同时等待
+SELECTOR_TIMEOUT = _env_float('OMNI_SELECTOR_TIMEOUT', 10.0)
+# 关闭提前返回时等待 networkidle 的上限，有些页面永远不会空闲
+BROWSER_IDLE_TIMEOUT = _env_float('OMNI_BROWSER_IDLE_TIMEOUT', 15.0)
+
+# 选择器会话：复用一个有头浏览器，每个会话一个窗口
+PICKER_TIMEOUT_SECONDS = _env_float('OMNI_PICKER_TIMEOUT_SECONDS', 300.0)
+PICKER_MAX_SESSIONS = _env_int('OMNI_PICKER_MAX_SESSIONS', 4)
+# 没有会话多久后关闭浏览器
+PICKER_IDLE_CLOSE_SECONDS = _env_float('OMNI_PICKER_IDLE_CLOSE_SECONDS', 600.0)
+
+# 浏览器资源拦截的默认策略
+RESOURCE_BLOCK_TYPES = tuple(
+    t.strip() for t in os.environ.get('OMNI_RESOURCE_BLOCK_TYPES', 'image,font,media').split(',') if t.strip()
+)
+RESOURCE_BLOCK_TRACKERS = _env_int('OMNI_RESOURCE_BLOCK_TRACKERS', 1) != 0
+RESOURCE_EARLY_EXIT = _env_int('OMNI_RESOURCE_EARLY_EXIT', 1) != 0
+
+# 抓取引擎
+ENGINE_CONCURRENCY = _env_int('OMNI_ENGINE_CONCURRENCY', 8)
+ENGINE_PER_DOMAIN = _env_int('OMNI_ENGINE_PER_DOMAIN', 2)
+ENGINE_MAX_PENDING = _env_int('OMNI_ENGINE_MAX_PENDING', 1000)
+# 队列满时定时任务最多等待的秒数，也用作 APScheduler 的 misfire_grace_time
+ENGINE_SUBMIT_TIMEOUT = _env_float('OMNI_ENGINE_SUBMIT_TIMEOUT', 300.0)
+
+# 运行模式：all 在一个进程里调度并执行；api 只调度和提供接口，执行交给 worker；
+# worker 只从队列领取执行（python -m backend.worker）
+MODE = os.environ.get('OMNI_MODE', 'all')
+WORKER_PROCESSES = _env_int('OMNI_WORKER_PROCESSES', 0)  # 0 表示按 CPU 核数
+WORKER_HEARTBEAT_SECONDS = _env_float('OMNI_WORKER_HEARTBEAT_SECONDS', 10.0)
+
+# api 模式下从数据库转发 worker 变更通知的间隔，只在有前端连接时查询
+EVENTS_POLL_SECONDS = _env_float('OMNI_EVENTS_POLL_SECONDS', 1.0)
+# SSE 连接空闲时发送心跳的间隔
+EVENTS_KEEPALIVE_SECONDS = _env_float('OMNI_EVENTS_KEEPALIVE_SECONDS', 15.0)
+
+# 持久化执行队列：轮询间隔、租约时长、进程中断后的最大重试次数
+QUEUE_POLL_SECONDS = _env_float('OMNI_QUEUE_POLL_SECONDS', 2.0)
+QUEUE_LEASE_SECONDS = _env_float('OMNI_QUEUE_LEASE_SECONDS', 300.0)
+QUEUE_MAX_ATTEMPTS = _env_int('OMNI_QUEUE_MAX_ATTEMPTS', 3)
+# 启动时补跑最近多少小时内错过的触发，0 表示不补跑；补跑的执行之间间隔的秒数
+RESTORE_CATCHUP_HOURS = _env_float('OMNI_RESTORE_CATCHUP_HOURS', 6.0)
+RESTORE_STAGGER_SECONDS = _env_float('OMNI_RESTORE_STAGGER_SECONDS', 2.0)
+
+# 按域名限速：每秒令牌数、桶容量，OMNI_POLITENESS_HOSTS 为单独域名的覆盖值，
+# 例如 {"example.com": {"rate": 0.2, "burst": 1}}
+POLITENESS_RATE = _env_float('OMNI_POLITENESS_RATE', 1.0)
+POLITENESS_BURST = _env_float('OMNI_POLITENESS_BURST', 2)
+POLITENESS_HOSTS = _env_json('OMNI_POLITENESS_HOSTS', {})
+# 429/503 时的重试次数；没有 Retry-After 时的等待秒数；Retry-After 超过上限时本次直接失败
+POLITENESS_MAX_RETRIES = _env_int('OMNI_POLITENESS_MAX_RETRIES', 2)
+POLITENESS_DEFAULT_RETRY_AFTER = _env_float('OMNI_POLITENESS_DEFAULT_RETRY_AFTER', 60.0)
+POLITENESS_MAX_RETRY_AFTER = _env_float('OMNI_POLITENESS_MAX_RETRY_AFTER', 900.0)
+# 定时任务在设定时间之后随机推迟的秒数，避免同一分钟的任务同时打到同一个站点
+SCHEDULE_JITTER_SECONDS = _env_int('OMNI_SCHEDULE_JITTER_SECONDS', 60)
+
+# 自适应调度：按 results 里的变化频率调整抓取间隔，任务未写的上下限使用这里的默认值
+ADAPTIVE_MIN_MINUTES = _env_float('OMNI_ADAPTIVE_MIN_MINUTES', 30.0)
+ADAPTIVE_MAX_MINUTES = _env_float('OMNI_ADAPTIVE_MAX_MINUTES', 1440.0)
+# 抓取间隔 = 平均变化间隔 × SAMPLING
+ADAPTIVE_SAMPLING = _env_float('OMNI_ADAPTIVE_SAMPLING', 0.5)
+# 连续出错 n 次时间隔乘以 ERROR_BACKOFF ** n
+ADAPTIVE_ERROR_BACKOFF = _env_float('OMNI_ADAPTIVE_ERROR_BACKOFF', 2.0)
+# 估计变化频率时最多看最近多少条结果
+ADAPTIVE_HISTORY = _env_int('OMNI_ADAPTIVE_HISTORY', 20)
+ADAPTIVE_POLL_SECONDS = _env_float('OMNI_ADAPTIVE_POLL_SECONDS', 30.0)
+
+# 批量导入：单次最多的任务数，以及未指定时首次执行错开的时间窗口（分钟）
+BULK_MAX_TASKS = _env_int('OMNI_BULK_MAX_TASKS', 50000)
+BULK_WARMUP_MINUTES = _env_float('OMNI_BULK_WARMUP_MINUTES', 0.0)
+
+# HTTP 抓取层
+HTTP_TIMEOUT = _env_float('OMNI_HTTP_TIMEOUT', 20.0)
+HTTP_POOL_SIZE = _env_int('OMNI_HTTP_POOL_SIZE', 32)
+HTTP_MAX_BYTES = _env_int('OMNI_HTTP_MAX_BYTES', 5 * 1024 * 1024)
+
+# 大模型
+LLM_ENDPOINT = os.environ.get('OMNI_LLM_ENDPOINT', 'http://172.31.118.255:11434/api/generate')
+LLM_MODEL = os.environ.get('OMNI_LLM_MODEL', 'glm4:latest')
+LLM_TIMEOUT = _env_float('OMNI_LLM_TIMEOUT', 120.0)
+LLM_RETRIES = _env_int('OMNI_LLM_RETRIES', 2)
+LLM_BACKOFF = _env_float('OMNI_LLM_BACKOFF', 1.0)
+LLM_CONCURRENCY = _env_int('OMNI_LLM_CONCURRENCY', 4)
+LLM_POOL_SIZE = _env_int('OMNI_LLM_POOL_SIZE', 8)
+
+# 总结缓存
+SUMMARY_CACHE_MAX_ENTRIES = _env_int('OMNI_SUMMARY_CACHE_MAX_ENTRIES', 10000)
+SUMMARY_CACHE_MAX_AGE_DAYS = _env_int('OMNI_SUMMARY_CACHE_MAX_AGE_DAYS', 30)
+
+# 数据库
+DB_PATH = os.environ.get('OMNI_DB_PATH', 'scraper.db')
+DB_POOL_SIZE = _env_int('OMNI_DB_POOL_SIZE', 8)
+
+# 结果保留与压缩整理
+RETENTION_KEEP_LAST = _env_int('OMNI_RETENTION_KEEP_LAST', 100)
+RETENTION_DAYS = _env_int('OMNI_RETENTION_DAYS', 0)
+RUNS_RETENTION_DAYS = _env_int('OMNI_RUNS_RETENTION_DAYS', 7)
+COMPACTION_INTERVAL_MINUTES = _env_int('OMNI_COMPACTION_INTERVAL_MINUTES', 60)
+COMPACTION_BATCH_SIZE = _env_int('OMNI_COMPACTION_BATCH_SIZE', 500)
@@ -0,0 +1,132 @@
+from difflib import SequenceMatcher
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from .fingerprint import NOISE_TAGS, normalize_text
+
+
+# 列表项、表格行等“条目”级元素，只取不再包含其它条目的最内层
+ITEM_TAGS = ('li', 'tr', 'article', 'p', 'dt', 'dd', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# 修改项：相似度超过该阈值的删除 + 新增视为同一条目的修改
+MODIFIED_RATIO = 0.5
+
+# 每一类变化最多列出的条目数，超出部分只给出数量，避免整页改版时提示词失控
+MAX_ITEMS = 200
+
+
+def _render(element, base_url):
+    # 按文档顺序遍历一次，链接整体输出、不再进入其内部，不必为每个文本节点向上查找 <a>
+    parts = []
+    stack = list(reversed(element.contents))
+    while stack:
+        node = stack.pop()
+        if node.name == 'a':
+            href = node.get('href', '')
+            text = node.get_text(' ', strip=True)
+            if href and text:
+                if base_url:
+                    href = urljoin(base_url, href)
+                parts.append(f'<a href="{href}">{text}</a>')
+        elif node.name is None:
+            text = str(node).strip()
+            if text:
+                parts.append(text)
+        else:
+            stack.extend(reversed(node.contents))
+    return ' '.join(parts)
+
+
+def _innermost(elements):
+    # 每个条目只向上找到最近的条目祖先并标记，比逐个 find 子树快得多
+    containers = set()
+    for element in elements:
+        for parent in element.parents:
+            if parent.name in ITEM_TAGS:
+                containers.add(id(parent))
+                break
+    return [e for e in elements if id(e) not in containers]
+
+
+def extract_items(content, base_url=None, ignore_selectors=None):
+    """把片段拆成条目列表，每项为 (比较用的规范化文本, 展示文本)。"""
+    soup = BeautifulSoup(content or '', 'html.parser')
+    for element in soup.find_all(NOISE_TAGS):
+        element.decompose()
+    for selector in ignore_selectors or ():
+        try:
+            for element in soup.select(selector):
+                element.decompose()
+        except Exception:
+            continue
+
+    elements = _innermost(soup.find_all(ITEM_TAGS))
+    items = []
+    if elements:
+        for element in elements:
+            text = _render(element, base_url)
+            if text:
+                items.append((normalize_text(element.get_text(' ')), text))
+    else:
+        # 没有条目结构时按文本行比较
+        for line in soup.get_text('\n').splitlines():
+            line = line.strip()
+            if line:
+                items.append((normalize_text(line), line))
+    return items
+
+
+def diff_items(old_items, new_items):
+    old_keys = [key for key, _ in old_items]
+    new_keys = [key for key, _ in new_items]
+    delta = {'added': [], 'removed': [], 'modified': []}
+
+    matcher = SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        removed = old_items[i1:i2]
+        added = new_items[j1:j2]
+        if tag == 'replace':
+            # 一一配对相似的条目作为修改，其余算新增/删除
+            pairs = min(len(removed), len(added))
+            for k in range(pairs):
+                old_key, old_text = removed[k]
+                new_key, new_text = added[k]
+                if SequenceMatcher(None, old_key, new_key).ratio() >= MODIFIED_RATIO:
+                    delta['modified'].append((old_text, new_text))
+                else:
+                    delta['removed'].append(old_text)
+                    delta['added'].append(new_text)
+            removed, added = removed[pairs:], added[pairs:]
+        delta['removed'].extend(text for _, text in removed)
+        delta['added'].extend(text for _, text in added)
+    return delta
+
+
+def diff_fragments(old_content, new_content, base_url=None, ignore_selectors=None):
+    return diff_items(extract_items(old_content, base_url, ignore_selectors),
+                      extract_items(new_content, base_url, ignore_selectors))
+
+
+def is_empty(delta):
+    return not (delta['added'] or delta['removed'] or delta['modified'])
+
+
+def format_delta(delta, max_items=MAX_ITEMS):
+    lines = ['以下是页面与上一次抓取相比的变化部分：']
+    for key, title in (('added', '【新增】'), ('removed', '【删除】'), ('modified', '【修改】')):
+        items = delta[key]
+        if not items:
+            continue
+        lines.append(title)
+        for item in items[:max_items]:
+            if key == 'modified':
+                lines.append(f'- 原：{item[0]}')
+                lines.append(f'  现：{item[1]}')
+            else:
+                lines.append(f'- {item}')
+        if len(items) > max_items:
+            lines.append(f'- ……另有 {len(items) - max_items} 条未列出')
+    return '\n'.join(lines)
@@ -0,0 +1,264 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+from . import metrics
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RetryLater(Exception):
+    """handler 抛出后任务重新排队，delay 秒内不再访问该域名；run_id 和 future 保持不变。"""
+
+    def __init__(self, message, delay=0.0):
+        super().__init__(message)
+        self.delay = delay
+
+
+class ScrapeJob:
+    def __init__(self, task_id, url, selector, run_id=None):
+        self.task_id = task_id
+        self.url = url
+        self.selector = selector
+        self.run_id = run_id
+        self.host = urlparse(url).netloc.lower()
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class ScrapeEngine:
+    """单个常驻 asyncio 循环上的并发抓取引擎。
+
+    handler 是 `async def handler(task_id, url, selector, run_id)`。全局并发数和单域名并发数
+    分别限制，待执行任务（排队 + 等待域名 + 执行中）总数超过 max_pending 时 submit 阻塞。
+    传入 limiter（HostLimiter）时按域名限速，限速等待发生在占用全局名额之前。
+    """
+
+    def __init__(self, handler, concurrency=8, per_domain=2, max_pending=1000, limiter=None):
+        self.handler = handler
+        self.limiter = limiter
+        self.concurrency = max(1, concurrency)
+        self.per_domain = max(1, per_domain)
+        self.max_pending = max(1, max_pending)
+
+        if sys.platform == 'win32':
+            self.loop = asyncio.ProactorEventLoop()
+        else:
+            self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='scrape-engine', daemon=True)
+        self._ready = threading.Event()
+
+        self._queue = None
+        self._slots = None
+        self._capacity = threading.BoundedSemaphore(self.max_pending)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._deferred = defaultdict(deque)
+        self._deferred_count = 0
+        self._throttled_count = 0
+        self._domain_active = defaultdict(int)
+        self._dispatcher = None
+
+        # 指标
+        self.running = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.backpressure_waits = 0
+        self.max_queue_depth = 0
+        self._wait_total = 0.0
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._dispatcher = self.loop.create_task(self._dispatch())
+        self._ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+            self._ready.wait()
+
+    def stop(self, timeout=5):
+        if not self._thread.is_alive():
+            return
+        try:
+            self.run_coroutine(self._cancel_all()).result(timeout=timeout)
+        except Exception as e:
+            print(f"取消未完成的抓取失败: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=timeout)
+
+    async def _cancel_all(self):
+        # 停止循环前取消调度协程和执行中的抓取，避免退出时出现未完成任务的警告
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run_coroutine(self, coro):
+        # 在引擎循环里执行任意协程（例如关闭浏览器池），返回 concurrent Future
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args, timeout=5):
+        # 在引擎循环里调用读写循环内部状态的同步函数并等待结果；循环没有启动时直接调用
+        if not self._thread.is_alive():
+            return fn(*args)
+
+        async def call():
+            return fn(*args)
+
+        return self.run_coroutine(call()).result(timeout=timeout)
+
+    def submit(self, task_id, url, selector, run_id=None, block=True, timeout=None):
+        """提交一次抓取，返回 ScrapeJob，job.future 在抓取结束时完成。
+
+        同一任务已在排队或执行时直接返回已有的 job。
+        """
+        with self._pending_lock:
+            existing = self._pending.get(task_id)
+            if existing is not None:
+                self.coalesced += 1
+                return existing
+
+        if not self._capacity.acquire(blocking=False):
+            if not block:
+                self.rejected += 1
+                raise QueueFull(f"待执行任务已达上限 {self.max_pending}")
+            self.backpressure_waits += 1
+            if not self._capacity.acquire(timeout=timeout):
+                self.rejected += 1
+                raise QueueFull(f"等待队列空位超时 ({timeout}s)")
+
+        with self._pending_lock:
+            existing = self._pending.get(task_id)
+            if existing is not None:
+                self._capacity.release()
+                self.coalesced += 1
+                return existing
+            job = ScrapeJob(task_id, url, selector, run_id)
+            self._pending[task_id] = job
+            self.submitted += 1
+
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    async def _dispatch(self):
+        while True:
+            job = await self._queue.get()
+            if self._domain_active[job.host] >= self.per_domain:
+                self._deferred[job.host].append(job)
+                self._deferred_count += 1
+                continue
+            self._domain_active[job.host] += 1
+            if self.limiter is not None and self.limiter.try_acquire(job.host) > 0:
+                # 域名限速中，单独等待，不挡住其他域名的任务
+                self._throttled_count += 1
+                self.loop.create_task(self._resume(job, throttled=True))
+                continue
+            await self._slots.acquire()
+            self._launch(job)
+
+    async def _resume(self, job, throttled=False):
+        if self.limiter is not None:
+            try:
+                await self.limiter.acquire(job.host)
+            finally:
+                if throttled:
+                    self._throttled_count -= 1
+        await self._slots.acquire()
+        self._launch(job)
+
+    def _launch(self, job):
+        depth = self.queue_depth()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        waited = time.monotonic() - job.enqueued_at
+        self._wait_total += waited
+        metrics.REGISTRY.observe('omni_queue_wait_seconds', waited)
+        self.running += 1
+        self.loop.create_task(self._run(job))
+
+    async def _run(self, job):
+        retry = None
+        try:
+            result = await self.handler(job.task_id, job.url, job.selector, job.run_id)
+        except RetryLater as e:
+            retry = e.delay or 0.0
+            self.retried += 1
+            if self.limiter is not None and retry:
+                self.limiter.penalize(job.host, retry)
+                retry = 0.0
+        except Exception as e:
+            self.failed += 1
+            if not job.future.cancelled():
+                job.future.set_exception(e)
+        else:
+            self.completed += 1
+            if not job.future.cancelled():
+                job.future.set_result(result)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            if retry is not None:
+                # 仍占着待执行名额；有限速器时由限速器负责等待
+                job.enqueued_at = time.monotonic()
+                self.loop.call_later(retry, self._queue.put_nowait, job)
+            else:
+                with self._pending_lock:
+                    self._pending.pop(job.task_id, None)
+                self._capacity.release()
+
+            self._domain_active[job.host] -= 1
+            deferred = self._deferred.get(job.host)
+            if deferred:
+                # 同域名的下一个任务预先占住域名名额，再去等全局名额
+                next_job = deferred.popleft()
+                self._deferred_count -= 1
+                self._domain_active[job.host] += 1
+                self.loop.create_task(self._resume(next_job))
+            if not deferred:
+                self._deferred.pop(job.host, None)
+            if not self._domain_active[job.host]:
+                del self._domain_active[job.host]
+
+    def free_capacity(self, prefetch=None):
+        # prefetch 限制最多预取多少个待执行任务，多进程时其余的留给其他 worker
+        limit = self.max_pending if prefetch is None else min(self.max_pending, prefetch)
+        return max(0, limit - len(self._pending))
+
+    def queue_depth(self):
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + self._deferred_count + self._throttled_count
+
+    def stats(self):
+        started = self.completed + self.failed + self.running
+        return {
+            'concurrency': self.concurrency,
+            'per_domain': self.per_domain,
+            'max_pending': self.max_pending,
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'pending': len(self._pending),
+            'running': self.running,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'completed': self.completed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'throttled': self._throttled_count,
+            'backpressure_waits': self.backpressure_waits,
+            'avg_queue_wait_ms': (self._wait_total / started * 1000) if started else 0.0,
+            'active_domains': len(self._domain_active),
+        }
@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    def __init__(self, bus, loop, queue_size):
+        self.bus = bus
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _deliver(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 客户端读得太慢，断开后由它带 Last-Event-ID 重连补齐
+            self.overflowed = True
+            self.bus.unsubscribe(self)
+
+    async def get(self, timeout):
+        # 超时返回 None；溢出后读完已缓冲的事件也返回 None
+        if self.overflowed and self.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """进程内的变更通知。
+
+    scheduler 在任意线程调用 publish，订阅者（SSE 连接）在 API 的事件循环里读取；
+    最近的事件保存在环形缓冲里，断线重连时按 Last-Event-ID 补发。
+    """
+
+    def __init__(self, history=500, queue_size=1000):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # 以启动时间开头，进程重启后事件 id 仍然递增
+        self._ids = itertools.count(int(time.time() * 1000))
+
+        # 指标
+        self.published = 0
+        self.dropped = 0
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, type, **data):
+        with self._lock:
+            event = {'id': next(self._ids), 'type': type, 'time': time.time(), 'data': data}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber._deliver, event)
+            except RuntimeError:
+                # 订阅者所在的循环已经关闭
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """在订阅者自己的事件循环中调用，返回 (Subscription, 需要补发的事件)。"""
+        subscription = Subscription(self, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = [event for event in self._history
+                      if last_event_id is not None and event['id'] > last_event_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                if subscription.overflowed:
+                    self.dropped += 1
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'dropped': self.dropped,
+        }
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
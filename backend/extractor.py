@@ -0,0 +1,117 @@
+import re
+from urllib.parse import urljoin
+
+from lxml import etree
+
+
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'svg'}
+
+# 这些元素的开始和结束都会切分出新的一行
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'ul',
+}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class _TextTarget:
+    # lxml 解析器回调：一次线性遍历，不构建 DOM 树
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.lines = []
+        self._buffer = []
+        self._link = None
+        self._skip_depth = 0
+        self._seen_links = set()
+
+    def _flush(self):
+        if self._buffer:
+            text = _WHITESPACE.sub(' ', ''.join(self._buffer)).strip()
+            self._buffer = []
+            if text:
+                self.lines.append(text)
+
+    def _resolve(self, href):
+        href = href.strip()
+        if not href or href.startswith('#') or href.lower().startswith('javascript:'):
+            return None
+        return urljoin(self.base_url, href) if self.base_url else href
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if self._skip_depth or tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == 'a' and self._link is None:
+            self._flush()
+            self._link = (self._resolve(attrib.get('href', '')), [])
+        elif tag in BLOCK_TAGS and self._link is None:
+            self._flush()
+
+    def end(self, tag):
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag == 'a' and self._link is not None:
+            href, parts = self._link
+            self._link = None
+            text = _WHITESPACE.sub(' ', ''.join(parts)).strip()
+            if not text:
+                return
+            if not href:
+                self.lines.append(text)
+                return
+            # 同一个链接（地址 + 文字）只输出一次
+            if (href, text) in self._seen_links:
+                return
+            self._seen_links.add((href, text))
+            self.lines.append(f'<a href="{href}">{text}</a>')
+        elif tag in BLOCK_TAGS and self._link is None:
+            self._flush()
+
+    def data(self, data):
+        if self._skip_depth:
+            return
+        if self._link is not None:
+            self._link[1].append(data)
+        else:
+            self._buffer.append(data)
+
+    def close(self):
+        self._flush()
+        return self.lines
+
+
+def extract_lines(chunks, base_url=None):
+    """逐块解析 HTML，返回文本行列表；链接输出为 <a href="绝对地址">文字</a>。"""
+    target = _TextTarget(base_url)
+    parser = etree.HTMLParser(target=target, remove_comments=True, no_network=True)
+    fed = False
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+            fed = True
+    if not fed:
+        return []
+    return parser.close()
+
+
+def extract_text(content, base_url=None):
+    return '\n'.join(extract_lines((content,), base_url))
+
+
+def iter_chunks(content, chunk_size=STREAM_CHUNK_SIZE):
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+def extract_text_stream(chunks, base_url=None):
+    # 适用于超大片段：chunks 可以是文件对象或任意字符串迭代器
+    return '\n'.join(extract_lines(chunks, base_url))
@@ -0,0 +1,177 @@
+import asyncio
+
+import aiohttp
+
+from . import metrics
+from .locators import select_first
+
+
+class NeedsBrowser(Exception):
+    """HTTP 层拿不到目标元素（选择器未命中、非 CSS 选择器、非 HTML 响应），需要交给浏览器。"""
+
+
+class FetchError(Exception):
+    """网络错误或非 2xx/304 响应，本次交给浏览器，但不据此判断任务是否需要 JS。"""
+
+    def __init__(self, message, status=None, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class FetchResult:
+    def __init__(self, content=None, not_modified=False, etag=None, last_modified=None, size=0):
+        self.content = content
+        self.not_modified = not_modified
+        self.etag = etag
+        self.last_modified = last_modified
+        self.size = size
+        self.selector = None  # 命中的选择器
+
+
+def select_inner_html(html, selectors):
+    """selectors 为按顺序尝试的选择器列表，返回 (inner_html, 命中的选择器)。
+
+    html 可以是 bytes，此时由解析器按 <meta charset> 等自行判断编码。
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    content, selector = select_first(html, selectors)
+    if selector is None:
+        raise NeedsBrowser("选择器在服务端 HTML 中未命中")
+    if not content.strip():
+        raise NeedsBrowser("服务端 HTML 中目标元素为空")
+    return content, selector
+
+
+class HttpFetcher:
+    """不经过浏览器的抓取层：复用连接池发普通 GET，带 ETag/If-Modified-Since 条件请求。
+
+    必须在同一个事件循环中使用。
+    """
+
+    HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+    def __init__(self, db, timeout=20.0, pool_size=32, max_bytes=5 * 1024 * 1024, user_agent=None):
+        self.db = db
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self.max_bytes = max_bytes
+        self.user_agent = user_agent
+        self._session = None
+
+        # 指标
+        self.requests = 0
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.errors = 0
+        self.bytes_received = 0
+
+    def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            headers = {'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8'}
+            if self.user_agent:
+                headers['User-Agent'] = self.user_agent
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=headers
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # 校验值按任务保存：同一地址被删除后重新添加时不能拿到 304 而没有可比较的内容
+
+    def validators(self, task_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT etag, last_modified FROM http_validators WHERE task_id = ?', (task_id,))
+            row = c.fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def remember(self, task_id, url, etag, last_modified):
+        # 只在结果已经落库之后调用，否则 304 会让这次内容永远得不到处理
+        if not etag and not last_modified:
+            return
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT OR REPLACE INTO http_validators (task_id, url, etag, last_modified, updated_at)
+                        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)''', (task_id, url, etag, last_modified))
+            conn.commit()
+
+    def forget(self, task_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('DELETE FROM http_validators WHERE task_id = ?', (task_id,))
+            conn.commit()
+
+    async def get(self, url, validators=None):
+        session = self._ensure_session()
+        headers = {}
+        if validators:
+            etag, last_modified = validators
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        self.requests += 1
+        try:
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if response.status == 304:
+                    self.not_modified += 1
+                    return FetchResult(not_modified=True, etag=etag, last_modified=last_modified)
+                if response.status >= 400:
+                    self.errors += 1
+                    raise FetchError(f"HTTP {response.status}", response.status, response.headers.copy())
+
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in self.HTML_TYPES:
+                    self.misses += 1
+                    raise NeedsBrowser(f"响应不是 HTML: {content_type}")
+
+                body = await response.content.read(self.max_bytes + 1)
+                self.bytes_received += len(body)
+                if len(body) > self.max_bytes:
+                    self.misses += 1
+                    raise NeedsBrowser(f"响应超过 {self.max_bytes} 字节")
+                html = body.decode(response.charset, errors='replace') if response.charset else body
+                return FetchResult(html, etag=etag, last_modified=last_modified, size=len(body))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            raise FetchError(f"{type(e).__name__}: {str(e)}")
+
+    async def fetch(self, url, selectors, validators=None):
+        with metrics.span('http_request'):
+            result = await self.get(url, validators)
+        metrics.count('http_bytes', result.size)
+        if result.not_modified:
+            return result
+        try:
+            # 解析放到线程池里，避免大页面卡住事件循环
+            with metrics.span('extract'):
+                result.content, result.selector = await asyncio.get_running_loop().run_in_executor(
+                    None, select_inner_html, result.content, selectors
+                )
+        except NeedsBrowser:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return result
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'not_modified': self.not_modified,
+            'misses': self.misses,
+            'errors': self.errors,
+            'bytes_received': self.bytes_received,
+        }
@@ -0,0 +1,84 @@
+import hashlib
+import re
+
+from bs4 import BeautifulSoup, Comment
+
+
+# 每次请求都会变化、与内容无关的属性
+VOLATILE_ATTRS = {
+    'nonce', 'data-nonce', 'csrf', 'data-csrf', 'data-csrf-token', 'data-token',
+    'data-timestamp', 'data-time', 'data-reactid', 'data-react-checksum',
+}
+
+NOISE_TAGS = ('script', 'style', 'noscript', 'template')
+
+# 时间戳：ISO 时间、带日期或“更新于”之类上下文的时刻、相对时间、URL 参数里的 unix 时间戳。
+# 单独出现的时刻和 10/13 位数字可能是营业时间、价格、编号等真实内容，不做屏蔽
+_TIMESTAMP_PATTERNS = [
+    re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?'),
+    re.compile(r'\d{4}[/.年]\d{1,2}[/.月]\d{1,2}日?\s*\d{1,2}:\d{2}(:\d{2})?'),
+    re.compile(r'\b(updated|posted|published|as of|last seen)\s*(at|on)?:?\s*\d{1,2}:\d{2}(:\d{2})?\s*([AaPp][Mm])?',
+               re.IGNORECASE),
+    re.compile(r'(更新|发布|刷新)(时间|于)?[:：]?\s*\d{1,2}:\d{2}(:\d{2})?'),
+    re.compile(r'\d+\s*(秒|分钟|小时|天)前'),
+    re.compile(r'\b\d+\s*(seconds?|secs?|minutes?|mins?|hours?|hrs?)\s+ago\b', re.IGNORECASE),
+    re.compile(r'(?<=[?&])(_|t|ts|time|timestamp)=1[5-9]\d{8}(\d{3})?\b'),  # 防缓存参数（秒/毫秒）
+]
+_WHITESPACE = re.compile(r'\s+')
+
+DIGEST_SIZE = 16
+
+
+def normalize_text(text):
+    for pattern in _TIMESTAMP_PATTERNS:
+        text = pattern.sub('#', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def normalize_fragment(content, ignore_selectors=None):
+    """把 HTML 片段规范化为稳定的文本形式。
+
+    去掉脚本/样式/注释、ignore_selectors 命中的元素、随机属性和时间戳，并折叠空白。
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+
+    for element in soup.find_all(NOISE_TAGS):
+        element.decompose()
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for selector in ignore_selectors or ():
+        try:
+            matches = soup.select(selector)
+        except Exception as e:
+            print(f"忽略选择器无效 {selector}: {str(e)}")
+            continue
+        for element in matches:
+            element.decompose()
+
+    parts = []
+    for element in soup.descendants:
+        if element.name:
+            attrs = []
+            for name in sorted(element.attrs):
+                if name in VOLATILE_ATTRS:
+                    continue
+                value = element.attrs[name]
+                if isinstance(value, list):
+                    value = ' '.join(value)
+                attrs.append(f'{name}={normalize_text(value)}')
+            parts.append(f'<{element.name} {" ".join(attrs)}>' if attrs else f'<{element.name}>')
+        else:
+            text = normalize_text(str(element))
+            if text:
+                parts.append(text)
+    return '\n'.join(parts)
+
+
+def content_digest(content, ignore_selectors=None):
+    normalized = normalize_fragment(content, ignore_selectors)
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def is_digest(value):
+    return isinstance(value, str) and len(value) == DIGEST_SIZE * 2 and \
+        all(ch in '0123456789abcdef' for ch in value)
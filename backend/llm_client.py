@@ -0,0 +1,143 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from . import metrics
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMClient:
+    """Ollama /api/generate 的异步客户端。
+
+    复用一个带连接池的 aiohttp 会话，限制并发请求数，失败时带抖动地指数退避重试。
+    相同的 prompt 同时在途时只请求一次，其余调用等待同一个结果。
+    必须在同一个事件循环中使用。
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, endpoint, model, timeout=120.0, retries=2, backoff=1.0,
+                 concurrency=4, pool_size=8, options=None):
+        self.endpoint = endpoint
+        self.model = model
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.concurrency = max(1, concurrency)
+        self.pool_size = max(1, pool_size)
+        self.options = options or {}
+
+        self._session = None
+        self._semaphore = None
+        self._inflight = {}
+
+        # 指标
+        self.requests = 0
+        self.succeeded = 0
+        self.failures = 0
+        self.retried = 0
+        self.coalesced = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._latency_total = 0.0
+
+    def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def generate(self, prompt):
+        # 合并同一时刻的相同请求
+        pending = self._inflight.get(prompt)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[prompt] = future
+        try:
+            result = await self._generate(prompt)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(prompt, None)
+
+    async def _generate(self, prompt):
+        session = self._ensure_session()
+        payload = {'model': self.model, 'prompt': prompt, 'stream': False}
+        if self.options:
+            payload['options'] = self.options
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                delay = self.backoff * (2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+            started = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    self.requests += 1
+                    async with session.post(self.endpoint, json=payload) as response:
+                        if response.status == 200:
+                            data = await response.json(content_type=None)
+                            self.succeeded += 1
+                            self._latency_total += time.perf_counter() - started
+                            prompt_tokens = data.get('prompt_eval_count', 0) or 0
+                            completion_tokens = data.get('eval_count', 0) or 0
+                            self.prompt_tokens += prompt_tokens
+                            self.completion_tokens += completion_tokens
+                            metrics.count('llm_prompt_tokens', prompt_tokens)
+                            metrics.count('llm_completion_tokens', completion_tokens)
+                            return data.get('response', '')
+                        body = await response.text()
+                        last_error = LLMError(f"HTTP {response.status}: {body[:200]}")
+                        if response.status not in self.RETRY_STATUS:
+                            self.failures += 1
+                            print(f"生成总结失败: {last_error}")
+                            return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = LLMError(f"{type(e).__name__}: {str(e)}")
+
+        self.failures += 1
+        raise last_error
+
+    def stats(self):
+        return {
+            'endpoint': self.endpoint,
+            'model': self.model,
+            'requests': self.requests,
+            'succeeded': self.succeeded,
+            'failures': self.failures,
+            'retried': self.retried,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'avg_latency_ms': (self._latency_total / self.succeeded * 1000) if self.succeeded else 0.0,
+        }
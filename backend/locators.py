@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+
+# 选择器按稳定程度排列：id、data-* 等属性、附近标题文字、结构路径、绝对 XPath
+STRATEGIES = ('id', 'data', 'text', 'path', 'xpath')
+XPATH_PREFIX = 'xpath='
+MAX_CANDIDATES = 8
+
+
+class ElementNotFound(Exception):
+    pass
+
+
+def is_xpath(selector):
+    return selector.startswith(XPATH_PREFIX)
+
+
+def parse_candidates(value):
+    """校验并规范化候选选择器，value 为列表或 JSON 字符串，返回 [{strategy, selector}]。"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError('selector_candidates 必须是列表')
+    candidates, seen = [], set()
+    for item in value:
+        if not isinstance(item, dict) or not isinstance(item.get('selector'), str):
+            raise ValueError('候选选择器格式为 {"strategy": ..., "selector": ...}')
+        selector = item['selector'].strip()
+        strategy = item.get('strategy') or 'path'
+        if strategy not in STRATEGIES:
+            raise ValueError(f'未知的选择器策略: {strategy}')
+        if selector and selector not in seen:
+            seen.add(selector)
+            candidates.append({'strategy': strategy, 'selector': selector})
+    return candidates[:MAX_CANDIDATES]
+
+
+def resolution_order(selector, candidates, resolved=None):
+    """返回按尝试顺序排列的选择器：上次命中的、任务的主选择器、其余候选。"""
+    order = []
+    for item in ([resolved] if resolved else []) + [selector] + [c['selector'] for c in candidates]:
+        if item and item not in order:
+            order.append(item)
+    return order
+
+
+def select_first(html, selectors):
+    """在服务端 HTML 里依次尝试选择器，返回 (inner_html, 命中的选择器)；都未命中返回 (None, None)。"""
+    soup = None
+    tree = None
+    for selector in selectors:
+        if is_xpath(selector):
+            if tree is None:
+                try:
+                    tree = lxml_html.fromstring(html)
+                except (etree.ParserError, ValueError):
+                    tree = False
+            if tree is False:
+                continue
+            try:
+                found = tree.xpath(selector[len(XPATH_PREFIX):])
+            except etree.XPathError:
+                continue
+            element = next((e for e in found if isinstance(e, etree.ElementBase)), None)
+            if element is not None:
+                return _lxml_inner_html(element), selector
+            continue
+        if soup is None:
+            soup = BeautifulSoup(html, 'lxml')
+        try:
+            element = soup.select_one(selector)
+        except Exception:
+            # Playwright 专有语法（text=、:has-text() 等）这里解析不了
+            continue
+        if element is not None:
+            return element.decode_contents(), selector
+    return None, None
+
+
+def _lxml_inner_html(element):
+    parts = [element.text or '']
+    for child in element:
+        parts.append(lxml_html.tostring(child, encoding='unicode'))
+    return ''.join(parts)
+
+
+async def locate(page, selectors, timeout):
+    """在页面里同时等待所有选择器，任意一个出现后按顺序取第一个已存在的，返回 (locator, 选择器)。
+
+    timeout 秒内都没有出现时抛出 ElementNotFound，不会为每个失效的选择器各等一次。
+    """
+    locators = [(page.locator(selector).first, selector) for selector in selectors]
+    waits = [asyncio.ensure_future(locator.wait_for(state='attached', timeout=timeout * 1000))
+             for locator, _ in locators]
+    try:
+        pending = set(waits)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if any(not task.exception() for task in done):
+                break
+    finally:
+        for task in waits:
+            task.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
+    for locator, selector in locators:
+        try:
+            if await locator.count():
+                return locator, selector
+        except Exception:
+            # 语法错误的选择器
+            continue
+    raise ElementNotFound(f"{timeout:g} 秒内没有找到目标元素，已尝试 {len(selectors)} 个选择器")
@@ -0,0 +1,201 @@
+import contextvars
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+# 阶段耗时直方图的桶（秒），覆盖从解析 HTML 到等待大模型的范围
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Registry:
+    """进程内的直方图和计数器，按 Prometheus 文本格式输出。
+
+    snapshot() 的结果可以 JSON 序列化，worker 进程随心跳写入数据库，由 API 进程一起输出。
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'histograms': [[name, dict(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()],
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+            }
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    items = ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+    return '{' + items + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render(snapshots, gauges=()):
+    """snapshots 为 [(公共标签, snapshot)]，gauges 为 [(名称, 标签, 值)]，返回 Prometheus 文本格式。"""
+    histograms, counters = {}, {}
+    for common, snapshot in snapshots:
+        bounds = snapshot['buckets']
+        for name, labels, counts, total, count in snapshot['histograms']:
+            histograms.setdefault(name, []).append(({**common, **labels}, bounds, counts, total, count))
+        for name, labels, value in snapshot['counters']:
+            counters.setdefault(name, []).append(({**common, **labels}, value))
+
+    lines = []
+    for name in sorted(histograms):
+        lines.append(f'# TYPE {name} histogram')
+        for labels, bounds, counts, total, count in histograms[name]:
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{_labels({**labels, "le": _number(float(bound))})} {cumulative}')
+            lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(float(total))}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+    for name in sorted(counters):
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in counters[name]:
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    typed = set()
+    for name, labels, value in gauges:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+_NAME = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+
+def flatten_stats(prefix, stats, labels=None):
+    """把 stats() 返回的字典展开成 gauge，只保留数值，嵌套字典用下划线连接。
+
+    键不是合法指标名的（例如按域名展开的字典）跳过。
+    """
+    gauges = []
+    for key, value in stats.items():
+        if not _NAME.match(str(key)):
+            continue
+        name = f'{prefix}_{key}'
+        if isinstance(value, dict):
+            gauges.extend(flatten_stats(name, value, labels))
+        elif isinstance(value, bool):
+            gauges.append((name, labels or {}, int(value)))
+        elif isinstance(value, (int, float)):
+            gauges.append((name, labels or {}, value))
+    return gauges
+
+
+REGISTRY = Registry()
+
+
+class RunTrace:
+    """一次执行的分阶段耗时和计数，结束后写入 runs.stats。"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.counters = {}
+        self.failed_stage = None
+        self.error_type = None
+
+    def to_dict(self):
+        result = {
+            'total': round(time.perf_counter() - self.started, 4),
+            'spans': {name: round(seconds, 4) for name, seconds in self.spans.items()},
+        }
+        if self.counters:
+            result['counters'] = dict(self.counters)
+        if self.failed_stage:
+            result['failed_stage'] = self.failed_stage
+            result['error_type'] = self.error_type
+        return result
+
+    def fail(self, error):
+        # 执行失败时记录出错的阶段（由 span 标在异常上）和异常类型
+        self.failed_stage = getattr(error, 'omni_stage', None) or 'unknown'
+        self.error_type = type(error).__name__
+
+
+_current = contextvars.ContextVar('omni_run_trace', default=None)
+
+
+def start_trace():
+    # 在执行所在的 asyncio 任务里调用，之后同一任务中的 span()/count() 都记到这次执行上
+    trace = RunTrace()
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(stage):
+    """记录一个阶段的耗时：计入全局直方图，并累加到当前执行（如果有）。"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        # 阶段可以嵌套，只记录最内层失败的阶段
+        if getattr(e, 'omni_stage', None) is None:
+            try:
+                e.omni_stage = stage
+            except AttributeError:
+                pass
+            REGISTRY.inc('omni_stage_errors_total', stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def record(stage, seconds):
+    # 已经量好的耗时，例如浏览器池自己统计的领取时间
+    REGISTRY.observe('omni_stage_seconds', seconds, stage=stage)
+    trace = _current.get()
+    if trace is not None:
+        trace.spans[stage] = trace.spans.get(stage, 0.0) + seconds
+
+
+def count(name, value=1, **labels):
+    REGISTRY.inc(f'omni_{name}_total', value, **labels)
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + value
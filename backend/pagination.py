@@ -0,0 +1,85 @@
+import base64
+import hashlib
+import json
+from email.utils import formatdate, parsedate_to_datetime
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit):
+    if limit is None:
+        return DEFAULT_LIMIT
+    return max(1, min(MAX_LIMIT, limit))
+
+
+def encode_cursor(*values):
+    # 游标是上一页最后一行的排序键，对客户端不透明
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor('无效的游标')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('无效的游标')
+    return values
+
+
+def select_fields(requested, allowed, default):
+    """解析 fields=a,b,c，返回按 allowed 顺序排列的字段；为空时使用 default。"""
+    if not requested:
+        return list(default)
+    names = {name.strip() for name in requested.split(',') if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise ValueError(f"未知的字段: {', '.join(sorted(unknown))}")
+    return [name for name in allowed if name in names]
+
+
+def make_etag(*parts):
+    # 弱校验：内容由版本号决定，不是逐字节比较
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True) if timestamp else None
+
+
+def is_not_modified(headers, etag, last_modified=None):
+    """按 If-None-Match / If-Modified-Since 判断是否可以返回 304；两者都有时只看 If-None-Match。"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        # 比较时忽略弱校验前缀
+        return '*' in tags or etag in tags or etag[2:] in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP 日期只精确到秒
+        return int(last_modified) <= since
+    return False
+
+
+def cache_headers(etag, last_modified=None, next_cursor=None):
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return headers
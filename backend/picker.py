@@ -0,0 +1,422 @@
+import asyncio
+import time
+import uuid
+
+from playwright.async_api import async_playwright
+
+
+# 注入页面的选择 UI：悬停高亮，点击后通过 omniSelectorChosen 回传候选选择器和预览文本
+PICKER_SCRIPT = '''() => {
+    if (window.__omniPicker) return;
+    window.__omniPicker = true;
+
+    const style = document.createElement('style');
+    style.textContent = `
+        #selector-tip {
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: rgba(0, 0, 0, 0.8);
+            color: white;
+            padding: 10px;
+            border-radius: 5px;
+            z-index: 999999;
+        }
+        .highlight-element {
+            outline: 4px solid #00FF00 !important;
+        }
+        .selected-element {
+            outline: 4px solid red !important;
+        }
+    `;
+    document.head.appendChild(style);
+
+    const tip = document.createElement('div');
+    tip.id = 'selector-tip';
+    tip.textContent = '请选择要监控的元素';
+    document.body.appendChild(tip);
+
+    const OWN_CLASSES = ['highlight-element', 'selected-element'];
+    const LABELS = 'h1, h2, h3, h4, h5, h6, label, legend, dt, th, caption';
+    const ATTRIBUTES = ['data-testid', 'data-test', 'data-qa', 'data-cy', 'data-id', 'itemprop', 'aria-label', 'name'];
+
+    const isUnique = (selector, element) => {
+        try {
+            const found = document.querySelectorAll(selector);
+            return found.length === 1 && found[0] === element;
+        } catch (e) {
+            return false;
+        }
+    };
+
+    const isUniqueXpath = (xpath, element) => {
+        try {
+            const found = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            return found.snapshotLength === 1 && found.snapshotItem(0) === element;
+        } catch (e) {
+            return false;
+        }
+    };
+
+    const xpathLiteral = text => {
+        if (!text.includes('"')) return `"${text}"`;
+        if (!text.includes("'")) return `'${text}'`;
+        return 'concat("' + text.split('"').join(`", '"', "`) + '")';
+    };
+
+    // 自动生成的 id（长串数字、哈希）每次加载都会变，不作为候选
+    const stableId = id => id && !/\d{4,}|^[0-9a-f-]{16,}$/i.test(id);
+
+    const idCandidate = element => {
+        const selector = '#' + CSS.escape(element.id);
+        return stableId(element.id) && isUnique(selector, element) ? selector : null;
+    };
+
+    const attributeCandidate = element => {
+        const tag = element.tagName.toLowerCase();
+        const names = ATTRIBUTES.concat(Array.from(element.attributes, a => a.name)
+            .filter(name => name.startsWith('data-') && !ATTRIBUTES.includes(name)));
+        for (const name of names) {
+            const value = element.getAttribute(name);
+            if (!value || value.length > 80) continue;
+            const selector = `${tag}[${name}="${CSS.escape(value)}"]`;
+            if (isUnique(selector, element)) return selector;
+        }
+        return null;
+    };
+
+    const xpathStep = element => {
+        const tag = element.tagName.toLowerCase();
+        const siblings = Array.from(element.parentNode?.children || [])
+            .filter(e => e.tagName === element.tagName);
+        return siblings.length > 1 ? `${tag}[${siblings.indexOf(element) + 1}]` : tag;
+    };
+
+    // 以元素或其祖先前面的标题文字为锚点，页面结构前后变化时仍能找到
+    const textCandidate = element => {
+        const below = [];
+        let current = element;
+        for (let depth = 0; current && current.tagName !== 'BODY' && depth < 4; depth++) {
+            let sibling = current.previousElementSibling;
+            for (let i = 0; sibling && i < 3; i++, sibling = sibling.previousElementSibling) {
+                const text = sibling.matches(LABELS) && sibling.textContent.trim().replace(/\s+/g, ' ');
+                if (!text || text.length > 40) continue;
+                let position = 0;
+                for (let e = sibling.nextElementSibling; e; e = e.nextElementSibling) {
+                    if (e.tagName === current.tagName) position++;
+                    if (e === current) break;
+                }
+                const xpath = `//${sibling.tagName.toLowerCase()}[normalize-space()=${xpathLiteral(text)}]` +
+                    `/following-sibling::${current.tagName.toLowerCase()}[${position}]` +
+                    below.map(step => '/' + step).join('');
+                return isUniqueXpath(xpath, element) ? 'xpath=' + xpath : null;
+            }
+            below.unshift(xpathStep(current));
+            current = current.parentElement;
+        }
+        return null;
+    };
+
+    const pathCandidate = element => {
+        const path = [];
+        let current = element;
+
+        while (current && current.tagName !== 'HTML') {
+            let selector = current.tagName.toLowerCase();
+
+            if (current.id) {
+                path.unshift('#' + CSS.escape(current.id));
+                return path.join(' > ');
+            }
+
+            const classes = Array.from(current.classList).filter(c => !OWN_CLASSES.includes(c));
+            if (classes.length) {
+                selector += '.' + CSS.escape(classes[0]);
+            }
+
+            const siblings = Array.from(current.parentNode?.children || [])
+                .filter(e => e.tagName === current.tagName);
+
+            if (siblings.length > 1) {
+                selector += `:nth-of-type(${siblings.indexOf(current) + 1})`;
+            }
+
+            path.unshift(selector);
+            current = current.parentNode;
+        }
+
+        return path.join(' > ');
+    };
+
+    const xpathCandidate = element => {
+        const steps = [];
+        for (let current = element; current && current.nodeType === 1; current = current.parentElement) {
+            steps.unshift(current.parentElement ? xpathStep(current) : current.tagName.toLowerCase());
+        }
+        return 'xpath=/' + steps.join('/');
+    };
+
+    // 按稳定程度排列，第一个作为任务的主选择器
+    const candidatesOf = element => [
+        ['id', idCandidate(element)],
+        ['data', attributeCandidate(element)],
+        ['text', textCandidate(element)],
+        ['path', pathCandidate(element).trim()],
+        ['xpath', xpathCandidate(element)],
+    ].filter(([, selector]) => selector).map(([strategy, selector]) => ({strategy, selector}));
+
+    document.addEventListener('mouseover', e => {
+        e.target.classList.add('highlight-element');
+    });
+
+    document.addEventListener('mouseout', e => {
+        e.target.classList.remove('highlight-element');
+    });
+
+    document.addEventListener('click', e => {
+        e.preventDefault();
+        e.stopPropagation();
+
+        e.target.classList.remove('highlight-element');
+        const candidates = candidatesOf(e.target);
+        e.target.classList.add('selected-element');
+        tip.textContent = '已选择元素';
+        window.omniSelectorChosen({
+            selector: candidates[0].selector,
+            preview: (e.target.innerText || '').substring(0, 50),
+            candidates: candidates
+        });
+    }, true);
+}'''
+
+
+class PickerSession:
+    def __init__(self, url, timeout):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.created_at = time.time()
+        self.deadline = time.monotonic() + timeout
+        self.status = 'loading'
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.context = None
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def to_dict(self):
+        return {
+            'session_id': self.id,
+            'url': self.url,
+            'status': self.status,
+            'data': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+        }
+
+
+class PickerSessionManager:
+    """在常驻的有头浏览器里打开选择器页面，每个会话一个独立的 BrowserContext。
+
+    必须在同一个事件循环中使用（scheduler 的引擎循环），其他线程通过 engine.run_coroutine
+    或 engine.call 访问。会话结束（选中、超时、取消、出错）
+    后关闭窗口，结果保留 keep_finished 秒供查询；没有会话 idle_close 秒后关闭浏览器。
+    on_complete(session_dict) 在会话结束时调用，可以在任意线程安全地使用。
+    """
+
+    def __init__(self, timeout=300.0, max_sessions=4, keep_finished=300.0, idle_close=600.0,
+                 launch_options=None, context_options=None, on_complete=None):
+        self.timeout = timeout
+        self.max_sessions = max(1, max_sessions)
+        self.keep_finished = keep_finished
+        self.idle_close = idle_close
+        self.launch_options = launch_options or {'headless': False}
+        self.context_options = context_options or {}
+        self.on_complete = on_complete
+
+        self._sessions = {}
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._idle_since = None
+
+        # 指标
+        self.opened = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.launches = 0
+
+    def _active(self):
+        return [session for session in self._sessions.values() if not session.done]
+
+    async def _ensure_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(**self.launch_options)
+            self.launches += 1
+            return self._browser
+
+    async def open(self, url):
+        """创建会话并在后台打开页面，立即返回会话；结果通过 wait() 或 on_complete 获得。"""
+        self._cleanup()
+        if len(self._active()) >= self.max_sessions:
+            raise RuntimeError(f"同时进行的选择会话已达上限 {self.max_sessions}")
+        session = PickerSession(url, self.timeout)
+        self._sessions[session.id] = session
+        self._idle_since = None
+        self.opened += 1
+        session.task = asyncio.get_running_loop().create_task(self._run(session))
+        return session
+
+    async def _run(self, session):
+        try:
+            await asyncio.wait_for(self._pick(session), max(0.0, session.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._finish(session, 'timeout', error='选择超时')
+        except asyncio.CancelledError:
+            self._finish(session, 'cancelled')
+        except Exception as e:
+            self.failed += 1
+            self._finish(session, 'error', error=f'{type(e).__name__}: {e}')
+        finally:
+            if session.context is not None:
+                try:
+                    await session.context.close()
+                except Exception:
+                    pass
+                session.context = None
+
+    async def _pick(self, session):
+        browser = await self._ensure_browser()
+        session.context = await browser.new_context(**self.context_options)
+        chosen = asyncio.get_running_loop().create_future()
+
+        async def on_chosen(source, data):
+            if not chosen.done():
+                chosen.set_result(data)
+
+        await session.context.expose_binding('omniSelectorChosen', on_chosen)
+        page = await session.context.new_page()
+        # 用户关掉窗口等同于取消
+        page.on('close', lambda _: chosen.done() or chosen.set_result(None))
+        await page.goto(session.url, wait_until='domcontentloaded')
+        try:
+            await page.wait_for_load_state('networkidle', timeout=30000)
+        except Exception:
+            # 长连接页面等不到网络空闲，照常注入
+            pass
+        await page.evaluate(PICKER_SCRIPT)
+        session.status = 'waiting'
+        data = await chosen
+        if data is None:
+            self._finish(session, 'cancelled')
+            return
+        self.completed += 1
+        self._finish(session, 'success', result=data)
+
+    def _finish(self, session, status, result=None, error=None):
+        if session.done:
+            return
+        session.status = status
+        session.result = result
+        session.error = error
+        session.finished_at = time.monotonic()
+        session.future.set_result(session.to_dict())
+        if self.on_complete is not None:
+            try:
+                self.on_complete(session.to_dict())
+            except Exception as e:
+                print(f"选择器回调失败: {str(e)}")
+
+    def _find(self, session_id):
+        # session_id 为空时取最近创建的会话（旧接口不带 session_id）
+        if session_id is None:
+            return next(reversed(self._sessions.values()), None)
+        return self._sessions.get(session_id)
+
+    async def get(self, session_id=None):
+        self._cleanup()
+        session = self._find(session_id)
+        return session.to_dict() if session else None
+
+    async def wait(self, session_id=None, timeout=None):
+        """等待会话结束，返回会话状态；timeout 内未结束时返回当前状态。"""
+        session = self._find(session_id)
+        if session is None:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(session.future), timeout)
+        except asyncio.TimeoutError:
+            return session.to_dict()
+
+    async def cancel(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        if session.task is not None and not session.task.done():
+            session.task.cancel()
+            await asyncio.gather(session.task, return_exceptions=True)
+        return True
+
+    def _cleanup(self):
+        # 丢弃过期的已结束会话
+        now = time.monotonic()
+        for session_id in [s.id for s in self._sessions.values()
+                           if s.done and now - s.finished_at > self.keep_finished]:
+            del self._sessions[session_id]
+
+    async def maintain(self):
+        """定期调用：清理过期会话，空闲太久时关闭浏览器。"""
+        self._cleanup()
+        if self._active() or self._browser is None:
+            self._idle_since = None
+            return
+        now = time.monotonic()
+        if self._idle_since is None:
+            self._idle_since = now
+        elif now - self._idle_since >= self.idle_close:
+            await self._close_browser()
+
+    async def _close_browser(self):
+        browser, self._browser = self._browser, None
+        self._idle_since = None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        tasks = [session.task for session in self._active() if session.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._close_browser()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self):
+        # 读取会话表，需要在引擎循环里调用
+        return {
+            'active_sessions': len(self._active()),
+            'sessions': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'browser_running': self._browser is not None and self._browser.is_connected(),
+            'launches': self.launches,
+            'opened': self.opened,
+            'completed': self.completed,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+        }
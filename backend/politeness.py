@@ -0,0 +1,150 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+# 服务端要求降速的状态码
+RATE_LIMIT_STATUSES = (429, 503)
+
+
+class RateLimited(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, now=None):
+    """解析 Retry-After，支持秒数和 HTTP 日期两种格式，返回秒数；无法解析时返回 None。
+
+    now 为比较 HTTP 日期用的当前时间（带时区的 datetime），默认取系统时间。
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        # 还需要等待多少秒才能拿到一个令牌
+        self._refill(now)
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst and self.blocked_until <= now
+
+
+class HostLimiter:
+    """按域名的令牌桶限速，服务端返回 429/503 时按 Retry-After 暂停该域名。
+
+    只在引擎的事件循环中使用，检查和扣减令牌之间没有 await，不需要加锁。
+    overrides 形如 {"example.com": {"rate": 0.2, "burst": 1}}，对子域名同样生效。
+    clock 返回单调递增的秒数，测试时可以替换。
+    """
+
+    MAX_BUCKETS = 1000
+
+    def __init__(self, rate=1.0, burst=2, overrides=None, clock=time.monotonic):
+        self.rate = max(0.001, rate)
+        self.burst = burst
+        self.overrides = {host.lower(): spec for host, spec in (overrides or {}).items()}
+        self.clock = clock
+        self._buckets = {}
+
+        # 指标
+        self.acquired = 0
+        self.throttled = 0
+        self.penalties = 0
+        self._wait_total = 0.0
+
+    def _limits(self, host):
+        name = host.split(':')[0]
+        while name:
+            spec = self.overrides.get(name)
+            if spec is not None:
+                return max(0.001, float(spec.get('rate', self.rate))), float(spec.get('burst', self.burst))
+            _, _, name = name.partition('.')
+        return self.rate, self.burst
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            now = self.clock()
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                for key in [k for k, b in self._buckets.items() if b.idle(now)]:
+                    del self._buckets[key]
+            bucket = self._buckets[host] = TokenBucket(*self._limits(host), now)
+        return bucket
+
+    def try_acquire(self, host):
+        # 拿到令牌返回 0，否则返回需要等待的秒数
+        bucket = self._bucket(host)
+        delay = bucket.delay(self.clock())
+        if delay <= 0:
+            bucket.tokens -= 1
+            self.acquired += 1
+        return delay
+
+    async def acquire(self, host):
+        started = None
+        while True:
+            delay = self.try_acquire(host)
+            if delay <= 0:
+                break
+            if started is None:
+                started = self.clock()
+                self.throttled += 1
+            await asyncio.sleep(delay)
+        if started is not None:
+            self._wait_total += self.clock() - started
+
+    def penalize(self, host, seconds):
+        bucket = self._bucket(host)
+        now = self.clock()
+        bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+        bucket.tokens = 0.0
+        bucket.updated = now
+        self.penalties += 1
+
+    def stats(self):
+        now = self.clock()
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'hosts': len(self._buckets),
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'penalties': self.penalties,
+            'total_wait_seconds': round(self._wait_total, 3),
+            'paused_hosts': {
+                host: round(bucket.blocked_until - now, 1)
+                for host, bucket in self._buckets.items() if bucket.blocked_until > now
+            },
+        }
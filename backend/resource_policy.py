@@ -0,0 +1,204 @@
+import json
+import time
+from urllib.parse import urlsplit
+
+
+RESOURCE_TYPES = (
+    'document', 'stylesheet', 'image', 'media', 'font', 'script', 'texttrack', 'xhr',
+    'fetch', 'eventsource', 'websocket', 'manifest', 'other',
+)
+
+DEFAULT_BLOCK_TYPES = ('image', 'font', 'media')
+
+# 常见统计/广告域名，命中域名本身或其子域名即拦截
+TRACKER_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'googlesyndication.com', 'googleadservices.com',
+    'doubleclick.net', 'adservice.google.com', 'facebook.net', 'connect.facebook.net',
+    'hotjar.com', 'scorecardresearch.com', 'quantserve.com', 'criteo.com', 'taboola.com',
+    'outbrain.com', 'hm.baidu.com', 'cnzz.com', 'umeng.com', 'growingio.com', 'sensorsdata.cn',
+    'mmstat.com', 'tanx.com', 'pos.baidu.com', 'cpro.baidu.com',
+)
+
+# 被拦截的请求拿不到真实大小，先用经验值，运行中按放行请求的 Content-Length 修正
+DEFAULT_SIZE_ESTIMATES = {
+    'image': 40 * 1024,
+    'media': 500 * 1024,
+    'font': 40 * 1024,
+    'script': 30 * 1024,
+    'stylesheet': 15 * 1024,
+    'xhr': 5 * 1024,
+    'fetch': 5 * 1024,
+    'other': 5 * 1024,
+}
+
+
+def host_matches(host, domains):
+    host = (host or '').lower()
+    for domain in domains:
+        if host == domain or host.endswith('.' + domain):
+            return True
+    return False
+
+
+class ResourcePolicy:
+    """单个任务在浏览器中加载页面时的资源策略。
+
+    block_types 按 Playwright 的 resource_type 拦截，block_domains / block_trackers 按域名拦截；
+    early_exit 为真时选择器一出现就取内容，不再等待 networkidle。
+    """
+
+    def __init__(self, block_types=DEFAULT_BLOCK_TYPES, block_domains=(), block_trackers=True,
+                 early_exit=True):
+        unknown = set(block_types) - set(RESOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"未知的资源类型: {', '.join(sorted(unknown))}")
+        if 'document' in block_types:
+            raise ValueError("不能拦截 document 类型")
+        self.block_types = frozenset(block_types)
+        self.block_domains = tuple(d.lower().strip().lstrip('.') for d in block_domains if d.strip())
+        self.block_trackers = bool(block_trackers)
+        self.early_exit = bool(early_exit)
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        # 任务只需写出与默认策略不同的字段
+        merged = dict(defaults.to_dict() if defaults else {})
+        merged.update({k: v for k, v in (data or {}).items() if v is not None})
+        unknown = set(merged) - {'block_types', 'block_domains', 'block_trackers', 'early_exit'}
+        if unknown:
+            raise ValueError(f"未知的策略字段: {', '.join(sorted(unknown))}")
+        return cls(**merged)
+
+    @classmethod
+    def from_json(cls, value, defaults=None):
+        if not value:
+            return defaults or cls()
+        return cls.from_dict(json.loads(value), defaults)
+
+    def to_dict(self):
+        return {
+            'block_types': sorted(self.block_types),
+            'block_domains': list(self.block_domains),
+            'block_trackers': self.block_trackers,
+            'early_exit': self.early_exit,
+        }
+
+    def intercepts(self):
+        return bool(self.block_types or self.block_domains or self.block_trackers)
+
+    def block_reason(self, resource_type, url):
+        if resource_type in self.block_types:
+            return resource_type
+        if self.block_domains or self.block_trackers:
+            host = urlsplit(url).hostname
+            if self.block_domains and host_matches(host, self.block_domains):
+                return 'domain'
+            if self.block_trackers and host_matches(host, TRACKER_DOMAINS):
+                return 'tracker'
+        return None
+
+
+class PageStats:
+    # 一次页面加载的统计，结束后写入 runs.stats
+
+    def __init__(self, meter):
+        self.meter = meter
+        self.started = time.monotonic()
+        self.requests = 0
+        self.blocked = {}
+        self.bytes_loaded = 0
+        self.bytes_saved = 0
+        self.time_to_selector = None
+        self.early_exit = False
+
+    def on_blocked(self, resource_type, reason):
+        self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        self.bytes_saved += self.meter.estimate(resource_type)
+
+    def on_response(self, resource_type, headers):
+        self.requests += 1
+        try:
+            size = int(headers.get('content-length', ''))
+        except ValueError:
+            return
+        self.bytes_loaded += size
+        self.meter.observe(resource_type, size)
+
+    def selector_found(self):
+        self.time_to_selector = round(time.monotonic() - self.started, 3)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'blocked': sum(self.blocked.values()),
+            'blocked_by': dict(self.blocked),
+            'bytes_loaded': self.bytes_loaded,
+            'bytes_saved_estimate': self.bytes_saved,
+            'time_to_selector': self.time_to_selector,
+            'early_exit': self.early_exit,
+        }
+
+
+class ResourceMeter:
+    """跨任务累计拦截效果，并学习各资源类型的平均大小用于估算节省的流量。"""
+
+    def __init__(self, estimates=None):
+        self._estimates = dict(DEFAULT_SIZE_ESTIMATES, **(estimates or {}))
+        self._observed = {}
+        self.pages = 0
+        self.blocked = 0
+        self.bytes_loaded = 0
+        self.bytes_saved = 0
+        self._selector_total = 0.0
+        self._selector_samples = 0
+
+    def observe(self, resource_type, size):
+        count, total = self._observed.get(resource_type, (0, 0))
+        self._observed[resource_type] = (count + 1, total + size)
+
+    def estimate(self, resource_type):
+        count, total = self._observed.get(resource_type, (0, 0))
+        # 样本太少时仍用经验值
+        if count >= 20:
+            return total // count
+        return self._estimates.get(resource_type, self._estimates['other'])
+
+    def page(self):
+        return PageStats(self)
+
+    def record(self, stats):
+        self.pages += 1
+        self.blocked += sum(stats.blocked.values())
+        self.bytes_loaded += stats.bytes_loaded
+        self.bytes_saved += stats.bytes_saved
+        if stats.time_to_selector is not None:
+            self._selector_total += stats.time_to_selector
+            self._selector_samples += 1
+
+    def stats(self):
+        return {
+            'pages': self.pages,
+            'blocked': self.blocked,
+            'bytes_loaded': self.bytes_loaded,
+            'bytes_saved_estimate': self.bytes_saved,
+            'avg_time_to_selector': round(self._selector_total / self._selector_samples, 3)
+                                    if self._selector_samples else 0.0,
+        }
+
+
+async def install(context, policy, stats):
+    """在 BrowserContext 上挂载拦截规则和响应统计。"""
+
+    async def handle(route):
+        request = route.request
+        reason = policy.block_reason(request.resource_type, request.url)
+        if reason is None:
+            await route.continue_()
+            return
+        stats.on_blocked(request.resource_type, reason)
+        await route.abort('blockedbyclient')
+
+    if policy.intercepts():
+        await context.route('**/*', handle)
+    context.on('response', lambda response: stats.on_response(
+        response.request.resource_type, response.headers))
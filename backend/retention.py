@@ -0,0 +1,117 @@
+import time
+
+
+def _offload_inline_content(db, blobs, batch_size):
+    # 旧记录的 content 列里存着原始 HTML 或错误信息，分批挪走
+    moved = 0
+    while True:
+        with db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id, content, content_hash FROM results
+                        WHERE content IS NOT NULL LIMIT ?''', (batch_size,))
+            rows = c.fetchall()
+            if not rows:
+                return moved
+            for result_id, content, content_hash in rows:
+                if content_hash is not None:
+                    digest = blobs.put(c, content)
+                    c.execute('UPDATE results SET blob_digest = ?, content = NULL WHERE id = ?',
+                              (digest, result_id))
+                else:
+                    c.execute('UPDATE results SET error = content, content = NULL WHERE id = ?',
+                              (result_id,))
+            conn.commit()
+            moved += len(rows)
+
+
+def _apply_retention(db, keep_last, keep_days):
+    deleted = 0
+    with db.connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id,
+                            COALESCE(retention_keep_last, ?) AS keep_last,
+                            COALESCE(retention_days, ?) AS keep_days
+                    FROM tasks''', (keep_last, keep_days))
+        policies = c.fetchall()
+
+        for task_id, task_keep_last, task_keep_days in policies:
+            # 最近一次成功的结果用于变化检测，无论策略如何都保留
+            c.execute('''SELECT id FROM results
+                        WHERE task_id = ? AND content_hash IS NOT NULL
+                        ORDER BY timestamp DESC, id DESC LIMIT 1''', (task_id,))
+            latest = c.fetchone()
+            latest_id = latest[0] if latest else -1
+
+            if task_keep_last:
+                c.execute('''DELETE FROM results
+                            WHERE task_id = ? AND id != ? AND id NOT IN
+                                (SELECT id FROM results WHERE task_id = ?
+                                 ORDER BY timestamp DESC, id DESC LIMIT ?)''',
+                          (task_id, latest_id, task_id, int(task_keep_last)))
+                deleted += c.rowcount
+            if task_keep_days:
+                c.execute('''DELETE FROM results
+                            WHERE task_id = ? AND id != ? AND timestamp < datetime('now', ?)''',
+                          (task_id, latest_id, f'-{int(task_keep_days)} days'))
+                deleted += c.rowcount
+            conn.commit()
+
+        # 已删除任务遗留的结果
+        c.execute('DELETE FROM results WHERE task_id NOT IN (SELECT id FROM tasks)')
+        deleted += c.rowcount
+        conn.commit()
+    return deleted
+
+
+def _prune_runs(db, runs_days):
+    if not runs_days:
+        return 0
+    with db.connection() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM runs WHERE finished_at < datetime('now', ?)", (f'-{int(runs_days)} days',))
+        conn.commit()
+        return c.rowcount
+
+
+def _drop_orphan_blobs(db):
+    with db.connection() as conn:
+        c = conn.cursor()
+        c.execute('''DELETE FROM blobs WHERE NOT EXISTS
+                    (SELECT 1 FROM results WHERE results.blob_digest = blobs.digest)''')
+        conn.commit()
+        return c.rowcount
+
+
+def _reclaim_space(db, vacuum_ratio):
+    with db.connection() as conn:
+        c = conn.cursor()
+        page_count = c.execute('PRAGMA page_count').fetchone()[0]
+        freelist = c.execute('PRAGMA freelist_count').fetchone()[0]
+        vacuumed = False
+        # 空闲页会被 SQLite 复用，只有空闲比例很高时才整体重建文件
+        if page_count and freelist / page_count >= vacuum_ratio:
+            c.execute('VACUUM')
+            vacuumed = True
+        c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        page_size = c.execute('PRAGMA page_size').fetchone()[0]
+        page_count = c.execute('PRAGMA page_count').fetchone()[0]
+    return vacuumed, page_count * page_size
+
+
+def compact(db, blobs, keep_last=100, keep_days=0, runs_days=7, batch_size=500, vacuum_ratio=0.25):
+    """执行一次整理：挪走内联内容、按保留策略删除旧结果、清理孤立的 blob 和旧的执行记录。"""
+    started = time.perf_counter()
+    offloaded = _offload_inline_content(db, blobs, batch_size)
+    results_deleted = _apply_retention(db, keep_last, keep_days)
+    runs_deleted = _prune_runs(db, runs_days)
+    blobs_deleted = _drop_orphan_blobs(db)
+    vacuumed, db_bytes = _reclaim_space(db, vacuum_ratio)
+    return {
+        'offloaded': offloaded,
+        'results_deleted': results_deleted,
+        'runs_deleted': runs_deleted,
+        'blobs_deleted': blobs_deleted,
+        'vacuumed': vacuumed,
+        'db_bytes': db_bytes,
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    }
@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+import time
+import uuid
+
+
+def default_owner():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class RunQueue:
+    """保存在 runs 表里的执行队列，进程崩溃后未完成的执行不会丢失。
+
+    一次执行先以 queued 状态写入，再由某个进程领取租约（lease_owner / lease_expires_at）后执行；
+    持有者定期续租，进程退出后租约过期，执行重新回到队列。定时触发的执行 id 由任务和触发时间
+    决定，重复触发只会写入一次。时间字段都是 unix 秒。
+    """
+
+    def __init__(self, db, owner=None, lease_seconds=300.0, max_attempts=3):
+        self.db = db
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._last_renew = 0.0
+
+        # 指标
+        self.enqueued = 0
+        self.duplicates = 0
+        self.claimed = 0
+        self.recovered = 0
+
+    def enqueue(self, task_id, trigger, run_id=None, not_before=None, claim=False):
+        """写入一次执行，返回 (run_id, 是否新写入)。claim 为真时同时由本进程领取。"""
+        run_id = run_id or uuid.uuid4().hex
+        now = time.time()
+        owner, expires = (self.owner, now + self.lease_seconds) if claim else (None, None)
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT OR IGNORE INTO runs (id, task_id, trigger, not_before, lease_owner, lease_expires_at)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                      (run_id, task_id, trigger, not_before or now, owner, expires))
+            created = c.rowcount == 1
+            conn.commit()
+        if created:
+            self.enqueued += 1
+        else:
+            self.duplicates += 1
+        return run_id, created
+
+    def enqueue_many(self, runs, trigger, stagger=0.0):
+        """在一个事务里写入多次执行，runs 为 [(run_id, task_id)]，第 i 个推迟 i * stagger 秒。"""
+        if not runs:
+            return 0
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            before = conn.total_changes
+            c.executemany('''INSERT OR IGNORE INTO runs (id, task_id, trigger, not_before)
+                            VALUES (?, ?, ?, ?)''',
+                          [(run_id, task_id, trigger, now + i * stagger)
+                           for i, (run_id, task_id) in enumerate(runs)])
+            created = conn.total_changes - before
+            conn.commit()
+        self.enqueued += created
+        self.duplicates += len(runs) - created
+        return created
+
+    def claim_due(self, limit):
+        """领取最多 limit 个到期且无人持有的执行，返回 [(run_id, task_id, url, selector, active)]。"""
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            # 先拿写锁再挑选，多个进程同时领取时不会拿到同一条
+            c.execute('BEGIN IMMEDIATE')
+            c.execute('''SELECT r.id, r.task_id, t.url, t.selector, t.active
+                        FROM runs r LEFT JOIN tasks t ON t.id = r.task_id
+                        WHERE r.status = 'queued' AND r.not_before <= ?
+                          AND (r.lease_owner IS NULL OR r.lease_expires_at < ?)
+                        ORDER BY r.not_before LIMIT ?''', (now, now, limit))
+            rows = [tuple(row) for row in c.fetchall()]
+            if rows:
+                c.executemany('''UPDATE runs SET lease_owner = ?, lease_expires_at = ?
+                                WHERE id = ?''',
+                              [(self.owner, now + self.lease_seconds, row[0]) for row in rows])
+            conn.commit()
+        self.claimed += len(rows)
+        return rows
+
+    def release(self, run_id, not_before=None):
+        # 交还租约，执行留在队列里等待下一次领取
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE runs SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL,
+                                not_before = COALESCE(?, not_before)
+                        WHERE id = ? AND lease_owner = ?''', (not_before, run_id, self.owner))
+            conn.commit()
+
+    def delete(self, run_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('DELETE FROM runs WHERE id = ?', (run_id,))
+            conn.commit()
+
+    def renew(self, force=False):
+        """延长本进程持有的全部租约；距离上次续租不足租期的三分之一时跳过。"""
+        now = time.time()
+        if not force and now - self._last_renew < self.lease_seconds / 3:
+            return 0
+        self._last_renew = now
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE runs SET lease_expires_at = ?
+                        WHERE lease_owner = ? AND status IN ('queued', 'running')''',
+                      (now + self.lease_seconds, self.owner))
+            renewed = c.rowcount
+            conn.commit()
+        return renewed
+
+    def recover(self):
+        """把租约已过期的执行中任务放回队列，超过重试次数的记为失败。"""
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE runs SET status = 'failed', stage = 'done', lease_owner = NULL,
+                                error = '执行进程退出，已达到最大重试次数', finished_at = CURRENT_TIMESTAMP
+                        WHERE status = 'running' AND lease_expires_at < ? AND attempts + 1 >= ?''',
+                      (now, self.max_attempts))
+            failed = c.rowcount
+            c.execute('''UPDATE runs SET status = 'queued', stage = NULL, lease_owner = NULL,
+                                lease_expires_at = NULL, attempts = attempts + 1, not_before = ?
+                        WHERE status = 'running' AND lease_expires_at < ?''', (now, now))
+            requeued = c.rowcount
+            conn.commit()
+        self.recovered += requeued
+        if failed or requeued:
+            print(f"已恢复 {requeued} 个中断的执行，{failed} 个超过重试次数")
+        return requeued
+
+    def release_all(self):
+        """进程退出前交还全部租约：未开始的直接回到队列，执行到一半的计一次重试后回到队列。"""
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE runs SET lease_owner = NULL, lease_expires_at = NULL
+                        WHERE status = 'queued' AND lease_owner = ?''', (self.owner,))
+            released = c.rowcount
+            c.execute('''UPDATE runs SET status = 'queued', stage = NULL, lease_owner = NULL,
+                                lease_expires_at = NULL, attempts = attempts + 1
+                        WHERE status = 'running' AND lease_owner = ?''', (self.owner,))
+            released += c.rowcount
+            conn.commit()
+        return released
+
+    def heartbeat(self, role, status='running', stats=None):
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT INTO workers (id, host, pid, role, status, started_at, heartbeat_at, stats)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET status = excluded.status,
+                            heartbeat_at = excluded.heartbeat_at, stats = excluded.stats''',
+                      (self.owner, socket.gethostname(), os.getpid(), role, status, now, now,
+                       json.dumps(stats) if stats is not None else None))
+            # 一天没有心跳的记录不再展示
+            c.execute('DELETE FROM workers WHERE heartbeat_at < ?', (now - 86400,))
+            conn.commit()
+
+    def workers(self, timeout):
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id, host, pid, role, status, started_at, heartbeat_at, stats
+                        FROM workers ORDER BY started_at''')
+            rows = [dict(row) for row in c.fetchall()]
+        for row in rows:
+            row['alive'] = row['status'] == 'running' and now - row['heartbeat_at'] <= timeout
+            row['stats'] = json.loads(row['stats']) if row['stats'] else None
+        return rows
+
+    def depth(self):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM runs WHERE status = 'queued'")
+            return c.fetchone()[0]
+
+    def stats(self):
+        return {
+            'owner': self.owner,
+            'lease_seconds': self.lease_seconds,
+            'depth': self.depth(),
+            'enqueued': self.enqueued,
+            'duplicates': self.duplicates,
+            'claimed': self.claimed,
+            'recovered': self.recovered,
+        }
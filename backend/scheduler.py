@@ -1,26 +1,76 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.executors.pool import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright
-import sqlite3
 from datetime import datetime, timedelta
 import multiprocessing
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
 import asyncio
 from playwright.async_api import async_playwright
 from concurrent.futures import ThreadPoolExecutor
 import sys
 import hashlib
-import requests
 import json
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
-from bs4 import NavigableString
+import time
+import uuid
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from . import config
+from .browser_pool import BrowserPool
+from .fetcher import HttpFetcher, FetchResult, NeedsBrowser, FetchError
+from .resource_policy import ResourcePolicy, ResourceMeter
+from . import resource_policy
+from .engine import ScrapeEngine, QueueFull, RetryLater
+from .run_queue import RunQueue
+from .events import EventBus
+from .picker import PickerSessionManager
+from .politeness import HostLimiter, RateLimited, RATE_LIMIT_STATUSES, parse_retry_after
+from .llm_client import LLMClient
+from .summary_cache import SummaryCache, summary_key
+from .fingerprint import content_digest
+from .storage import Database
+from .blobstore import BlobStore
+from . import retention
+from . import diff
+from . import extractor
+from . import locators
+from . import metrics
+from . import adaptive
+from .adaptive import AdaptiveSchedule
+
+def previous_fire_time(trigger, now, window):
+    # 触发器在 (now - window, now] 内最后一次触发的时间
+    fire_time, previous = trigger.get_next_fire_time(None, now - window), None
+    while fire_time is not None and fire_time <= now:
+        previous = fire_time
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return previous
+
+
+def scheduled_run_id(task_id, fire_time):
+    return f'{task_id}-{fire_time:%Y%m%d%H%M}'
+
+
+ROLES = ('all', 'api', 'worker')
+
 
 class ScraperScheduler:
-    def __init__(self):
+    def __init__(self, role=None):
+        self.role = role or config.MODE
+        if self.role not in ROLES:
+            raise ValueError(f"未知的运行模式: {self.role}")
+        self._last_heartbeat = 0.0
+        # 任务、执行和结果的变更通知，供 /events 推送给前端
+        self.events = EventBus()
+        self._event_marks = None
         self.scheduler = BackgroundScheduler(
-            executors={'default': {'type': 'threadpool', 'max_workers': 1}},
-            job_defaults={'coalesce': False, 'max_instances': 1},
+            # 定时触发只写入执行队列，不会阻塞；第二个线程保证整理数据库时队列照常推进
+            executors={'default': {'type': 'threadpool', 'max_workers': 2}},
+            job_defaults={
+                'coalesce': False,
+                'max_instances': 1,
+                'misfire_grace_time': int(config.ENGINE_SUBMIT_TIMEOUT)
+            },
             timezone='Asia/Shanghai'
         )
         self.base_prompt = """你是一个专业的内容分析助手。请对以下内容进行分析和总结：
@@ -34,201 +84,894 @@ class ScraperScheduler:
    - 确保所有链接都是可直接点击的完整URL
 6. 只总结与要求主题相关的内容"""
         
+        # 所有抓取都在引擎的常驻事件循环上并发执行，浏览器池也绑定在这个循环上
+        self.limiter = HostLimiter(
+            rate=config.POLITENESS_RATE,
+            burst=config.POLITENESS_BURST,
+            overrides=config.POLITENESS_HOSTS
+        )
+        self.engine = ScrapeEngine(
+            self._scrape_task_async,
+            concurrency=config.ENGINE_CONCURRENCY,
+            per_domain=config.ENGINE_PER_DOMAIN,
+            max_pending=config.ENGINE_MAX_PENDING,
+            limiter=self.limiter
+        )
+        # 被限速的任务已重试的次数，只在引擎循环中读写
+        self._rate_limit_attempts = {}
+        self.loop = self.engine.loop
+        self.browser_pool = BrowserPool(
+            size=config.BROWSER_POOL_SIZE,
+            max_contexts_per_browser=config.BROWSER_MAX_CONTEXTS,
+            max_pages_per_browser=config.BROWSER_MAX_PAGES,
+            health_interval=config.BROWSER_HEALTH_INTERVAL,
+            context_options={'user_agent': config.USER_AGENT}
+        )
+        # 可视化选择器，结果通过 selector 事件推送给前端
+        self.picker = PickerSessionManager(
+            timeout=config.PICKER_TIMEOUT_SECONDS,
+            max_sessions=config.PICKER_MAX_SESSIONS,
+            idle_close=config.PICKER_IDLE_CLOSE_SECONDS,
+            context_options={'user_agent': config.USER_AGENT},
+            on_complete=lambda session: self.events.publish('selector', **session)
+        )
+        # 浏览器加载页面时默认拦截的资源，任务可在 tasks.resource_policy 中覆盖
+        self.default_resource_policy = ResourcePolicy(
+            block_types=config.RESOURCE_BLOCK_TYPES,
+            block_trackers=config.RESOURCE_BLOCK_TRACKERS,
+            early_exit=config.RESOURCE_EARLY_EXIT
+        )
+        self.resource_meter = ResourceMeter()
+        # 自适应调度的任务未写的参数使用这些默认值
+        self.adaptive_defaults = {
+            'min_minutes': config.ADAPTIVE_MIN_MINUTES,
+            'max_minutes': config.ADAPTIVE_MAX_MINUTES,
+            'sampling': config.ADAPTIVE_SAMPLING,
+            'error_backoff': config.ADAPTIVE_ERROR_BACKOFF,
+        }
+        self.llm = LLMClient(
+            config.LLM_ENDPOINT,
+            config.LLM_MODEL,
+            timeout=config.LLM_TIMEOUT,
+            retries=config.LLM_RETRIES,
+            backoff=config.LLM_BACKOFF,
+            concurrency=config.LLM_CONCURRENCY,
+            pool_size=config.LLM_POOL_SIZE
+        )
+        self.db = Database(config.DB_PATH, pool_size=config.DB_POOL_SIZE)
+        self.blobs = BlobStore()
+        self.run_queue = RunQueue(
+            self.db,
+            lease_seconds=config.QUEUE_LEASE_SECONDS,
+            max_attempts=config.QUEUE_MAX_ATTEMPTS
+        )
+        # 静态页面直接用 HTTP 取，选择器未命中或任务需要 JS 时才用浏览器
+        self.http_fetcher = HttpFetcher(
+            self.db,
+            timeout=config.HTTP_TIMEOUT,
+            pool_size=config.HTTP_POOL_SIZE,
+            max_bytes=config.HTTP_MAX_BYTES,
+            user_agent=config.USER_AGENT
+        )
+        self.summary_cache = SummaryCache(
+            self.db,
+            max_entries=config.SUMMARY_CACHE_MAX_ENTRIES,
+            max_age_days=config.SUMMARY_CACHE_MAX_AGE_DAYS
+        )
+        
         self.init_database()
+        # 定时任务只由 api / all 进程负责，worker 只执行
+        if self.role != 'worker':
+            self.restore_tasks()
         self.start()
 
     def init_database(self):
-        conn = sqlite3.connect('scraper.db')
-        c = conn.cursor()
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS tasks
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     url TEXT NOT NULL,
-                     selector TEXT NOT NULL,
-                     schedule TEXT NOT NULL, 
-                     active INTEGER DEFAULT 1)''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS results
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     task_id INTEGER,
-                     content TEXT,
-                     content_hash TEXT,
-                     summary TEXT,
-                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                     is_new BOOLEAN DEFAULT 1,
-                     FOREIGN KEY (task_id) REFERENCES tasks (id))''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS prompts
-                    (task_id INTEGER PRIMARY KEY,
-                     custom_prompt TEXT,
-                     FOREIGN KEY (task_id) REFERENCES tasks (id))''')
-        
-        conn.commit()
-        conn.close()
+        self.db.migrate()
 
-    def add_task(self, task_id, url, selector, schedule):
-        schedule_data = json.loads(schedule)
+    def get_task_settings(self, task_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT * FROM tasks WHERE id = ?', (task_id,))
+            row = c.fetchone()
+        if not row:
+            return {}
+        settings = dict(row)
+        settings['ignore_selectors'] = json.loads(settings.get('ignore_selectors') or '[]')
+        try:
+            settings['selector_candidates'] = locators.parse_candidates(settings.get('selector_candidates'))
+        except ValueError as e:
+            print(f"任务 {task_id} 的候选选择器无效，只使用主选择器: {str(e)}")
+            settings['selector_candidates'] = []
+        return settings
+
+    def _cron_trigger(self, schedule_data, jitter=None):
         day_mapping = {0: 6, 1: 0, 2: 1, 3: 2, 4: 3, 5: 4, 6: 5}
         cron_days = [str(day_mapping[day]) for day in schedule_data['days']]
+        return CronTrigger(
+            day_of_week=','.join(cron_days),
+            hour=schedule_data['hour'],
+            minute=schedule_data['minute'],
+            timezone=self.scheduler.timezone,
+            jitter=jitter
+        )
+
+    def adaptive_schedule(self, schedule_data):
+        # 不是自适应调度时返回 None，参数无效时抛出 ValueError
+        return AdaptiveSchedule.from_schedule(schedule_data, self.adaptive_defaults)
+
+    def add_task(self, task_id, url, selector, schedule, run_now=True):
+        schedule_data = json.loads(schedule)
         
         job_id = f'task_{task_id}'
         if self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
         
-        self.scheduler.add_job(
-            self.scrape_task,
-            'cron',
-            day_of_week=','.join(cron_days),
-            hour=schedule_data['hour'],
-            minute=schedule_data['minute'],
-            id=job_id,
-            args=[task_id, url, selector],
-            replace_existing=True
-        )
+        # 自适应调度不建定时任务，由 enqueue_due 按 tasks.next_run_at 入队
+        policy = self.adaptive_schedule(schedule_data)
+        self._init_next_run(task_id, policy, run_now)
+        if policy is None:
+            self.scheduler.add_job(
+                self.enqueue_task,
+                self._cron_trigger(schedule_data, config.SCHEDULE_JITTER_SECONDS or None),
+                id=job_id,
+                args=[task_id, url, selector, schedule_data],
+                replace_existing=True
+            )
+        
+        # 立即执行一次，只入队不等待结果，返回 run_id
+        if run_now:
+            return self.submit_run(task_id, url, selector, trigger='initial', block=False)
+        return None
+
+    def add_tasks(self, tasks, run_now=True, warmup_seconds=0.0):
+        """批量注册任务，tasks 为 [(task_id, url, selector, schedule)]，返回写入队列的首次执行数。
+
+        首次执行直接写入持久化队列，在 warmup_seconds 内均匀错开，由 pump_runs 逐步领取；
+        不运行首次执行的自适应任务也按同样的间隔错开第一次触发。
+        """
+        if not tasks:
+            return 0
+        step = warmup_seconds / len(tasks) if warmup_seconds > 0 else 0.0
+        now = time.time()
+        next_runs = []
+        for i, (task_id, url, selector, schedule) in enumerate(tasks):
+            schedule_data = json.loads(schedule)
+            policy = self.adaptive_schedule(schedule_data)
+            if policy is not None:
+                first = now + i * step
+                next_runs.append((first + policy.min_seconds if run_now else first,
+                                  policy.min_seconds, task_id))
+                continue
+            self.scheduler.add_job(
+                self.enqueue_task,
+                self._cron_trigger(schedule_data, config.SCHEDULE_JITTER_SECONDS or None),
+                id=f'task_{task_id}',
+                args=[task_id, url, selector, schedule_data],
+                replace_existing=True
+            )
+        if next_runs:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.executemany('UPDATE tasks SET next_run_at = ?, interval_seconds = ? WHERE id = ?',
+                              next_runs)
+                conn.commit()
+        if not run_now:
+            return 0
+        return self.run_queue.enqueue_many([(uuid.uuid4().hex, task[0]) for task in tasks], 'initial',
+                                           stagger=step)
+
+    def _init_next_run(self, task_id, policy, run_now):
+        # 立即执行的那次结束后会按结果重新计算，这里先定一个下次时间，执行丢失时调度也不会中断
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            if policy is None:
+                c.execute('''UPDATE tasks SET next_run_at = NULL, interval_seconds = NULL
+                            WHERE id = ? AND next_run_at IS NOT NULL''', (task_id,))
+            elif run_now:
+                c.execute('SELECT interval_seconds FROM tasks WHERE id = ?', (task_id,))
+                row = c.fetchone()
+                interval = policy.clamp(row[0] if row and row[0] else policy.min_seconds)
+                c.execute('UPDATE tasks SET next_run_at = ?, interval_seconds = ? WHERE id = ?',
+                          (time.time() + interval, interval, task_id))
+            else:
+                # 重启时保留原来的下次时间，已经过期的由 enqueue_due 补上
+                c.execute('UPDATE tasks SET next_run_at = ? WHERE id = ? AND next_run_at IS NULL',
+                          (time.time(), task_id))
+            conn.commit()
+
+    def restore_tasks(self):
+        """启动时按 tasks 表重建定时任务。
+
+        不做首次立即执行，只补上停机期间错过的最近一次触发；补跑的执行 id 与正常触发相同，
+        已经执行过的不会重复，并按固定间隔错开放入队列。自适应调度的任务由 enqueue_due 补上。
+        """
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT id, url, selector, schedule FROM tasks WHERE active = 1')
+            tasks = c.fetchall()
+        
+        now = datetime.now(self.scheduler.timezone)
+        window = timedelta(hours=config.RESTORE_CATCHUP_HOURS)
+        missed = []
+        for task_id, url, selector, schedule in tasks:
+            try:
+                self.add_task(task_id, url, selector, schedule, run_now=False)
+            except Exception as e:
+                print(f"恢复任务 {task_id} 失败: {str(e)}")
+                continue
+            schedule_data = json.loads(schedule)
+            if config.RESTORE_CATCHUP_HOURS > 0 and self.adaptive_schedule(schedule_data) is None:
+                fire_time = previous_fire_time(self._cron_trigger(schedule_data), now, window)
+                if fire_time is not None:
+                    missed.append((scheduled_run_id(task_id, fire_time), task_id))
         
-        # 立即执行一次
-        self.scrape_task(task_id, url, selector)
+        created = self.run_queue.enqueue_many(missed, 'catchup', stagger=config.RESTORE_STAGGER_SECONDS)
+        print(f"已恢复 {len(tasks)} 个定时任务，补跑 {created} 次错过的执行")
 
     def remove_task(self, task_id):
         job_id = f'task_{task_id}'
         if self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
 
+    @property
+    def executes(self):
+        return self.role != 'api'
+
     def start(self):
+        self.engine.start()
+        if self.executes and not self.scheduler.get_job('run_queue'):
+            self.scheduler.add_job(
+                self.pump_runs,
+                'interval',
+                seconds=config.QUEUE_POLL_SECONDS,
+                id='run_queue',
+                replace_existing=True
+            )
+        if self.role == 'api' and not self.scheduler.get_job('events'):
+            # 执行发生在 worker 进程里，从数据库转发变更；没有订阅者时不查询
+            self._event_marks = self._current_event_marks()
+            self.scheduler.add_job(
+                self.forward_events,
+                'interval',
+                seconds=config.EVENTS_POLL_SECONDS,
+                id='events',
+                replace_existing=True
+            )
+        if self.role != 'worker' and not self.scheduler.get_job('adaptive'):
+            self.scheduler.add_job(
+                self.enqueue_due,
+                'interval',
+                seconds=config.ADAPTIVE_POLL_SECONDS,
+                id='adaptive',
+                replace_existing=True
+            )
+        if self.role != 'worker' and not self.scheduler.get_job('picker'):
+            self.scheduler.add_job(
+                self.maintain_picker,
+                'interval',
+                seconds=60,
+                id='picker',
+                replace_existing=True
+            )
+        if self.role != 'worker' and not self.scheduler.get_job('compaction') \
+                and config.COMPACTION_INTERVAL_MINUTES:
+            self.scheduler.add_job(
+                self.compact,
+                'interval',
+                minutes=config.COMPACTION_INTERVAL_MINUTES,
+                id='compaction',
+                replace_existing=True
+            )
         if not self.scheduler.running:
             self.scheduler.start()
 
+    def compact(self):
+        try:
+            stats = retention.compact(
+                self.db,
+                self.blobs,
+                keep_last=config.RETENTION_KEEP_LAST,
+                keep_days=config.RETENTION_DAYS,
+                runs_days=config.RUNS_RETENTION_DAYS,
+                batch_size=config.COMPACTION_BATCH_SIZE
+            )
+        except Exception as e:
+            print(f"整理数据库失败: {str(e)}")
+            raise
+        return stats
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.executes:
+            # 交还租约，其他进程可以立即接手，不必等租约过期
+            try:
+                released = self.run_queue.release_all()
+                if released:
+                    print(f"已交还 {released} 个未完成的执行")
+                self.run_queue.heartbeat(self.role, status='stopped')
+            except Exception as e:
+                print(f"交还执行租约失败: {str(e)}")
+        try:
+            self.engine.run_coroutine(self.picker.close()).result(timeout=30)
+        except Exception as e:
+            print(f"关闭选择器浏览器失败: {str(e)}")
+        try:
+            self.engine.run_coroutine(self.browser_pool.close()).result(timeout=30)
+        except Exception as e:
+            print(f"关闭浏览器池失败: {str(e)}")
+        try:
+            self.engine.run_coroutine(self.http_fetcher.close()).result(timeout=10)
+        except Exception as e:
+            print(f"关闭 HTTP 连接池失败: {str(e)}")
+        try:
+            self.engine.run_coroutine(self.llm.close()).result(timeout=10)
+        except Exception as e:
+            print(f"关闭大模型客户端失败: {str(e)}")
+        self.engine.stop()
+        self.db.close()
+
+    def _gauges(self):
+        return (metrics.flatten_stats('omni_engine', self.engine.stats())
+                + metrics.flatten_stats('omni_browser_pool', self.browser_pool.stats())
+                + metrics.flatten_stats('omni_http', self.http_fetcher.stats())
+                + metrics.flatten_stats('omni_resources', self.resource_meter.stats())
+                + metrics.flatten_stats('omni_politeness', self.limiter.stats())
+                + metrics.flatten_stats('omni_llm', self.llm.stats()))
+
+    def metrics_text(self):
+        """Prometheus 文本格式的指标；api 模式下同时包含各存活 worker 随心跳上报的指标。"""
+        owner = self.run_queue.owner
+        snapshots = [({'worker': owner}, metrics.REGISTRY.snapshot())]
+        gauges = [(name, {'worker': owner}, value) for name, _, value in self._gauges()]
+        workers = self.workers()
+        for worker in workers:
+            stats = worker.get('stats') or {}
+            if worker['id'] == owner or not worker['alive'] or 'metrics' not in stats:
+                continue
+            snapshots.append(({'worker': worker['id']}, stats['metrics']))
+            gauges += [(name, {'worker': worker['id']}, value) for name, _, value in stats.get('gauges', [])]
+        # 共享的数据库和进程无关，只输出一次
+        gauges += metrics.flatten_stats('omni_run_queue', self.run_queue.stats())
+        gauges += metrics.flatten_stats('omni_summary_cache', self.summary_cache.stats())
+        gauges += metrics.flatten_stats('omni_events', self.events.stats())
+        gauges += metrics.flatten_stats('omni_picker', self.engine.call(self.picker.stats))
+        gauges.append(('omni_workers_alive', {}, sum(1 for w in workers if w['alive'])))
+        return metrics.render(snapshots, sorted(gauges, key=lambda g: g[0]))
+
+    def maintain_picker(self):
+        try:
+            self.engine.run_coroutine(self.picker.maintain()).result(timeout=30)
+        except Exception as e:
+            print(f"清理选择器会话失败: {str(e)}")
+
+    def browser_stats(self):
+        return {**self.browser_pool.stats(), 'http': self.http_fetcher.stats(),
+                'resources': self.resource_meter.stats(), 'picker': self.engine.call(self.picker.stats)}
+
+    def engine_stats(self):
+        return {**self.engine.stats(), 'politeness': self.limiter.stats(), 'run_queue': self.run_queue.stats()}
+
+    def llm_stats(self):
+        return {**self.llm.stats(), 'cache': self.summary_cache.stats()}
+
     def set_custom_prompt(self, task_id, custom_prompt):
-        conn = sqlite3.connect('scraper.db')
-        c = conn.cursor()
-        c.execute('INSERT OR REPLACE INTO prompts (task_id, custom_prompt) VALUES (?, ?)',
-                 (task_id, custom_prompt))
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('INSERT OR REPLACE INTO prompts (task_id, custom_prompt) VALUES (?, ?)',
+                     (task_id, custom_prompt))
+            conn.commit()
 
     def get_custom_prompt(self, task_id):
-        conn = sqlite3.connect('scraper.db')
-        c = conn.cursor()
-        c.execute('SELECT custom_prompt FROM prompts WHERE task_id = ?', (task_id,))
-        result = c.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT custom_prompt FROM prompts WHERE task_id = ?', (task_id,))
+            result = c.fetchone()
         return result[0] if result else ""
 
-    async def generate_summary(self, task_id, content):
-        custom_prompt = self.get_custom_prompt(task_id)
-        soup = BeautifulSoup(content, 'html.parser')
+    async def generate_summary(self, task_id, content, previous_content=None):
+        custom_prompt = await asyncio.to_thread(self.get_custom_prompt, task_id)
+        
+        content_text = None
+        settings = await asyncio.to_thread(self.get_task_settings, task_id)
+        if previous_content and settings.get('summary_mode') == 'delta':
+            # 大片段解析要几秒，和提取文本一样放到线程池里，不阻塞引擎循环
+            with metrics.span('diff'):
+                delta = await asyncio.get_running_loop().run_in_executor(
+                    None, diff.diff_fragments, previous_content, content, settings.get('url'),
+                    settings.get('ignore_selectors')
+                )
+            # 条目层面没有变化（例如只改了属性）时退回到总结整个片段
+            if not diff.is_empty(delta):
+                content_text = diff.format_delta(delta)
+        
+        if content_text is None:
+            # 一次线性解析，相对链接按任务地址一次性补全
+            with metrics.span('extract_text'):
+                content_text = await asyncio.get_running_loop().run_in_executor(
+                    None, extractor.extract_text, content, settings.get('url')
+                )
         
-        # 处理链接和文本
-        processed_content = []
-        for element in soup.descendants:
-            if element.name == 'a':
-                href = element.get('href', '')
-                text = element.get_text(strip=True)
-                if href and text:
-                    if href.startswith(('/', './')):
-                        conn = sqlite3.connect('scraper.db')
-                        c = conn.cursor()
-                        c.execute('SELECT url FROM tasks WHERE id = ?', (task_id,))
-                        task_url = c.fetchone()[0]
-                        conn.close()
-                        base_url = f"{urlparse(task_url).scheme}://{urlparse(task_url).netloc}"
-                        href = urljoin(base_url, href)
-                    processed_content.append(f'<a href="{href}">{text}</a>')
-            elif element.string and element.string.strip():
-                if element.parent.name != 'a':
-                    processed_content.append(element.string.strip())
+        # 相同内容 + 相同提示词 + 相同模型只调用一次大模型
+        cache_key = summary_key(content_text, custom_prompt, self.base_prompt, self.llm.model)
+        cached = await asyncio.to_thread(self.summary_cache.get, cache_key)
+        if cached is not None:
+            metrics.count('summary_cache_hits')
+            return cached
+        metrics.count('summary_cache_misses')
         
-        content_text = '\n'.join(processed_content)
         final_prompt = f"{custom_prompt}\n\n{self.base_prompt}\n\n{content_text}"
+        with metrics.span('llm'):
+            summary = await self.llm.generate(final_prompt)
+        await asyncio.to_thread(self.summary_cache.put, cache_key, summary, self.llm.model)
+        return summary
 
-        response = requests.post(
-            'http://172.31.118.255:11434/api/generate',
-            json={'model': 'glm4:latest', 'prompt': final_prompt, 'stream': False}
-        )
+    def submit_run(self, task_id, url, selector, trigger='manual', block=True, timeout=None, run_id=None):
+        run_id, job = self._submit_job(task_id, url, selector, trigger, block, timeout, run_id)
+        return job.run_id if job is not None else run_id
+
+    def _submit_job(self, task_id, url, selector, trigger, block, timeout, run_id=None):
+        # 先写入持久化队列并由本进程领取，再交给引擎；返回 (run_id, job)
+        # api 模式只写入队列，由 worker 领取
+        run_id, created = self.run_queue.enqueue(task_id, trigger, run_id, claim=self.executes)
+        if created:
+            self.events.publish('run', run_id=run_id, task_id=task_id, status='queued', stage=None,
+                                changed=False, error=None)
+        if not created or not self.executes:
+            # 同一次定时触发已经写入过
+            return run_id, None
+        return run_id, self._dispatch_run(run_id, task_id, url, selector, block, timeout)
+
+    def _dispatch_run(self, run_id, task_id, url, selector, block=False, timeout=None):
+        try:
+            job = self.engine.submit(task_id, url, selector, run_id=run_id, block=block, timeout=timeout)
+        except QueueFull as e:
+            # 引擎已满，执行留在队列里，由 pump_runs 稍后领取
+            print(f"任务 {task_id} 暂时无法执行，留在队列中: {str(e)}")
+            self.run_queue.release(run_id)
+            return None
         
-        if response.status_code == 200:
-            return response.json().get('response', '')
-        return None
+        # 任务已在排队或执行中，合并到已有的那次执行
+        if job.run_id != run_id:
+            self.run_queue.delete(run_id)
+        return job
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        if now - self._last_heartbeat < config.WORKER_HEARTBEAT_SECONDS:
+            return
+        self._last_heartbeat = now
+        engine = self.engine.stats()
+        stats = {key: engine[key] for key in ('running', 'queue_depth', 'completed', 'failed')}
+        # API 进程的 /metrics 从心跳里读取各 worker 的直方图和计数器
+        stats['metrics'] = metrics.REGISTRY.snapshot()
+        stats['gauges'] = self._gauges()
+        self.run_queue.heartbeat(self.role, stats=stats)
+
+    def _current_event_marks(self):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT COALESCE(MAX(id), 0) FROM results')
+            return c.fetchone()[0], time.time()
+
+    def forward_events(self):
+        if not self.events.has_subscribers():
+            self._event_marks = None
+            return
+        try:
+            if self._event_marks is None:
+                self._event_marks = self._current_event_marks()
+            last_result_id, last_run_update = self._event_marks
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''SELECT id, task_id, status, stage, changed, error, updated_at FROM runs
+                            WHERE updated_at > ? ORDER BY updated_at LIMIT 500''', (last_run_update,))
+                runs = c.fetchall()
+                c.execute('''SELECT id, task_id, summary, error, timestamp, is_new FROM results
+                            WHERE id > ? ORDER BY id LIMIT 500''', (last_result_id,))
+                results = c.fetchall()
+            for row in runs:
+                self.events.publish('run', run_id=row['id'], task_id=row['task_id'], status=row['status'],
+                                    stage=row['stage'], changed=bool(row['changed']), error=row['error'])
+                last_run_update = row['updated_at']
+            for row in results:
+                self.events.publish('result', task_id=row['task_id'], result_id=row['id'],
+                                    summary=row['summary'], error=row['error'],
+                                    timestamp=row['timestamp'], is_new=bool(row['is_new']))
+                last_result_id = row['id']
+            self._event_marks = (last_result_id, last_run_update)
+        except Exception as e:
+            print(f"转发变更通知失败: {str(e)}")
+
+    def workers(self):
+        return self.run_queue.workers(timeout=config.WORKER_HEARTBEAT_SECONDS * 3)
+
+    def pump_runs(self):
+        # 续租、回收中断的执行，并按引擎空位领取到期的执行
+        try:
+            self._heartbeat()
+            self.run_queue.renew()
+            self.run_queue.recover()
+            for run_id, task_id, url, selector, active in self.run_queue.claim_due(
+                    self.engine.free_capacity(prefetch=self.engine.concurrency * 2)):
+                if url is None or not active:
+                    self._update_run(run_id, status='failed', stage='done', error='任务已删除或已停用')
+                    continue
+                if self._dispatch_run(run_id, task_id, url, selector) is None:
+                    break
+        except Exception as e:
+            print(f"处理执行队列失败: {str(e)}")
+
+    def get_run(self, run_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id, task_id, trigger, status, stage, tier, changed, error, stats,
+                                created_at, started_at, finished_at
+                        FROM runs WHERE id = ?''', (run_id,))
+            row = c.fetchone()
+        if not row:
+            return None
+        run = dict(row)
+        run['stats'] = json.loads(run['stats']) if run['stats'] else None
+        return run
+
+    def _update_run(self, run_id, status=None, stage=None, changed=None, error=None, tier=None,
+                    stats=None):
+        if run_id is None:
+            return
+        fields, params = ['updated_at = ?'], [time.time()]
+        for column, value in (('status', status), ('stage', stage), ('changed', changed),
+                              ('error', error), ('tier', tier)):
+            if value is not None:
+                fields.append(f'{column} = ?')
+                params.append(value)
+        if stats is not None:
+            # 各阶段分别写入的统计合并到一起
+            fields.append("stats = json_patch(COALESCE(stats, '{}'), ?)")
+            params.append(json.dumps(stats))
+        if status == 'running':
+            fields.append('started_at = CURRENT_TIMESTAMP')
+        elif status in ('succeeded', 'failed'):
+            fields.append('finished_at = CURRENT_TIMESTAMP')
+            fields.append('lease_owner = NULL')
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute(f'UPDATE runs SET {", ".join(fields)} WHERE id = ?', (*params, run_id))
+            conn.commit()
+            if status is None and stage is None:
+                return
+            c.execute('SELECT task_id, status, stage, changed, error FROM runs WHERE id = ?', (run_id,))
+            row = c.fetchone()
+        if row:
+            self.events.publish('run', run_id=run_id, task_id=row['task_id'], status=row['status'],
+                                stage=row['stage'], changed=bool(row['changed']), error=row['error'])
 
     def scrape_task(self, task_id, url, selector):
-        if sys.platform == 'win32':
-            loop = asyncio.ProactorEventLoop()
-        else:
-            loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
+        # 同步执行一次并等待完成
+        run_id, job = self._submit_job(task_id, url, selector, 'manual', True, config.ENGINE_SUBMIT_TIMEOUT)
+        if job is None:
+            raise QueueFull(f"执行 {run_id} 已留在队列中等待 worker 领取")
+        return job.future.result()
+
+    def enqueue_task(self, task_id, url, selector, schedule_data=None):
+        # 定时任务触发时只写入队列；执行 id 由触发时间决定，重复触发（例如多个进程）只执行一次
+        run_id = None
+        if schedule_data is not None:
+            fire_time = previous_fire_time(self._cron_trigger(schedule_data),
+                                           datetime.now(self.scheduler.timezone), timedelta(days=1))
+            if fire_time is not None:
+                run_id = scheduled_run_id(task_id, fire_time)
+        self.submit_run(task_id, url, selector, trigger='schedule', block=False, run_id=run_id)
+
+    def enqueue_due(self):
+        """把到期的自适应调度任务写入队列，返回写入的执行数。
+
+        入队前先把下次时间推后一个当前间隔：执行结束后会按结果重新计算，执行丢失时也会再次触发。
+        """
+        now = time.time()
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id, schedule, next_run_at, interval_seconds FROM tasks
+                        WHERE active = 1 AND next_run_at IS NOT NULL AND next_run_at <= ?
+                        ORDER BY next_run_at''', (now,))
+            due = c.fetchall()
+            runs = []
+            for task_id, schedule, next_run_at, interval in due:
+                try:
+                    policy = self.adaptive_schedule(json.loads(schedule))
+                except ValueError as e:
+                    print(f"任务 {task_id} 的自适应调度参数无效: {str(e)}")
+                    continue
+                if policy is None:
+                    continue
+                # 期间执行已经结束并重新计算过下次时间的不再覆盖
+                c.execute('UPDATE tasks SET next_run_at = ? WHERE id = ? AND next_run_at = ?',
+                          (now + policy.clamp(interval or policy.min_seconds), task_id, next_run_at))
+                if c.rowcount:
+                    fire_time = datetime.fromtimestamp(next_run_at, self.scheduler.timezone)
+                    runs.append((scheduled_run_id(task_id, fire_time), task_id))
+            conn.commit()
+        # 停机后大量任务同时到期时，与启动补跑一样错开放入队列
+        return self.run_queue.enqueue_many(runs, 'adaptive', stagger=config.RESTORE_STAGGER_SECONDS)
+
+    def _reschedule(self, task_id, run_id, failed):
+        # 自适应调度的任务按最近的结果和执行历史计算下次抓取时间，返回间隔（秒）；固定时间的任务返回 None
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('SELECT schedule FROM tasks WHERE id = ?', (task_id,))
+                row = c.fetchone()
+                policy = self.adaptive_schedule(json.loads(row[0])) if row else None
+                if policy is None:
+                    return None
+                c.execute('''SELECT timestamp, error FROM results WHERE task_id = ?
+                            ORDER BY id DESC LIMIT ?''', (task_id, config.ADAPTIVE_HISTORY))
+                times = adaptive.change_times(c.fetchall())
+                errors = 0
+                if failed:
+                    # 本次执行还没有标记结束，只看之前已经结束的执行
+                    c.execute('''SELECT status FROM runs
+                                WHERE task_id = ? AND id IS NOT ? AND status IN ('succeeded', 'failed')
+                                ORDER BY updated_at DESC LIMIT ?''',
+                              (task_id, run_id, config.ADAPTIVE_HISTORY))
+                    errors = adaptive.error_streak(True, [r[0] for r in c.fetchall()])
+                now = time.time()
+                interval = policy.interval(times, errors, now)
+                c.execute('UPDATE tasks SET interval_seconds = ?, next_run_at = ? WHERE id = ?',
+                          (interval, now + interval, task_id))
+                conn.commit()
+            return interval
+        except Exception as e:
+            print(f"任务 {task_id} 计算下次抓取时间失败: {str(e)}")
+            return None
+
+    async def _scrape_task_async(self, task_id, url, selector, run_id=None):
+        trace, token = metrics.start_trace()
         try:
-            return loop.run_until_complete(self._scrape_task_async(task_id, url, selector))
+            await asyncio.to_thread(self._update_run, run_id, status='running', stage='fetching')
+            try:
+                changed = await self._scrape(task_id, url, selector, run_id, trace)
+            except RateLimited as e:
+                changed = await self._handle_rate_limited(task_id, url, run_id, e)
+            except Exception as e:
+                trace.fail(e)
+                metrics.REGISTRY.inc('omni_runs_total', status='failed')
+                await asyncio.to_thread(self._update_run, run_id, status='failed', stage='done',
+                                        error=str(e), stats={'trace': trace.to_dict()})
+                raise
+            self._rate_limit_attempts.pop(task_id, None)
+            status = 'succeeded' if changed is not None else 'failed'
+            metrics.REGISTRY.inc('omni_runs_total', status=status)
+            metrics.REGISTRY.observe('omni_run_seconds', time.perf_counter() - trace.started, status=status)
+            stats = {'trace': trace.to_dict()}
+            interval = await asyncio.to_thread(self._reschedule, task_id, run_id, status == 'failed')
+            if interval is not None:
+                stats['next_interval'] = round(interval)
+            await asyncio.to_thread(self._update_run, run_id, status=status, stage='done',
+                                    changed=int(bool(changed)), stats=stats)
+            return changed
+        except RetryLater:
+            metrics.REGISTRY.inc('omni_runs_total', status='retried')
+            await asyncio.to_thread(self._update_run, run_id, stats={'trace': trace.to_dict()})
+            raise
         finally:
-            loop.close()
+            metrics.end_trace(token)
 
-    async def _scrape_task_async(self, task_id, url, selector):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            page = await context.new_page()
+    async def _handle_rate_limited(self, task_id, url, run_id, error):
+        # 服务端要求等待：在次数和时长允许时整次执行重新排队，否则记为失败
+        delay = error.retry_after if error.retry_after is not None else config.POLITENESS_DEFAULT_RETRY_AFTER
+        attempts = self._rate_limit_attempts.get(task_id, 0) + 1
+        if attempts <= config.POLITENESS_MAX_RETRIES and delay <= config.POLITENESS_MAX_RETRY_AFTER:
+            self._rate_limit_attempts[task_id] = attempts
+            await asyncio.to_thread(self._update_run, run_id, status='queued', stage='waiting', error=str(error))
+            print(f"任务 {task_id} 被限速，{delay:.0f} 秒后第 {attempts} 次重试")
+            raise RetryLater(str(error), delay)
+        # 放弃本次执行，但同域名的其他任务仍要等待
+        self.limiter.penalize(urlparse(url).netloc.lower(), delay)
+        await asyncio.to_thread(self._save_error, task_id, str(error))
+        await asyncio.to_thread(self._update_run, run_id, error=str(error))
+        return None
+
+    async def _scrape(self, task_id, url, selector, run_id, trace=None):
+        # 返回内容是否变化；抓取失败时写入错误结果并返回 None。
+        # 读写数据库都放到线程里，SQLite 等锁时不会卡住引擎循环上的其他抓取
+        try:
+            with metrics.span('load_task'):
+                settings = await asyncio.to_thread(self.get_task_settings, task_id)
+                last_result = await asyncio.to_thread(self._last_result, task_id)
+            with metrics.span('fetch'):
+                fetched = await self._fetch(task_id, url, selector, settings, last_result is not None, run_id)
+            
+            # HTTP 304：与上一次成功抓取的内容相同
+            if fetched.not_modified:
+                return False
             
+            content = fetched.content
+            if not content.strip():
+                raise ValueError("Empty content")
+            
+            with metrics.span('hash'):
+                # 规范化要构建整棵 DOM，大片段需要秒级时间，放到线程池里算
+                content_hash = await asyncio.get_running_loop().run_in_executor(
+                    None, content_digest, content, settings.get('ignore_selectors')
+                )
+            changed = not last_result or last_result[0] != content_hash
+            if changed:
+                await asyncio.to_thread(self._update_run, run_id, stage='summarizing')
+                previous_content = last_result[1] if last_result else None
+                with metrics.span('summarize'):
+                    summary = await self.generate_summary(task_id, content, previous_content)
+                await asyncio.to_thread(self._update_run, run_id, stage='saving')
+                with metrics.span('db_write'):
+                    await asyncio.to_thread(self._save_result, task_id, content, content_hash, summary)
+            
+            await asyncio.to_thread(self.http_fetcher.remember, task_id, url, fetched.etag,
+                                    fetched.last_modified)
+            return changed
+            
+        except RateLimited:
+            raise
+        except Exception as e:
+            # 错误结果照旧写入 results，出错阶段和异常类型记在 runs.stats 里
+            if trace is not None:
+                trace.fail(e)
+            await asyncio.to_thread(self._save_error, task_id, str(e))
+            await asyncio.to_thread(self._update_run, run_id, error=str(e))
+            return None
+
+    async def _fetch(self, task_id, url, selector, settings, conditional, run_id):
+        tier = settings.get('fetch_tier') or 'auto'
+        http_missed = False
+        # 先试上次命中的选择器，再按稳定程度试其余候选
+        selectors = locators.resolution_order(selector, settings.get('selector_candidates') or [],
+                                              settings.get('selector_resolved'))
+        if not settings.get('needs_js') and tier != 'browser':
+            validators = await asyncio.to_thread(self.http_fetcher.validators, task_id) if conditional else None
+            started = time.monotonic()
             try:
-                await page.goto(url, wait_until='domcontentloaded')
-                await page.wait_for_load_state('networkidle')
-                
-                element = page.locator(selector)
-                await element.wait_for(state='attached')
-                content = await element.inner_html()
-                
-                if not content.strip():
-                    raise ValueError("Empty content")
-                
-                conn = sqlite3.connect('scraper.db')
-                c = conn.cursor()
-                
-                content_hash = hash(content)
-                c.execute('SELECT content_hash FROM results WHERE task_id = ? ORDER BY timestamp DESC LIMIT 1',
-                         (task_id,))
-                last_result = c.fetchone()
-                
-                if not last_result or last_result[0] != content_hash:
-                    summary = await self.generate_summary(task_id, content)
-                    c.execute('UPDATE results SET is_new = 0 WHERE task_id = ?', (task_id,))
-                    c.execute('''INSERT INTO results (task_id, content, content_hash, summary, is_new)
-                                VALUES (?, ?, ?, ?, 1)''', (task_id, content, content_hash, summary))
-                    conn.commit()
-                
-                conn.close()
+                fetched = await self.http_fetcher.fetch(url, selectors, validators)
+            except NeedsBrowser as e:
+                print(f"任务 {task_id} HTTP 抓取未命中，改用浏览器: {str(e)}")
+                http_missed = True
+            except FetchError as e:
+                if e.status in RATE_LIMIT_STATUSES:
+                    # 换浏览器只会再打一次同一个站点
+                    raise RateLimited(str(e), parse_retry_after(e.headers.get('Retry-After')))
+                # 网络错误不能说明页面需要 JS，本次用浏览器兜底，不改变已记住的层级
+                print(f"任务 {task_id} HTTP 请求失败，改用浏览器: {str(e)}")
+            else:
+                if tier != 'http':
+                    await asyncio.to_thread(self._set_fetch_tier, task_id, 'http')
+                await asyncio.to_thread(self._remember_selector, task_id, selector, settings, fetched.selector)
+                await asyncio.to_thread(self._update_run, run_id, tier='http', stats={
+                    'bytes_loaded': fetched.size,
+                    'not_modified': fetched.not_modified,
+                    'time_to_selector': round(time.monotonic() - started, 3),
+                    'selector': fetched.selector,
+                })
+                return fetched
+        
+        await asyncio.to_thread(self._update_run, run_id, tier='browser')
+        try:
+            policy = ResourcePolicy.from_json(settings.get('resource_policy'), self.default_resource_policy)
+        except (ValueError, TypeError) as e:
+            print(f"任务 {task_id} 资源策略无效，使用默认策略: {str(e)}")
+            policy = self.default_resource_policy
+        with metrics.span('browser_fetch'):
+            content, used = await self._fetch_with_browser(url, selectors, policy, run_id)
+        await asyncio.to_thread(self._remember_selector, task_id, selector, settings, used)
+        if http_missed:
+            # 第一次未命中退回 auto，连续未命中才认定需要浏览器
+            await asyncio.to_thread(self._set_fetch_tier, task_id, 'browser' if tier == 'auto' else 'auto')
+        return FetchResult(content)
+
+    async def _fetch_with_browser(self, url, selectors, policy, run_id):
+        # 返回 (inner_html, 命中的选择器)
+        stats = self.resource_meter.page()
+        used = None
+        try:
+            async with self.browser_pool.context() as context:
+                await resource_policy.install(context, policy, stats)
+                page = await context.new_page()
+                with metrics.span('navigation'):
+                    response = await page.goto(url, wait_until='domcontentloaded')
+                if response is not None and response.status in RATE_LIMIT_STATUSES:
+                    raise RateLimited(f"HTTP {response.status}",
+                                      parse_retry_after(await response.header_value('retry-after')))
                 
-            except Exception as e:
-                conn = sqlite3.connect('scraper.db')
-                c = conn.cursor()
-                c.execute('''INSERT INTO results (task_id, content, is_new)
-                            VALUES (?, ?, 1)''', (task_id, str(e)))
-                conn.commit()
-                conn.close()
-            
-            finally:
-                await browser.close()
+                if policy.early_exit:
+                    # 选择器出现即返回，不等广告、统计脚本把网络跑完
+                    stats.early_exit = True
+                else:
+                    try:
+                        with metrics.span('network_idle'):
+                            await page.wait_for_load_state('networkidle', timeout=config.BROWSER_IDLE_TIMEOUT * 1000)
+                    except PlaywrightTimeoutError:
+                        print(f"{url} 等待 networkidle 超时，继续读取内容")
+                with metrics.span('selector_wait'):
+                    element, used = await locators.locate(page, selectors, config.SELECTOR_TIMEOUT)
+                stats.selector_found()
+                with metrics.span('extract'):
+                    return await element.inner_html(), used
+        finally:
+            self.resource_meter.record(stats)
+            await asyncio.to_thread(self._update_run, run_id, stats={**stats.to_dict(), 'selector': used})
+
+    def _remember_selector(self, task_id, selector, settings, used):
+        # 记住命中的选择器，下次优先尝试；主选择器失效时由候选接替
+        if used is None or used == (settings.get('selector_resolved') or selector):
+            return
+        if used != selector:
+            print(f"任务 {task_id} 的主选择器未命中，改用候选选择器: {used}")
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('UPDATE tasks SET selector_resolved = ? WHERE id = ?', (used, task_id))
+            conn.commit()
+
+    def _set_fetch_tier(self, task_id, tier):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('UPDATE tasks SET fetch_tier = ? WHERE id = ?', (tier, task_id))
+            conn.commit()
+
+    def _last_result(self, task_id):
+        # 跳过错误记录（content_hash 为空），只和上一次成功抓取的内容比较
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT content_hash, content, blob_digest FROM results
+                        WHERE task_id = ? AND content_hash IS NOT NULL
+                        ORDER BY timestamp DESC, id DESC LIMIT 1''', (task_id,))
+            row = c.fetchone()
+            if not row:
+                return None
+            content = row[1] if row[1] is not None else self.blobs.get(c, row[2])
+            return row[0], content
+
+    def _save_result(self, task_id, content, content_hash, summary):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            digest = self.blobs.put(c, content)
+            c.execute('UPDATE results SET is_new = 0 WHERE task_id = ? AND is_new = 1', (task_id,))
+            c.execute('''INSERT INTO results (task_id, blob_digest, content_hash, summary, is_new)
+                        VALUES (?, ?, ?, ?, 1)''', (task_id, digest, content_hash, summary))
+            result_id = c.lastrowid
+            conn.commit()
+        self._publish_result(task_id, result_id, summary=summary)
+
+    def _save_error(self, task_id, error):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT INTO results (task_id, error, is_new)
+                        VALUES (?, ?, 1)''', (task_id, error))
+            result_id = c.lastrowid
+            conn.commit()
+        self._publish_result(task_id, result_id, error=error)
+
+    def _publish_result(self, task_id, result_id, summary=None, error=None):
+        self.events.publish('result', task_id=task_id, result_id=result_id, summary=summary, error=error,
+                            timestamp=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), is_new=True)
 
     # 添加新方法用于获取任务结果
     def get_task_results(self, task_id, only_new=False):
         try:
-            conn = sqlite3.connect('scraper.db')
-            c = conn.cursor()
-            
-            if only_new:
-                c.execute('''SELECT content, summary, timestamp 
-                            FROM results 
-                            WHERE task_id = ? AND is_new = 1
-                            ORDER BY timestamp DESC''', (task_id,))
-            else:
-                c.execute('''SELECT content, summary, timestamp 
-                            FROM results 
-                            WHERE task_id = ?
-                            ORDER BY timestamp DESC''', (task_id,))
-            
-            results = c.fetchall()
-            conn.close()
-            return results
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                
+                query = '''SELECT r.content, r.error, b.codec, b.data, r.summary, r.timestamp
+                           FROM results r LEFT JOIN blobs b ON b.digest = r.blob_digest
+                           WHERE r.task_id = ?'''
+                if only_new:
+                    query += ' AND r.is_new = 1'
+                c.execute(query + ' ORDER BY r.timestamp DESC, r.id DESC', (task_id,))
+                
+                results = []
+                for row in c.fetchall():
+                    content = row['content']
+                    if content is None:
+                        content = row['error'] if row['error'] is not None \
+                            else self.blobs.decode(row['codec'], row['data'])
+                    results.append((content, row['summary'], row['timestamp']))
+                return results
         except Exception as e:
             print(f"获取任务结果失败: {str(e)}")
             return []
@@ -0,0 +1,345 @@
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .fingerprint import content_digest, is_digest, DIGEST_SIZE
+
+
+# 变化时会让任务 version 加一的列，也就是用户设置的和读接口展示的任务属性
+VERSIONED_TASK_COLUMNS = ('url', 'selector', 'schedule', 'active', 'custom_prompt', 'ignore_selectors',
+                          'summary_mode', 'retention_keep_last', 'retention_days', 'needs_js', 'fetch_tier',
+                          'resource_policy', 'selector_candidates', 'selector_resolved')
+
+class Database:
+    """SQLite 连接池，WAL 模式，带按版本号执行的表结构迁移。
+
+    连接在线程之间复用（同一时刻只被一个线程持有），sqlite3 会在每个连接上缓存
+    预编译语句，复用连接即可复用这些语句。
+    """
+
+    def __init__(self, path='scraper.db', pool_size=8, timeout=30.0, statement_cache=256):
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.statement_cache = statement_cache
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._pool.get(timeout=self.timeout)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            # 未提交的写入和原来 conn.close() 的行为一致：丢弃
+            conn.rollback()
+        self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # 连接可能已损坏，丢弃并让池重新创建
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def migrate(self):
+        with self.connection() as conn:
+            c = conn.cursor()
+            current = c.execute('PRAGMA user_version').fetchone()[0]
+            for version, migration in MIGRATIONS:
+                if version <= current:
+                    continue
+                migration(c)
+                c.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+                print(f"数据库已迁移到版本 {version}")
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'pool_size': self.pool_size,
+            'connections': self._created,
+            'idle_connections': self._pool.qsize(),
+        }
+
+
+def column_names(c, table):
+    c.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in c.fetchall()}
+
+
+def add_column(c, table, column, definition):
+    if column not in column_names(c, table):
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+# 迁移都写成可重复执行的形式，兼容由旧版本 init_database 建出来的库
+
+def _initial_schema(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS tasks
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 url TEXT NOT NULL,
+                 selector TEXT NOT NULL,
+                 schedule TEXT NOT NULL,
+                 active INTEGER DEFAULT 1)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS results
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 task_id INTEGER,
+                 content TEXT,
+                 content_hash TEXT,
+                 summary TEXT,
+                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 is_new BOOLEAN DEFAULT 1,
+                 FOREIGN KEY (task_id) REFERENCES tasks (id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS prompts
+                (task_id INTEGER PRIMARY KEY,
+                 custom_prompt TEXT,
+                 FOREIGN KEY (task_id) REFERENCES tasks (id))''')
+
+
+def _runs(c):
+    # 每次执行（立即执行、定时触发、手动触发）一条记录，供 /runs/{id} 查询进度
+    c.execute('''CREATE TABLE IF NOT EXISTS runs
+                (id TEXT PRIMARY KEY,
+                 task_id INTEGER,
+                 trigger TEXT,
+                 status TEXT DEFAULT 'queued',
+                 stage TEXT,
+                 changed INTEGER DEFAULT 0,
+                 error TEXT,
+                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 started_at DATETIME,
+                 finished_at DATETIME,
+                 FOREIGN KEY (task_id) REFERENCES tasks (id))''')
+
+
+def _summary_cache(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS summary_cache
+                (key TEXT PRIMARY KEY,
+                 summary TEXT NOT NULL,
+                 model TEXT,
+                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 last_used_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 hits INTEGER DEFAULT 0)''')
+
+
+def _stable_content_hash(c):
+    add_column(c, 'tasks', 'ignore_selectors', "TEXT DEFAULT '[]'")
+    # 旧版本用 Python 内置 hash()，每次重启都会变，按新的规范化摘要重算
+    c.execute('SELECT id, ignore_selectors FROM tasks')
+    ignore_by_task = {row[0]: json.loads(row[1] or '[]') for row in c.fetchall()}
+    c.execute('''SELECT id, task_id, content, content_hash FROM results
+                WHERE content_hash IS NOT NULL AND length(content_hash) != ?''', (DIGEST_SIZE * 2,))
+    updates = [
+        (content_digest(content or '', ignore_by_task.get(task_id)), result_id)
+        for result_id, task_id, content, content_hash in c.fetchall()
+        if not is_digest(content_hash)
+    ]
+    if updates:
+        c.executemany('UPDATE results SET content_hash = ? WHERE id = ?', updates)
+        print(f"已迁移 {len(updates)} 条结果的内容摘要")
+
+
+def _summary_mode(c):
+    # full: 总结整个片段；delta: 只总结相对上一次的变化部分
+    add_column(c, 'tasks', 'summary_mode', "TEXT DEFAULT 'full'")
+
+
+def _indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_results_task_time ON results (task_id, timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_results_task_new ON results (task_id, is_new)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_runs_task_created ON runs (task_id, created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_summary_cache_used ON summary_cache (last_used_at)')
+
+
+def _blob_offload(c):
+    # 原始 HTML 压缩后按内容寻址存入 blobs，results 只保留引用；错误信息单独存放
+    c.execute('''CREATE TABLE IF NOT EXISTS blobs
+                (digest TEXT PRIMARY KEY,
+                 codec TEXT NOT NULL,
+                 data BLOB NOT NULL,
+                 size INTEGER,
+                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    add_column(c, 'results', 'blob_digest', 'TEXT')
+    add_column(c, 'results', 'error', 'TEXT')
+    # 保留策略，NULL 表示使用全局默认值，0 表示不限制
+    add_column(c, 'tasks', 'retention_keep_last', 'INTEGER')
+    add_column(c, 'tasks', 'retention_days', 'INTEGER')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_results_blob ON results (blob_digest)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_results_inline ON results (id) WHERE content IS NOT NULL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_runs_finished ON runs (finished_at)')
+
+
+def _fetch_tier(c):
+    # auto: 先尝试 HTTP，未命中再用浏览器，并记住结果；http / browser: 已确定的层级
+    add_column(c, 'tasks', 'fetch_tier', "TEXT DEFAULT 'auto'")
+    add_column(c, 'tasks', 'needs_js', 'INTEGER DEFAULT 0')
+    add_column(c, 'runs', 'tier', 'TEXT')
+    c.execute('''CREATE TABLE IF NOT EXISTS http_validators
+                (task_id INTEGER PRIMARY KEY,
+                 url TEXT,
+                 etag TEXT,
+                 last_modified TEXT,
+                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 FOREIGN KEY (task_id) REFERENCES tasks (id))''')
+
+
+def _resource_policy(c):
+    # NULL 表示使用全局默认策略；runs.stats 记录每次执行的拦截与耗时统计
+    add_column(c, 'tasks', 'resource_policy', 'TEXT')
+    add_column(c, 'runs', 'stats', 'TEXT')
+
+
+def _run_queue(c):
+    # runs 同时作为持久化的执行队列：not_before / lease_expires_at 是 unix 秒
+    add_column(c, 'runs', 'not_before', 'REAL')
+    add_column(c, 'runs', 'lease_owner', 'TEXT')
+    add_column(c, 'runs', 'lease_expires_at', 'REAL')
+    add_column(c, 'runs', 'attempts', 'INTEGER DEFAULT 0')
+    c.execute("""UPDATE runs SET not_before = CAST(strftime('%s', created_at) AS REAL)
+                WHERE not_before IS NULL""")
+    # 旧版本留下的执行中记录所在进程已经不在了，让它们立即可以被恢复
+    c.execute("UPDATE runs SET lease_expires_at = 0 WHERE status = 'running' AND lease_expires_at IS NULL")
+    c.execute('CREATE INDEX IF NOT EXISTS idx_runs_queue ON runs (status, not_before)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_runs_lease ON runs (lease_owner)')
+
+
+def _workers(c):
+    # 每个执行进程一条记录，heartbeat_at 是 unix 秒
+    c.execute('''CREATE TABLE IF NOT EXISTS workers
+                (id TEXT PRIMARY KEY,
+                 host TEXT,
+                 pid INTEGER,
+                 role TEXT,
+                 status TEXT,
+                 started_at REAL,
+                 heartbeat_at REAL,
+                 stats TEXT)''')
+
+
+def _run_updated_at(c):
+    # 执行状态最后一次变化的 unix 秒，api 进程据此把 worker 的进度推送给前端
+    add_column(c, 'runs', 'updated_at', 'REAL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_runs_updated ON runs (updated_at)')
+
+
+def _task_versions(c):
+    # 任务或它的结果每变化一次 version 加一，读接口据此生成 ETag；updated_at 是 unix 秒
+    add_column(c, 'tasks', 'version', 'INTEGER DEFAULT 0')
+    add_column(c, 'tasks', 'updated_at', 'REAL')
+    now = "(julianday('now') - 2440587.5) * 86400.0"
+    c.execute(f'UPDATE tasks SET updated_at = {now} WHERE updated_at IS NULL')
+    # 用触发器维护，worker 进程、保留策略和整理数据库对结果的修改都会反映出来
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tasks_version AFTER UPDATE ON tasks
+                WHEN NEW.version IS OLD.version
+                BEGIN
+                    UPDATE tasks SET version = version + 1, updated_at = {now} WHERE id = NEW.id;
+                END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tasks_created AFTER INSERT ON tasks
+                BEGIN
+                    UPDATE tasks SET version = 1, updated_at = {now} WHERE id = NEW.id;
+                END''')
+    for event, row in (('INSERT', 'NEW'), ('DELETE', 'OLD'), ('UPDATE OF is_new, summary, error', 'NEW')):
+        name = event.split()[0].lower()
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_results_{name}_version AFTER {event} ON results
+                    BEGIN
+                        UPDATE tasks SET version = version + 1, updated_at = {now} WHERE id = {row}.task_id;
+                    END''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_results_new ON results (is_new, task_id)')
+
+
+def _selector_candidates(c):
+    # 选择器时记录的多个候选选择器（JSON），以及上一次抓取实际命中的那个
+    add_column(c, 'tasks', 'selector_candidates', 'TEXT')
+    add_column(c, 'tasks', 'selector_resolved', 'TEXT')
+
+
+def _adaptive_schedule(c):
+    # 自适应调度的任务：下次触发时间和当前抓取间隔（秒），固定时间的任务两者为空
+    add_column(c, 'tasks', 'next_run_at', 'REAL')
+    add_column(c, 'tasks', 'interval_seconds', 'REAL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tasks_next_run ON tasks (next_run_at)')
+
+
+def _task_version_columns(c):
+    # 只有用户可见的列变化才加 version；next_run_at、interval_seconds 每次调度都会改写，
+    # 不能让 /tasks 的 ETag 跟着每个周期失效（请求这两列时由读接口单独计入 ETag）
+    now = "(julianday('now') - 2440587.5) * 86400.0"
+    c.execute('DROP TRIGGER IF EXISTS trg_tasks_version')
+    c.execute(f'''CREATE TRIGGER trg_tasks_version AFTER UPDATE OF {", ".join(VERSIONED_TASK_COLUMNS)} ON tasks
+                WHEN NEW.version IS OLD.version
+                BEGIN
+                    UPDATE tasks SET version = version + 1, updated_at = {now} WHERE id = NEW.id;
+                END''')
+
+
+MIGRATIONS = [
+    (1, _initial_schema),
+    (2, _runs),
+    (3, _summary_cache),
+    (4, _stable_content_hash),
+    (5, _summary_mode),
+    (6, _indexes),
+    (7, _blob_offload),
+    (8, _fetch_tier),
+    (9, _resource_policy),
+    (10, _run_queue),
+    (11, _workers),
+    (12, _run_updated_at),
+    (13, _task_versions),
+    (14, _selector_candidates),
+    (15, _adaptive_schedule),
+    (16, _task_version_columns),
+]
@@ -0,0 +1,110 @@
+import hashlib
+import re
+import threading
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    return _WHITESPACE.sub(' ', text or '').strip()
+
+
+def summary_key(text, custom_prompt, base_prompt, model):
+    # 各部分之间用 \0 分隔，避免拼接后产生歧义
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (normalize_text(text), custom_prompt or '', base_prompt or '', model or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """按内容寻址的总结缓存，键为 (规范化文本, 自定义提示词, 基础提示词, 模型) 的摘要。
+
+    超过 max_age_days 未使用的条目和超出 max_entries 的最久未使用条目会被淘汰。
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, db, max_entries=10000, max_age_days=30):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT summary FROM summary_cache WHERE key = ?', (key,))
+            row = c.fetchone()
+            if row:
+                c.execute('''UPDATE summary_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+                            WHERE key = ?''', (key,))
+                conn.commit()
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, key, summary, model=None):
+        if summary is None:
+            return
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT OR REPLACE INTO summary_cache (key, summary, model)
+                        VALUES (?, ?, ?)''', (key, summary, model))
+            conn.commit()
+
+        with self._lock:
+            self._puts_since_prune += 1
+            due = self._puts_since_prune >= self.PRUNE_EVERY
+            if due:
+                self._puts_since_prune = 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        removed = 0
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            if self.max_age_days:
+                c.execute("DELETE FROM summary_cache WHERE last_used_at < datetime('now', ?)",
+                          (f'-{int(self.max_age_days)} days',))
+                removed += c.rowcount
+            if self.max_entries:
+                c.execute('''DELETE FROM summary_cache WHERE key IN
+                            (SELECT key FROM summary_cache
+                             ORDER BY last_used_at DESC, rowid DESC
+                             LIMIT -1 OFFSET ?)''', (int(self.max_entries),))
+                removed += c.rowcount
+            conn.commit()
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*) FROM summary_cache')
+            entries = c.fetchone()[0]
+
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'max_age_days': self.max_age_days,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,81 @@
+"""抓取 worker：从共享的执行队列领取任务并执行。
+
+    python -m backend.worker              # 按 CPU 核数启动进程
+    python -m backend.worker -n 4         # 启动 4 个进程
+
+API 进程使用 OMNI_MODE=api 时只负责调度和写入队列，执行全部交给 worker。
+每个进程有自己的浏览器池、抓取引擎和数据库连接池，通过 OMNI_DB_PATH 指向同一个数据库。
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from . import config
+
+
+def run_worker():
+    # 在子进程里导入，避免父进程持有浏览器或数据库连接
+    from .scheduler import ScraperScheduler
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+
+    scheduler = ScraperScheduler(role='worker')
+    print(f"worker {scheduler.run_queue.owner} 已启动")
+    try:
+        stop.wait()
+    finally:
+        scheduler.shutdown()
+        print(f"worker {scheduler.run_queue.owner} 已退出")
+
+
+def supervise(processes):
+    # 父进程只负责拉起子进程，子进程异常退出时重新启动
+    context = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+
+    def stop(*args):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def spawn(index):
+        process = context.Process(target=run_worker, name=f'scrape-worker-{index}')
+        process.start()
+        return process
+
+    workers = [spawn(i) for i in range(processes)]
+    while not stopping.wait(1.0):
+        for i, process in enumerate(workers):
+            if not process.is_alive():
+                print(f"worker 进程 {process.pid} 退出（{process.exitcode}），重新启动")
+                time.sleep(1.0)
+                workers[i] = spawn(i)
+
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join(timeout=60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动抓取 worker 进程')
+    parser.add_argument('-n', '--processes', type=int,
+                        default=config.WORKER_PROCESSES or os.cpu_count() or 1,
+                        help='worker 进程数，默认取 OMNI_WORKER_PROCESSES 或 CPU 核数')
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        run_worker()
+    else:
+        supervise(args.processes)
+
+
+if __name__ == '__main__':
+    main()
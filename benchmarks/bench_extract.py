@@ -0,0 +1,88 @@
+"""HTML 转文本的微基准：旧版 soup.descendants 遍历 vs backend.extractor。
+
+在仓库根目录运行：python -m benchmarks.bench_extract [--items 20000] [--repeat 3]
+"""
+import argparse
+import sqlite3
+import time
+from urllib.parse import urlparse, urljoin
+
+from bs4 import BeautifulSoup
+
+from backend import extractor
+
+
+TASK_URL = 'https://news.example.com/list/index.html'
+
+
+def make_fragment(items):
+    rows = []
+    for i in range(items):
+        rows.append(
+            f'<li class="item"><span class="date">2024-01-{i % 28 + 1:02d}</span>'
+            f'<a href="/article/{i}.html">第 {i} 条新闻标题 <b>重点</b></a>'
+            f'<p>摘要内容 {i}，包含一些 <em>强调</em> 文字和数字 {i * 7}。</p></li>'
+        )
+    return '<div class="list"><ul>' + ''.join(rows) + '</ul></div>'
+
+
+def legacy_extract(content, conn, task_id):
+    # 原 generate_summary 中的实现，每个相对链接都查询一次任务地址
+    soup = BeautifulSoup(content, 'html.parser')
+    processed_content = []
+    for element in soup.descendants:
+        if element.name == 'a':
+            href = element.get('href', '')
+            text = element.get_text(strip=True)
+            if href and text:
+                if href.startswith(('/', './')):
+                    c = conn.cursor()
+                    c.execute('SELECT url FROM tasks WHERE id = ?', (task_id,))
+                    task_url = c.fetchone()[0]
+                    base_url = f"{urlparse(task_url).scheme}://{urlparse(task_url).netloc}"
+                    href = urljoin(base_url, href)
+                processed_content.append(f'<a href="{href}">{text}</a>')
+        elif element.string and element.string.strip():
+            if element.parent.name != 'a':
+                processed_content.append(element.string.strip())
+    return '\n'.join(processed_content)
+
+
+def best_of(repeat, func):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    content = make_fragment(args.items)
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, url TEXT)')
+    conn.execute('INSERT INTO tasks (id, url) VALUES (1, ?)', (TASK_URL,))
+
+    print(f"片段大小: {len(content) / 1024 / 1024:.2f} MB, 条目: {args.items}")
+    cases = [
+        ('legacy soup.descendants', lambda: legacy_extract(content, conn, 1)),
+        ('extractor', lambda: extractor.extract_text(content, TASK_URL)),
+        ('extractor stream', lambda: extractor.extract_text_stream(
+            extractor.iter_chunks(content), TASK_URL)),
+    ]
+    baseline = None
+    for name, func in cases:
+        elapsed, text = best_of(args.repeat, func)
+        baseline = baseline or elapsed
+        print(f"{name:<26} {elapsed * 1000:9.1f} ms  x{baseline / elapsed:5.1f}  "
+              f"输出 {len(text) / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+"""抓取 → 比对 → 总结全流程的离线基准。
+
+录制的页面（benchmarks/fixtures）由本地 HTTP 服务提供，大模型换成延迟可调的假 Ollama 接口，
+N 个任务走真实的 ScraperScheduler 执行路径（执行队列、引擎、HTTP 抓取、哈希、总结、写库）。
+第一轮全部是新内容，之后每轮按 --mutate-rate 随机让一部分页面新增条目，其余返回 304。
+
+输出吞吐（runs/s）、各阶段 p50/p99（来自 runs.stats 里的阶段耗时）、进程峰值 RSS 和数据库增长，
+结果写成 JSON，可以用 --compare 与另一次的结果比较。
+
+在仓库根目录运行：
+    python -m benchmarks.pipeline [--tasks 200] [--rounds 5] [--llm-latency 0.2]
+    python -m benchmarks.pipeline --compare benchmarks/results/<上一次>.json
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+UPDATE_MARKER = '<!-- omni-bench:updates -->'
+
+# 与基线比较的指标：名称 -> 数值越大越好
+COMPARED = {'runs_per_sec': True, 'peak_rss_mb': False, 'db_growth_mb': False}
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, 'fixtures.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    for fixture in manifest:
+        with open(os.path.join(FIXTURES_DIR, fixture['file']), encoding='utf-8') as f:
+            fixture['html'] = f.read()
+        if UPDATE_MARKER not in fixture['html']:
+            raise ValueError(f"{fixture['file']} 缺少更新标记 {UPDATE_MARKER}")
+    return manifest
+
+
+def render_page(fixture, task, version, page_kb):
+    # version 次更新各在标记处插入一条，最新的在最前面；页面用选择器之外的内容填充到指定大小
+    items = ''.join(
+        fixture['item'].format(n=f'{task}-{n}', day=n % 28 + 1, value=(task * 31 + n * 7) % 1000)
+        for n in range(version, 0, -1)
+    )
+    html = fixture['html'].replace(UPDATE_MARKER, UPDATE_MARKER + items)
+    missing = page_kb * 1024 - len(html.encode('utf-8'))
+    if missing > 0:
+        filler = '<div class="related-links">' + ''.join(
+            f'<a href="/related/{i}.html">相关链接 {i}</a>' for i in range(missing // 48 + 1)
+        ) + '</div>'
+        html = html.replace('</body>', filler + '</body>')
+    return html.encode('utf-8')
+
+
+class BenchHandler(BaseHTTPRequestHandler):
+    # 页面：GET /page/<任务>.html；假大模型：POST /api/generate；控制：POST /_bench/mutate
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        state = self.server.state
+        name = self.path.split('?')[0].rsplit('/', 1)[-1]
+        if not self.path.startswith('/page/') or not name.endswith('.html'):
+            return self._send(404)
+        try:
+            task = int(name[:-5])
+        except ValueError:
+            return self._send(404)
+        version = state['versions'].get(task, 0)
+        etag = f'"{task}-{version}"'
+        state['requests'] += 1
+        if self.headers.get('If-None-Match') == etag:
+            state['not_modified'] += 1
+            return self._send(304, headers={'ETag': etag})
+        fixture = state['fixtures'][task % len(state['fixtures'])]
+        body = render_page(fixture, task, version, state['page_kb'])
+        self._send(200, body, {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag})
+
+    def do_POST(self):
+        state = self.server.state
+        if self.path == '/_bench/mutate':
+            with state['lock']:
+                for task in self._read_json().get('tasks', []):
+                    state['versions'][task] = state['versions'].get(task, 0) + 1
+            return self._send(204)
+        if self.path == '/_bench/stats':
+            body = json.dumps({key: state[key] for key in ('requests', 'not_modified', 'llm_requests')})
+            return self._send(200, body.encode('utf-8'), {'Content-Type': 'application/json'})
+        if self.path != '/api/generate':
+            return self._send(404)
+        prompt = self._read_json().get('prompt', '')
+        with state['lock']:
+            state['llm_requests'] += 1
+        latency = state['llm_latency']
+        if latency > 0:
+            time.sleep(latency * random.uniform(1 - state['llm_jitter'], 1 + state['llm_jitter']))
+        digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).hexdigest()
+        body = json.dumps({
+            'model': 'bench',
+            'response': f'## 基准测试总结 {digest}\n- 输入 {len(prompt)} 字符',
+            'done': True,
+            'prompt_eval_count': len(prompt) // 4,
+            'eval_count': 32,
+        }, ensure_ascii=False).encode('utf-8')
+        self._send(200, body, {'Content-Type': 'application/json'})
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的 backlog 只有 5，并发连接多时 SYN 被丢弃，会凭空多出 1 秒的重传
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭保持的连接是正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(ready, page_kb, llm_latency, llm_jitter):
+    # 在单独的进程里运行，页面渲染和假大模型不计入被测进程的 RSS
+    server = BenchServer(('127.0.0.1', 0), BenchHandler)
+    server.state = {
+        'fixtures': load_fixtures(),
+        'versions': {},
+        'page_kb': page_kb,
+        'llm_latency': llm_latency,
+        'llm_jitter': llm_jitter,
+        'requests': 0,
+        'not_modified': 0,
+        'llm_requests': 0,
+        'lock': threading.Lock(),
+    }
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def post_json(port, path, payload=None):
+    from urllib.request import Request, urlopen
+    request = Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(payload or {}).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'}, method='POST')
+    with urlopen(request, timeout=10) as response:
+        body = response.read()
+    return json.loads(body) if body else None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(max(values) * 1000, 3),
+    }
+
+
+def db_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal', '-shm')
+               if os.path.exists(path + suffix))
+
+
+def row_counts(db):
+    counts = {}
+    with db.connection() as conn:
+        c = conn.cursor()
+        for table in ('results', 'blobs', 'runs', 'summary_cache', 'http_validators'):
+            c.execute(f'SELECT COUNT(*) FROM {table}')
+            counts[table] = c.fetchone()[0]
+    return counts
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(('git',) + args, cwd=ROOT, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {'commit': git('rev-parse', 'HEAD') or None,
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def create_tasks(scheduler, port, count, tier, summary_mode, fixtures):
+    # 返回 [(task_id, url, selector)]；服务端按任务 id 选择录制页面，选择器与之对应
+    tasks = []
+    with scheduler.db.connection() as conn:
+        c = conn.cursor()
+        for _ in range(count):
+            # 不启用定时，只由基准直接提交执行
+            c.execute('''INSERT INTO tasks (url, selector, schedule, active, summary_mode, fetch_tier)
+                        VALUES ('', '', ?, 0, ?, ?)''',
+                      (json.dumps({'days': [], 'time': '00:00'}), summary_mode, tier))
+            task_id = c.lastrowid
+            url = f'http://127.0.0.1:{port}/page/{task_id}.html'
+            selector = fixtures[task_id % len(fixtures)]['selector']
+            c.execute('UPDATE tasks SET url = ?, selector = ? WHERE id = ?', (url, selector, task_id))
+            tasks.append((task_id, url, selector))
+        conn.commit()
+    return tasks
+
+
+def run_round(scheduler, tasks, timeout):
+    # 提交一轮的全部执行并等待完成，返回 (run_id 列表, 失败数)
+    from concurrent.futures import wait
+
+    run_ids, futures = [], []
+    for task_id, url, selector in tasks:
+        run_id, job = scheduler._submit_job(task_id, url, selector, 'benchmark', True, timeout)
+        run_ids.append(run_id)
+        if job is not None:
+            futures.append(job.future)
+    wait(futures, timeout=timeout)
+    errors = sum(1 for future in futures if not future.done() or future.exception() is not None)
+    return run_ids, errors
+
+
+def collect_runs(scheduler, run_ids):
+    stages, totals, statuses, tiers, changed = {}, [], {}, {}, 0
+    with scheduler.db.connection() as conn:
+        c = conn.cursor()
+        for start in range(0, len(run_ids), 500):
+            chunk = run_ids[start:start + 500]
+            c.execute(f'''SELECT status, tier, changed, stats FROM runs
+                         WHERE id IN ({",".join("?" * len(chunk))})''', chunk)
+            for row in c.fetchall():
+                statuses[row['status']] = statuses.get(row['status'], 0) + 1
+                if row['tier']:
+                    tiers[row['tier']] = tiers.get(row['tier'], 0) + 1
+                changed += 1 if row['changed'] else 0
+                trace = json.loads(row['stats'] or '{}').get('trace') or {}
+                if 'total' in trace:
+                    totals.append(trace['total'])
+                for stage, seconds in (trace.get('spans') or {}).items():
+                    stages.setdefault(stage, []).append(seconds)
+    return {
+        'statuses': statuses,
+        'tiers': tiers,
+        'changed': changed,
+        'run': summarize(totals) if totals else None,
+        'stages': {stage: summarize(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def benchmark(args):
+    ready = multiprocessing.get_context('spawn').Queue()
+    server = multiprocessing.get_context('spawn').Process(
+        target=serve, args=(ready, args.page_kb, args.llm_latency, args.llm_jitter), daemon=True)
+    server.start()
+    port = ready.get(timeout=30)
+    workdir = tempfile.mkdtemp(prefix='omni-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+
+    # backend.config 在导入时读取环境变量，必须先设置好
+    os.environ.update({
+        'OMNI_MODE': 'all',
+        'OMNI_DB_PATH': db_path,
+        'OMNI_LLM_ENDPOINT': f'http://127.0.0.1:{port}/api/generate',
+        'OMNI_LLM_CONCURRENCY': str(args.llm_concurrency),
+        'OMNI_ENGINE_CONCURRENCY': str(args.concurrency),
+        # 所有页面都在同一个本地地址上，按域名的并发和限速都放开
+        'OMNI_ENGINE_PER_DOMAIN': str(args.concurrency),
+        'OMNI_ENGINE_MAX_PENDING': str(max(1000, args.tasks * 2)),
+        'OMNI_POLITENESS_RATE': '100000',
+        'OMNI_POLITENESS_BURST': '100000',
+        'OMNI_SCHEDULE_JITTER_SECONDS': '0',
+        'OMNI_COMPACTION_INTERVAL_MINUTES': '0',
+    })
+    sys.path.insert(0, ROOT)
+    from backend.scheduler import ScraperScheduler
+
+    fixtures = load_fixtures()
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scheduler = ScraperScheduler()
+    try:
+        tasks = create_tasks(scheduler, port, args.tasks, args.tier, args.summary_mode, fixtures)
+        task_ids = [task_id for task_id, _, _ in tasks]
+        size_before = db_size(db_path)
+        rows_before = row_counts(scheduler.db)
+        rng = random.Random(args.seed)
+
+        run_ids, rounds, errors = [], [], 0
+        started = time.perf_counter()
+        for number in range(args.rounds):
+            if number:
+                mutated = [task_id for task_id in task_ids if rng.random() < args.mutate_rate]
+                post_json(port, '/_bench/mutate', {'tasks': mutated})
+            round_started = time.perf_counter()
+            ids, failed = run_round(scheduler, tasks, args.timeout)
+            elapsed = time.perf_counter() - round_started
+            run_ids.extend(ids)
+            errors += failed
+            rounds.append({'round': number, 'runs': len(ids), 'seconds': round(elapsed, 3),
+                           'runs_per_sec': round(len(ids) / elapsed, 2) if elapsed else None})
+            print(f"第 {number + 1}/{args.rounds} 轮: {len(ids)} 次执行, {elapsed:.2f} s, "
+                  f"{len(ids) / elapsed:.1f} runs/s")
+        elapsed = time.perf_counter() - started
+
+        runs = collect_runs(scheduler, run_ids)
+        size_after = db_size(db_path)
+        rows_after = row_counts(scheduler.db)
+        server_stats = post_json(port, '/_bench/stats')
+        llm = scheduler.llm_stats()
+    finally:
+        scheduler.shutdown()
+        server.terminate()
+        server.join(5)
+
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'meta': {
+            'benchmark': 'pipeline',
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'git': git_info(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        'runs': len(run_ids),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'runs_per_sec': round(len(run_ids) / elapsed, 2) if elapsed else None,
+        'rounds': rounds,
+        **runs,
+        'peak_rss_mb': round(peak_rss / scale, 1),
+        'rss_before_scheduler_mb': round(rss_start / scale, 1),
+        'db_size_before_mb': round(size_before / 1024 / 1024, 3),
+        'db_size_after_mb': round(size_after / 1024 / 1024, 3),
+        'db_growth_mb': round((size_after - size_before) / 1024 / 1024, 3),
+        'db_rows': {table: rows_after[table] - rows_before[table] for table in rows_after},
+        'server': server_stats,
+        'llm': {key: llm[key] for key in ('requests', 'succeeded', 'failures', 'coalesced', 'avg_latency_ms')},
+    }
+
+
+def compare(current, baseline, threshold, min_ms):
+    """返回 (行, 是否有退化)。吞吐下降或耗时、内存、数据库增长上升超过 threshold 视为退化。
+
+    阶段耗时的绝对变化小于 min_ms 时不算退化，避免亚毫秒级阶段的抖动误报。
+    """
+    rows, regressed = [], False
+
+    def check(name, new, old, higher_is_better, floor=0.0):
+        nonlocal regressed
+        if new is None or old is None:
+            return
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = '退化' if worse > threshold and abs(new - old) >= floor else ''
+        regressed = regressed or bool(flag)
+        rows.append(f"{name:<28} {old:>12.3f} {new:>12.3f} {change * 100:>+8.1f}%  {flag}")
+
+    for name, higher_is_better in COMPARED.items():
+        check(name, current.get(name), baseline.get(name), higher_is_better)
+    for stage, stats in current.get('stages', {}).items():
+        old = baseline.get('stages', {}).get(stage)
+        if old:
+            for key in ('p50_ms', 'p99_ms'):
+                check(f'{stage}.{key}', stats[key], old[key], False, min_ms)
+    return rows, regressed
+
+
+def print_report(result):
+    print(f"\n{result['runs']} 次执行, {result['seconds']:.2f} s, {result['runs_per_sec']} runs/s, "
+          f"失败 {result['errors']}, 内容变化 {result['changed']}")
+    print(f"状态 {result['statuses']}  抓取层 {result['tiers']}")
+    print(f"{'阶段':<20} {'次数':>6} {'p50 ms':>10} {'p99 ms':>10} {'平均 ms':>10}")
+    rows = list(result['stages'].items()) + ([('(整次执行)', result['run'])] if result['run'] else [])
+    for stage, stats in rows:
+        print(f"{stage:<20} {stats['count']:>6} {stats['p50_ms']:>10.2f} {stats['p99_ms']:>10.2f} "
+              f"{stats['mean_ms']:>10.2f}")
+    print(f"峰值 RSS {result['peak_rss_mb']} MB, 数据库增长 {result['db_growth_mb']} MB, "
+          f"新增行 {result['db_rows']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--mutate-rate', type=float, default=0.3, help='第一轮之后每轮内容变化的任务比例')
+    parser.add_argument('--page-kb', type=int, default=64, help='页面填充到的大小')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='假大模型的平均响应时间（秒）')
+    parser.add_argument('--llm-jitter', type=float, default=0.2, help='响应时间的相对抖动')
+    parser.add_argument('--llm-concurrency', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=8, help='引擎并发执行数')
+    parser.add_argument('--tier', choices=('auto', 'http', 'browser'), default='http')
+    parser.add_argument('--summary-mode', choices=('full', 'delta'), default='full')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=600.0, help='每轮等待的最长时间（秒）')
+    parser.add_argument('--output', help='结果 JSON 路径，默认 benchmarks/results/<时间>-<提交>.json')
+    parser.add_argument('--compare', help='与之比较的基线结果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='视为退化的相对变化')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='阶段耗时视为退化的最小绝对变化')
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    print_report(result)
+
+    output = args.output
+    if not output:
+        commit = (result['meta']['git']['commit'] or 'nogit')[:8]
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{stamp}-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressed = compare(result, baseline, args.threshold, args.min_ms)
+        print(f"\n与 {args.compare} 比较（提交 {(baseline['meta']['git'].get('commit') or '?')[:8]}）")
+        print(f"{'指标':<28} {'基线':>12} {'本次':>12} {'变化':>9}")
+        print('\n'.join(rows))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,10 @@ if (!document.querySelector('meta[charset]')) {
 }
 
 let currentSelector = '';
-let pollingInterval = null;  // 用于存储轮询定时器
+let currentCandidates = [];  // 选择器记录的候选选择器，主选择器失效时由后端依次尝试
+let pickerTimeout = null;  // 等待选择器结果的超时定时器
+let pickerSession = null;  // 当前选择会话的 id
+let eventSource = null;  // 服务端推送连接
 
 // 修改API基础URL
 const API_BASE_URL = 'http://localhost:8000';  // 添加这个常量
@@ -29,63 +32,135 @@ async function previewSelector() {
         return;
     }
     
-    if (pollingInterval) {
-        clearInterval(pollingInterval);
+    if (pickerTimeout) {
+        clearTimeout(pickerTimeout);
+    }
+    if (pickerSession) {
+        // 重新选择时关闭上一个窗口
+        fetch(`${API_BASE_URL}/picker/${pickerSession}`, { method: 'DELETE' }).catch(() => {});
+        pickerSession = null;
     }
     
     document.getElementById('selector-display').textContent = '正在选择...';
     currentSelector = '';
+    currentCandidates = [];
     
     try {
         const response = await fetch(`${API_BASE_URL}/preview_selector?url=${encodeURIComponent(url)}`);
         if (!response.ok) {
-            throw new Error('预览失败');
+            throw new Error(response.status === 429 ? '同时打开的选择窗口太多' : '预览失败');
         }
+        const session = await response.json();
+        pickerSession = session.session_id;
         
-        pollingInterval = setInterval(async () => {
-            try {
-                console.log('正在检查选择器...');  // 添加调试日志
-                const selectorResponse = await fetch(`${API_BASE_URL}/get_selector`);
-                const result = await selectorResponse.json();
-                console.log('获取到的结果:', result);  // 添加调试日志
-                
-                if (result.status === 'success' && result.data) {
-                    console.log('成功获取选择器:', result.data);  // 添加调试日志
-                    clearInterval(pollingInterval);
-                    pollingInterval = null;
-                    
-                    currentSelector = result.data.selector;
-                    const selectorDisplay = document.getElementById('selector-display');
-                    selectorDisplay.innerHTML = `选择器: ${result.data.selector}<br>预览内容: ${result.data.preview}`;
-                    console.log('已更新显示');  // 添加调试日志
-                }
-            } catch (error) {
-                console.error('轮询错误:', error);
+        // 选择结果通过 /events 的 selector 事件推送，60秒内没有结果则放弃
+        pickerTimeout = setTimeout(() => {
+            pickerTimeout = null;
+            if (pickerSession) {
+                fetch(`${API_BASE_URL}/picker/${pickerSession}`, { method: 'DELETE' }).catch(() => {});
+                pickerSession = null;
             }
-        }, 1000);
-        
-        // 60秒后停止轮询
-        setTimeout(() => {
-            if (pollingInterval) {
-                console.log('轮询超时');  // 添加调试日志
-                clearInterval(pollingInterval);
-                pollingInterval = null;
-                if (!currentSelector) {
-                    document.getElementById('selector-display').textContent = '未选择';
-                }
+            if (!currentSelector) {
+                document.getElementById('selector-display').textContent = '未选择';
             }
         }, 60000);
         
     } catch (error) {
-        if (pollingInterval) {
-            clearInterval(pollingInterval);
-            pollingInterval = null;
-        }
         document.getElementById('selector-display').textContent = '未选择';
         alert('发生错误：' + error.message);
     }
 }
 
+function handleSelectorEvent(event) {
+    // 只处理本页面打开的会话
+    if (!pickerSession || event.session_id !== pickerSession) {
+        return;
+    }
+    clearTimeout(pickerTimeout);
+    pickerTimeout = null;
+    pickerSession = null;
+    
+    if (event.status === 'success' && event.data) {
+        currentSelector = event.data.selector;
+        currentCandidates = event.data.candidates || [];
+        const selectorDisplay = document.getElementById('selector-display');
+        selectorDisplay.innerHTML = `选择器: ${event.data.selector}<br>预览内容: ${event.data.preview}`;
+    } else {
+        document.getElementById('selector-display').textContent = '未选择';
+    }
+}
+
+function handleRunEvent(event) {
+    const status = document.querySelector(`.task-item[data-task-id="${event.task_id}"] .run-status`);
+    if (!status) {
+        return;
+    }
+    const labels = {queued: '排队中', running: '执行中', succeeded: '已完成', failed: '失败'};
+    status.textContent = event.status === 'running' && event.stage
+        ? `${labels.running} (${event.stage})`
+        : (labels[event.status] || event.status);
+    status.className = `run-status ${event.status}`;
+    status.title = event.error || '';
+}
+
+async function refreshUnreadBadge(taskId) {
+    const button = document.querySelector(`.task-item[data-task-id="${taskId}"] .view-button`);
+    if (!button) {
+        return;
+    }
+    const unread = (await fetchUnreadCounts())[taskId] || 0;
+    let badge = button.querySelector('.unread-badge');
+    if (!unread) {
+        if (badge) {
+            badge.remove();
+        }
+        return;
+    }
+    if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'unread-badge';
+        button.appendChild(badge);
+    }
+    badge.textContent = unread;
+}
+
+function handleResultEvent(event) {
+    // 任务列表里的未读数跟着更新；结果窗口打开时直接刷新，不标记已读
+    refreshUnreadBadge(event.task_id);
+    const dialog = document.querySelector(`.results-dialog[data-task-id="${event.task_id}"]`);
+    if (!dialog) {
+        return;
+    }
+    dialog.remove();
+    document.querySelectorAll('.overlay').forEach(overlay => overlay.remove());
+    viewResults(event.task_id);
+}
+
+// 订阅服务端推送，替代定时轮询；断线后浏览器自动重连并带上 Last-Event-ID
+function connectEvents() {
+    if (eventSource || !window.EventSource) {
+        return;
+    }
+    eventSource = new EventSource(`${API_BASE_URL}/events`);
+    eventSource.addEventListener('task', () => loadTasks());
+    eventSource.addEventListener('run', e => handleRunEvent(JSON.parse(e.data)));
+    eventSource.addEventListener('result', e => handleResultEvent(JSON.parse(e.data)));
+    eventSource.addEventListener('selector', e => handleSelectorEvent(JSON.parse(e.data)));
+    eventSource.onerror = () => console.warn('推送连接中断，正在重连');
+}
+
+function isAdaptiveMode() {
+    return document.querySelector('input[name="schedule-mode"]:checked').value === 'adaptive';
+}
+
+// 自适应调度不需要选择星期和时间
+function toggleScheduleMode() {
+    const adaptive = isAdaptiveMode();
+    document.querySelector('.adaptive-input').hidden = !adaptive;
+    document.querySelector('.weekday-selector').hidden = adaptive;
+    document.querySelector('.time-input').hidden = adaptive;
+}
+
 async function addTask() {
     const url = document.getElementById('url').value;
     const selectorDisplay = document.getElementById('selector-display').textContent;
@@ -99,19 +174,34 @@ async function addTask() {
         selectedDays.push(parseInt(checkbox.value));
     });
     
-    if (!url || selector === '未选择' || !executionTime || selectedDays.length === 0) {
-        alert('请填写完整信息并至少选择一天');
-        return;
+    let schedule;
+    if (isAdaptiveMode()) {
+        const minMinutes = parseInt(document.getElementById('adaptive-min').value);
+        const maxMinutes = parseInt(document.getElementById('adaptive-max').value);
+        if (!url || selector === '未选择' || !(minMinutes >= 1) || !(maxMinutes >= minMinutes)) {
+            alert('请填写完整信息，抓取间隔的上限不能小于下限');
+            return;
+        }
+        schedule = {
+            mode: 'adaptive',
+            min_minutes: minMinutes,
+            max_minutes: maxMinutes
+        };
+    } else {
+        if (!url || selector === '未选择' || !executionTime || selectedDays.length === 0) {
+            alert('请填写完整信息并至少选择一天');
+            return;
+        }
+        
+        // 解析时间
+        const [hour, minute] = executionTime.split(':');
+        
+        schedule = {
+            days: selectedDays,
+            hour: parseInt(hour),
+            minute: parseInt(minute)
+        };
     }
-    
-    // 解析时间
-    const [hour, minute] = executionTime.split(':');
-    
-    const schedule = {
-        days: selectedDays,
-        hour: parseInt(hour),
-        minute: parseInt(minute)
-    };
 
     try {
         const response = await fetch(`${API_BASE_URL}/add_scrape_task`, {
@@ -122,6 +212,7 @@ async function addTask() {
             body: JSON.stringify({
                 url: url,
                 selector: selector,
+                selector_candidates: selector === currentSelector ? currentCandidates : [],
                 schedule: schedule,
                 custom_prompt: customPrompt
             }),
@@ -145,15 +236,41 @@ async function addTask() {
     }
 }
 
+// 按 X-Next-Cursor 逐页读取全部任务；响应带 ETag，浏览器缓存未变化的页
+async function fetchAllTasks() {
+    const tasks = [];
+    let cursor = null;
+    do {
+        const query = cursor ? `?limit=200&cursor=${encodeURIComponent(cursor)}` : '?limit=200';
+        const response = await fetch(`${API_BASE_URL}/tasks${query}`);
+        if (!response.ok) {
+            throw new Error('获取任务列表失败');
+        }
+        tasks.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return tasks;
+}
+
+// 一次请求拿到所有任务的未读数
+async function fetchUnreadCounts() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/tasks/unread`);
+        return response.ok ? await response.json() : {};
+    } catch (error) {
+        console.error('获取未读数失败:', error);
+        return {};
+    }
+}
+
 async function updateTaskList() {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks`);
-        const tasks = await response.json();
+        const [tasks, unread] = await Promise.all([fetchAllTasks(), fetchUnreadCounts()]);
         const taskList = document.getElementById('taskList');
         taskList.innerHTML = '';
         
         tasks.forEach(task => {
-            const li = createTaskElement(task);
+            const li = createTaskElement(task, unread[task.id] || 0);
             taskList.appendChild(li);
         });
     } catch (error) {
@@ -161,9 +278,10 @@ async function updateTaskList() {
     }
 }
 
-function createTaskElement(task) {
+function createTaskElement(task, unread = 0) {
     const li = document.createElement('li');
     li.className = 'task-item';
+    li.dataset.taskId = task.id;
     
     // 使用 textContent 而不是 innerHTML 来避免编码问题
     const taskUrl = document.createElement('div');
@@ -171,19 +289,15 @@ function createTaskElement(task) {
     taskUrl.title = task.url;
     taskUrl.textContent = truncateUrl(task.url);
     
-    const schedule = JSON.parse(task.schedule);
-    const days = ['周日', '周一', '周二', '周三', '周四', '周五', '周六'];
-    const selectedDays = schedule.days.map(d => days[d]).join(', ');
-    const time = `${String(schedule.hour).padStart(2, '0')}:${String(schedule.minute).padStart(2, '0')}`;
-    
     const taskDetails = document.createElement('div');
     taskDetails.className = 'task-details';
     taskDetails.innerHTML = `
-        <span class="schedule">执行时间: ${selectedDays} ${time}</span>
+        <span class="schedule">${formatSchedule(task)}</span>
         <span class="separator">|</span>
         <span class="status ${task.active ? 'active' : 'inactive'}">
             ${task.active ? '监控中' : '已停止'}
         </span>
+        <span class="run-status"></span>
     `;
     
     const taskActions = document.createElement('div');
@@ -192,6 +306,7 @@ function createTaskElement(task) {
         <button onclick="viewResults(${task.id})" class="view-button">
             <span class="icon">📊</span>
             查看结果
+            ${unread ? `<span class="unread-badge">${unread}</span>` : ''}
         </button>
         <button onclick="toggleTask(${task.id}, ${!task.active})" 
                 class="${task.active ? 'stop-button' : 'start-button'}">
@@ -213,11 +328,12 @@ function createTaskElement(task) {
 
 async function viewResults(taskId) {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/tasks/${taskId}/results`);
+        const response = await fetch(`${API_BASE_URL}/api/tasks/${taskId}/results?limit=20`);
         if (!response.ok) {
             throw new Error('获取结果失败');
         }
         const results = await response.json();
+        let nextCursor = response.headers.get('X-Next-Cursor');
         
         const dialog = document.createElement('div');
         dialog.className = 'results-dialog';
@@ -248,26 +364,32 @@ async function viewResults(taskId) {
         if (results.length === 0) {
             content.innerHTML = '<p class="no-results">暂无更新</p>';
         } else {
-            content.innerHTML = results.map(result => {
-                const isError = result.summary && result.summary.includes('爬取失败详情');
-                const summaryClass = isError ? 'result-error' : 'result-summary';
-                
-                // 调整结构，将 readStatus 移到 result-time 后面
-                return `
-                    <div class="result-item ${result.is_new ? 'new-result' : 'read-result'}">
-                        <div class="result-header">
-                            <div class="result-time">${new Date(result.timestamp).toLocaleString()}</div>
-                            ${result.is_new ? '' : '<div class="read-status">已阅读</div>'}
-                        </div>
-                        <div class="${summaryClass}">${result.summary}</div>
-                    </div>
-                `;
-            }).join('');
+            content.innerHTML = renderResults(results);
         }
         
+        // 还有更早的结果时按游标继续加载
+        const moreButton = document.createElement('button');
+        moreButton.className = 'load-more-button';
+        moreButton.textContent = '加载更多';
+        moreButton.style.display = nextCursor ? '' : 'none';
+        moreButton.onclick = async () => {
+            try {
+                const more = await fetch(`${API_BASE_URL}/api/tasks/${taskId}/results?limit=20&cursor=${encodeURIComponent(nextCursor)}`);
+                if (!more.ok) {
+                    throw new Error('获取结果失败');
+                }
+                content.insertAdjacentHTML('beforeend', renderResults(await more.json()));
+                nextCursor = more.headers.get('X-Next-Cursor');
+                moreButton.style.display = nextCursor ? '' : 'none';
+            } catch (error) {
+                alert('获取结果失败: ' + error.message);
+            }
+        };
+        
         dialog.appendChild(closeButton);
         dialog.appendChild(title);
         dialog.appendChild(content);
+        dialog.appendChild(moreButton);
         
         document.body.appendChild(dialog);
         
@@ -281,6 +403,24 @@ async function viewResults(taskId) {
     }
 }
 
+function renderResults(results) {
+    return results.map(result => {
+        const isError = Boolean(result.error) || (result.summary && result.summary.includes('爬取失败详情'));
+        const summaryClass = isError ? 'result-error' : 'result-summary';
+        
+        // 调整结构，将 readStatus 移到 result-time 后面
+        return `
+            <div class="result-item ${result.is_new ? 'new-result' : 'read-result'}">
+                <div class="result-header">
+                    <div class="result-time">${new Date(result.timestamp).toLocaleString()}</div>
+                    ${result.is_new ? '' : '<div class="read-status">已阅读</div>'}
+                </div>
+                <div class="${summaryClass}">${result.summary || result.error || ''}</div>
+            </div>
+        `;
+    }).join('');
+}
+
 // 格式化内容，保留换行和格式
 function formatContent(content) {
     if (!content) return '无内容';
@@ -338,22 +478,22 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
-// 在页面卸载时清除轮询
+// 在页面卸载时关闭推送连接
 window.addEventListener('beforeunload', () => {
-    if (pollingInterval) {
-        clearInterval(pollingInterval);
-        pollingInterval = null;
+    if (pickerTimeout) {
+        clearTimeout(pickerTimeout);
+        pickerTimeout = null;
+    }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
     }
 });
 
 // 加载任务列表
 async function loadTasks() {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks`);
-        if (!response.ok) {
-            throw new Error('获取任务列表失败');
-        }
-        const tasks = await response.json();
+        const [tasks, unread] = await Promise.all([fetchAllTasks(), fetchUnreadCounts()]);
         
         // 添加调试信息
         console.log('获取到的任务数据:', tasks);
@@ -368,7 +508,7 @@ async function loadTasks() {
         taskList.innerHTML = ''; // 清空现有列表
         
         tasks.forEach(task => {
-            const li = createTaskElement(task);
+            const li = createTaskElement(task, unread[task.id] || 0);
             taskList.appendChild(li);
         });
         
@@ -380,6 +520,33 @@ async function loadTasks() {
     }
 }
 
+function formatSchedule(task) {
+    const schedule = JSON.parse(task.schedule);
+    if (schedule.mode === 'adaptive') {
+        let text = '自适应调度';
+        if (task.interval_seconds) {
+            text += `: 当前每 ${formatInterval(task.interval_seconds)}`;
+        }
+        if (task.active && task.next_run_at) {
+            text += `，下次 ${new Date(task.next_run_at * 1000).toLocaleString()}`;
+        }
+        return text;
+    }
+    const days = ['周日', '周一', '周二', '周三', '周四', '周五', '周六'];
+    const selectedDays = schedule.days.map(d => days[d]).join(', ');
+    const time = `${String(schedule.hour).padStart(2, '0')}:${String(schedule.minute).padStart(2, '0')}`;
+    return `执行时间: ${selectedDays} ${time}`;
+}
+
+function formatInterval(seconds) {
+    const minutes = Math.round(seconds / 60);
+    if (minutes < 60) {
+        return `${minutes} 分钟`;
+    }
+    const hours = minutes / 60;
+    return hours < 48 ? `${hours.toFixed(1)} 小时` : `${(hours / 24).toFixed(1)} 天`;
+}
+
 // URL 截断函数
 function truncateUrl(url) {
     try {
@@ -436,8 +603,9 @@ async function deleteTask(taskId) {
     }
 }
 
-// 页面加载完成后自动加载任务列表
+// 页面加载完成后自动加载任务列表，之后的变化由服务端推送
 document.addEventListener('DOMContentLoaded', loadTasks);
+document.addEventListener('DOMContentLoaded', connectEvents);
 
 function handleSelectorInfo(data) {
     if (data && data.selector) {
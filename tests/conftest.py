@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# backend.config 在导入时读取环境变量，必须在导入 backend 之前设置
+_TMP = tempfile.mkdtemp(prefix='omni-test-')
+os.environ['OMNI_DB_PATH'] = os.path.join(_TMP, 'app.db')
+os.environ['OMNI_MODE'] = 'all'
+os.environ['OMNI_COMPACTION_INTERVAL_MINUTES'] = '0'
+os.environ['OMNI_SCHEDULE_JITTER_SECONDS'] = '0'
+# 测试里不让后台线程领取队列中的执行
+os.environ['OMNI_QUEUE_POLL_SECONDS'] = '3600'
+os.environ['OMNI_ADAPTIVE_POLL_SECONDS'] = '3600'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.storage import Database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'test.db'), pool_size=2)
+    database.migrate()
+    yield database
+    database.close()
+
+
+@pytest.fixture(scope='session')
+def scheduler():
+    # 与 API 共用同一个调度器实例
+    from backend.app import scheduler
+    yield scheduler
+    scheduler.shutdown()
+
+
+@pytest.fixture(scope='session')
+def client(scheduler):
+    from fastapi.testclient import TestClient
+    from backend.app import app
+    return TestClient(app)
+
+
+def insert_task(db, schedule, url='https://example.com/list', selector='#main', active=1):
+    import json
+    with db.connection() as conn:
+        c = conn.cursor()
+        c.execute('INSERT INTO tasks (url, selector, schedule, active) VALUES (?, ?, ?, ?)',
+                  (url, selector, json.dumps(schedule), active))
+        conn.commit()
+        return c.lastrowid
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from backend import adaptive
+from backend.adaptive import AdaptiveSchedule
+
+from conftest import insert_task
+
+
+HOUR = 3600
+DEFAULTS = {'min_minutes': 30, 'max_minutes': 1440, 'sampling': 0.5, 'error_backoff': 2.0}
+ADAPTIVE = {'mode': 'adaptive', 'min_minutes': 10, 'max_minutes': 3000}
+
+
+def policy():
+    return AdaptiveSchedule.from_schedule(ADAPTIVE, DEFAULTS)
+
+
+def test_fixed_schedule_is_not_adaptive():
+    assert AdaptiveSchedule.from_schedule({'days': [1], 'hour': 8, 'minute': 0}, DEFAULTS) is None
+
+
+def test_invalid_bounds_are_rejected():
+    for schedule in ({'mode': 'adaptive', 'min_minutes': 0},
+                     {'mode': 'adaptive', 'min_minutes': 60, 'max_minutes': 30},
+                     {'mode': 'adaptive', 'min_minutes': 'x'}):
+        try:
+            AdaptiveSchedule.from_schedule(schedule, DEFAULTS)
+        except ValueError:
+            continue
+        raise AssertionError(f'{schedule} 应该无效')
+
+
+def test_interval_follows_change_rate():
+    now = time.time()
+    p = policy()
+    assert p.interval([], 0, now) == p.min_seconds
+    # 10 小时内变化 2 次：平均 5 小时，取一半
+    assert p.interval([now - 10 * HOUR, now - 5 * HOUR, now - HOUR], 0, now) == 2.5 * HOUR
+    # 很久没有变化的页面拉长到上限
+    assert p.interval([now - 90 * 24 * HOUR], 0, now) == p.max_seconds
+
+
+def test_errors_back_off_and_recovery_resets():
+    now = time.time()
+    p = policy()
+    changes = [now - 6 * HOUR + i * HOUR for i in range(6)]
+    base = p.interval(changes, 0, now)
+    assert p.interval(changes, adaptive.error_streak(True, ['failed']), now) == base * 4
+
+    # 两次失败之后一次没有变化的成功执行：退避清零
+    assert adaptive.error_streak(False, ['failed', 'failed']) == 0
+    assert adaptive.error_streak(True, ['succeeded', 'failed', 'failed']) == 1
+
+
+def test_change_times_skip_errors():
+    rows = [('2026-10-18 10:00:00', 'boom'), ('2026-10-18 08:00:00', None), ('2026-10-18 06:00:00', None)]
+    times = adaptive.change_times(rows)
+    assert len(times) == 2 and times[0] < times[1]
+
+
+def _finish_run(scheduler, run_id, task_id, status, updated_at):
+    with scheduler.db.connection() as conn:
+        conn.execute('INSERT INTO runs (id, task_id, trigger, status, updated_at) VALUES (?, ?, ?, ?, ?)',
+                     (run_id, task_id, 'test', status, updated_at))
+        conn.commit()
+
+
+def test_reschedule_returns_to_base_interval_after_recovery(scheduler):
+    task_id = insert_task(scheduler.db, ADAPTIVE)
+    now = time.time()
+    with scheduler.db.connection() as conn:
+        # 每小时变化一次
+        conn.executemany("INSERT INTO results (task_id, content_hash, timestamp) VALUES (?, ?, datetime(?, 'unixepoch'))",
+                         [(task_id, f'h{i}', int(now - (6 - i) * HOUR)) for i in range(6)])
+        conn.commit()
+    base = scheduler._reschedule(task_id, 'r0', False)
+
+    _finish_run(scheduler, 'r1', task_id, 'failed', now - 30)
+    _finish_run(scheduler, 'r2', task_id, 'failed', now - 20)
+    assert scheduler._reschedule(task_id, 'r3', True) > base
+
+    # 内容没有变化的成功执行不写 results，但结束了连续失败
+    _finish_run(scheduler, 'r3', task_id, 'succeeded', now - 10)
+    assert scheduler._reschedule(task_id, 'r4', False) == pytest.approx(base, rel=1e-3)
+    # 之后再失败两次（r4 和本次）只从成功之后开始计
+    _finish_run(scheduler, 'r4', task_id, 'failed', now - 5)
+    assert scheduler._reschedule(task_id, 'r5', True) == pytest.approx(base * 4, rel=1e-3)
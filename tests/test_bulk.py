@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from backend import bulk
+
+
+CRON = {'days': [0, 1], 'hour': 8, 'minute': 30}
+
+
+def _jsonl(*records):
+    return '\n'.join(json.dumps(record) for record in records)
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'url': 1, 'selector': '#a', 'schedule': CRON}, 'url'),
+    ({'url': 'https://a.example', 'selector': ['#a'], 'schedule': CRON}, 'selector'),
+    ({'url': 'https://a.example', 'selector': '#a', 'schedule': CRON, 'custom_prompt': {'x': 1}},
+     'custom_prompt'),
+    ({'url': 'https://a.example', 'selector': '#a', 'schedule': {**CRON, 'hour': True}}, 'schedule.hour'),
+    ({'url': 'https://a.example', 'selector': '#a', 'schedule': {**CRON, 'days': [False]}}, 'schedule.days'),
+    ({'url': 'ftp://a.example', 'selector': '#a', 'schedule': CRON}, 'url'),
+])
+def test_normalize_rejects_invalid_types(scheduler, record, message):
+    with pytest.raises(bulk.BulkError) as info:
+        bulk.validate([(1, record)], scheduler)
+    assert info.value.errors[0]['line'] == 1
+    assert message in info.value.errors[0]['error']
+
+
+def test_import_reports_errors_per_line(client):
+    body = _jsonl({'url': 'https://a.example', 'selector': '#a', 'schedule': CRON, 'active': False},
+                  {'url': 7, 'selector': '#b', 'schedule': CRON},
+                  {'url': 'https://c.example', 'selector': '#c', 'schedule': {**CRON, 'minute': 60}})
+    response = client.post('/tasks/bulk?format=jsonl', content=body)
+    assert response.status_code == 400
+    assert [error['line'] for error in response.json()['errors']] == [2, 3]
+
+
+def test_import_inserts_consecutive_ids(client):
+    records = [{'url': f'https://{i}.example', 'selector': '#a', 'schedule': CRON, 'active': False,
+                'custom_prompt': 'p' if i % 2 else ''} for i in range(3)]
+    response = client.post('/tasks/bulk?format=jsonl', content=_jsonl(*records))
+    assert response.status_code == 200
+    task_ids = response.json()['task_ids']
+    exported = [json.loads(line) for line in client.get('/tasks/bulk').text.splitlines()]
+    by_id = {record['id']: record for record in exported}
+    assert [by_id[task_id]['url'] for task_id in task_ids] == [r['url'] for r in records]
+    assert [by_id[task_id]['custom_prompt'] for task_id in task_ids] == ['', 'p', '']
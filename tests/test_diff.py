@@ -0,0 +1,41 @@
+from backend import diff
+
+
+def _list(*items):
+    return '<ul>' + ''.join(f'<li>{item}</li>' for item in items) + '</ul>'
+
+
+def test_added_removed_and_modified_items():
+    old = _list('苹果 3 元', '香蕉 2 元', '橙子 5 元')
+    new = _list('苹果 3 元', '香蕉 2.5 元', '西瓜 10 元')
+    delta = diff.diff_fragments(old, new)
+    assert delta['modified'] == [('香蕉 2 元', '香蕉 2.5 元')]
+    assert delta['removed'] == ['橙子 5 元']
+    assert delta['added'] == ['西瓜 10 元']
+
+
+def test_unchanged_items_and_timestamps_are_ignored():
+    old = _list('a', '3 分钟前 更新')
+    new = _list('a', '15 分钟前 更新')
+    assert diff.is_empty(diff.diff_fragments(old, new))
+
+
+def test_links_are_absolute_and_nested_items_use_innermost():
+    content = '<ul><li><ul><li><a href="/x">标题</a> 正文</li></ul></li></ul>'
+    assert diff.extract_items(content, 'https://example.com/list') == [
+        ('标题 正文', '<a href="https://example.com/x">标题</a> 正文')]
+
+
+def test_text_lines_without_items():
+    assert [text for _, text in diff.extract_items('<div>一<br>二</div>')] == ['一', '二']
+
+
+def test_format_delta_sections():
+    text = diff.format_delta({'added': ['新'], 'removed': ['旧'], 'modified': [('原文', '新文')]})
+    assert text.splitlines()[1:] == ['【新增】', '- 新', '【删除】', '- 旧', '【修改】', '- 原：原文', '  现：新文']
+
+
+def test_format_delta_truncates_each_section():
+    delta = {'added': [f'条目 {i}' for i in range(5)], 'removed': [], 'modified': []}
+    lines = diff.format_delta(delta, max_items=2).splitlines()
+    assert lines[1:] == ['【新增】', '- 条目 0', '- 条目 1', '- ……另有 3 条未列出']
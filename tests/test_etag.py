@@ -0,0 +1,44 @@
+from conftest import insert_task
+
+
+def _etag(client, fields=None):
+    response = client.get('/tasks', params={'fields': fields} if fields else None)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def _update(db, sql, params):
+    with db.connection() as conn:
+        conn.execute(sql, params)
+        conn.commit()
+
+
+def test_if_none_match_returns_304(client, scheduler):
+    insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    etag = _etag(client)
+    response = client.get('/tasks', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+
+def test_schedule_bookkeeping_keeps_etag(client, scheduler):
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    etag = _etag(client, 'url,active')
+    _update(scheduler.db, 'UPDATE tasks SET next_run_at = ?, interval_seconds = ? WHERE id = ?',
+            (1.0e9, 600, task_id))
+    assert client.get('/tasks', params={'fields': 'url,active'},
+                      headers={'If-None-Match': etag}).status_code == 304
+    # 请求了调度列时它们的变化要反映在 ETag 上
+    full = _etag(client)
+    _update(scheduler.db, 'UPDATE tasks SET next_run_at = ? WHERE id = ?', (2.0e9, task_id))
+    assert _etag(client) != full
+
+
+def test_user_visible_changes_update_etag(client, scheduler):
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    etag = _etag(client)
+    _update(scheduler.db, 'UPDATE tasks SET summary_mode = ? WHERE id = ?', ('delta', task_id))
+    changed = _etag(client)
+    assert changed != etag
+    _update(scheduler.db, "INSERT INTO results (task_id, content, summary) VALUES (?, '', 'x')", (task_id,))
+    assert _etag(client) != changed
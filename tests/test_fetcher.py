@@ -0,0 +1,16 @@
+from conftest import insert_task
+
+
+def test_delete_task_forgets_http_validators(client, scheduler):
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    fetcher = scheduler.http_fetcher
+    fetcher.remember(task_id, 'https://example.com/list', '"v1"', None)
+    assert fetcher.validators(task_id) == ('"v1"', None)
+    assert client.delete(f'/task/{task_id}').status_code == 200
+    assert fetcher.validators(task_id) == (None, None)
+
+
+def test_remember_without_validators_is_a_no_op(scheduler):
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    scheduler.http_fetcher.remember(task_id, 'https://example.com/list', None, None)
+    assert scheduler.http_fetcher.validators(task_id) == (None, None)
@@ -0,0 +1,28 @@
+import pytest
+
+from backend.fingerprint import content_digest, normalize_text
+
+
+@pytest.mark.parametrize('before, after', [
+    ('营业时间 09:00-18:00', '营业时间 10:00-18:00'),
+    ('订单号 1712345678', '订单号 1712345679'),
+    ('<a href="/item?id=1612345678901">x</a>', '<a href="/item?id=1612345678902">x</a>'),
+])
+def test_real_content_changes_are_kept(before, after):
+    assert content_digest(before) != content_digest(after)
+
+
+@pytest.mark.parametrize('before, after', [
+    ('更新于 2024-05-01 10:00:00', '更新于 2024-05-02 11:30:00'),
+    ('发布时间: 2024/05/01 10:00', '发布时间: 2024/05/01 10:05'),
+    ('Last updated at 10:30 PM', 'Last updated at 11:45 PM'),
+    ('更新：09:12', '更新：09:13'),
+    ('3 分钟前', '15 分钟前'),
+    ('<img src="/a.png?t=1712345678">', '<img src="/a.png?t=1712349999">'),
+])
+def test_timestamps_are_masked(before, after):
+    assert content_digest(before) == content_digest(after)
+
+
+def test_normalize_text_collapses_whitespace():
+    assert normalize_text('  a \n\t b  ') == 'a b'
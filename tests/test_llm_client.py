@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.llm_client import LLMClient, LLMError
+
+
+class StubOllama:
+    """本地的假 /api/generate：按 statuses 依次返回状态码，用完后一直返回 200。"""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.prompts = []
+
+    async def handle(self, request):
+        payload = await request.json()
+        self.prompts.append(payload['prompt'])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0), text='stub error')
+        return web.json_response({'response': f"总结: {payload['prompt']}", 'prompt_eval_count': 3,
+                                  'eval_count': 2})
+
+
+def run_with_stub(stub, scenario, **options):
+    async def main():
+        app = web.Application()
+        app.router.add_post('/api/generate', stub.handle)
+        server = TestServer(app)
+        await server.start_server()
+        client = LLMClient(str(server.make_url('/api/generate')), 'stub-model', **options)
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_success_counts_tokens():
+    stub = StubOllama()
+
+    async def scenario(client):
+        return await client.generate('a'), client.stats()
+
+    result, stats = run_with_stub(stub, scenario)
+    assert result == '总结: a'
+    assert (stats['prompt_tokens'], stats['completion_tokens']) == (3, 2)
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    stub = StubOllama([429, 503])
+
+    async def scenario(client):
+        return await client.generate('a'), client.stats()
+
+    result, stats = run_with_stub(stub, scenario, retries=2, backoff=0.01)
+    assert result == '总结: a'
+    assert len(stub.prompts) == 3
+    assert (stats['retried'], stats['succeeded'], stats['failures']) == (2, 1, 0)
+
+
+def test_gives_up_after_attempt_cap():
+    stub = StubOllama([500, 502, 504, 500])
+    with pytest.raises(LLMError, match='HTTP 504'):
+        run_with_stub(stub, lambda client: client.generate('a'), retries=2, backoff=0.01)
+    assert len(stub.prompts) == 3
+
+
+def test_non_retryable_status_returns_none():
+    stub = StubOllama([400])
+
+    async def scenario(client):
+        return await client.generate('a'), client.stats()
+
+    result, stats = run_with_stub(stub, scenario, retries=2, backoff=0.01)
+    assert result is None
+    assert len(stub.prompts) == 1
+    assert stats['failures'] == 1
+
+
+def test_timeout_is_retried_then_raised():
+    stub = StubOllama(delay=1.0)
+    with pytest.raises(LLMError, match='TimeoutError'):
+        run_with_stub(stub, lambda client: client.generate('a'), timeout=0.1, retries=1, backoff=0.01)
+    assert len(stub.prompts) == 2
+
+
+def test_identical_prompts_in_flight_are_coalesced():
+    stub = StubOllama(delay=0.1)
+
+    async def scenario(client):
+        results = await asyncio.gather(client.generate('a'), client.generate('a'), client.generate('b'))
+        return results, client.stats()
+
+    results, stats = run_with_stub(stub, scenario)
+    assert results == ['总结: a', '总结: a', '总结: b']
+    assert sorted(stub.prompts) == ['a', 'b']
+    assert stats['coalesced'] == 1
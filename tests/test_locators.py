@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from backend import locators
+
+from conftest import insert_task
+
+
+PAGE = '''<html><body>
+<h2>最新价格</h2>
+<table data-testid="prices"><tr><td>苹果</td><td>3 元</td></tr></table>
+<div class="list"><p>第一条</p></div>
+</body></html>'''
+
+CANDIDATES = [
+    {'strategy': 'data', 'selector': 'table[data-testid="prices"]'},
+    {'strategy': 'text', 'selector': 'xpath=//h2[normalize-space()="最新价格"]/following-sibling::table[1]'},
+    {'strategy': 'path', 'selector': 'body > table'},
+]
+
+
+def test_resolution_order_prefers_resolved_then_primary():
+    order = locators.resolution_order('#old', CANDIDATES, resolved=CANDIDATES[1]['selector'])
+    assert order == [CANDIDATES[1]['selector'], '#old', CANDIDATES[0]['selector'], CANDIDATES[2]['selector']]
+    # 去重：上次命中的就是主选择器时只出现一次
+    assert locators.resolution_order('#a', [{'selector': '#a'}], resolved='#a') == ['#a']
+
+
+def test_select_first_falls_back_in_order():
+    html, used = locators.select_first(PAGE, ['#missing', 'td:has-text("x")'] +
+                                       [c['selector'] for c in CANDIDATES])
+    assert used == CANDIDATES[0]['selector']
+    assert '苹果' in html
+
+
+def test_select_first_xpath_candidate_and_miss():
+    html, used = locators.select_first(PAGE, ['#missing', 'xpath=//*[', CANDIDATES[1]['selector']])
+    assert used == CANDIDATES[1]['selector']
+    assert '<td>3 元</td>' in html
+    assert locators.select_first(PAGE, ['#missing', 'xpath=//section']) == (None, None)
+
+
+def test_parse_candidates_normalizes_and_rejects():
+    raw = json.dumps([{'selector': ' #a '}, {'strategy': 'id', 'selector': '#a'}, {'selector': ''}])
+    assert locators.parse_candidates(raw) == [{'strategy': 'path', 'selector': '#a'}]
+    with pytest.raises(ValueError):
+        locators.parse_candidates([{'strategy': 'magic', 'selector': '#a'}])
+
+
+def test_hit_on_candidate_is_promoted(scheduler):
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, selector='#old', active=0)
+    settings = scheduler.get_task_settings(task_id)
+    order = locators.resolution_order('#old', CANDIDATES, settings.get('selector_resolved'))
+    _, used = locators.select_first(PAGE, order)
+    scheduler._remember_selector(task_id, '#old', settings, used)
+    settings = scheduler.get_task_settings(task_id)
+    assert settings['selector_resolved'] == CANDIDATES[0]['selector']
+    # 下一次先试命中的候选
+    assert locators.resolution_order('#old', CANDIDATES, settings['selector_resolved'])[0] == used
+
+
+class FakeLocator:
+    def __init__(self, appears_after):
+        self.appears_after = appears_after
+
+    @property
+    def first(self):
+        return self
+
+    async def wait_for(self, state, timeout):
+        if self.appears_after is None:
+            await asyncio.sleep(timeout / 1000)
+            raise TimeoutError('not found')
+        await asyncio.sleep(self.appears_after)
+
+    async def count(self):
+        return 0 if self.appears_after is None else 1
+
+
+class FakePage:
+    def __init__(self, delays):
+        self.delays = delays
+
+    def locator(self, selector):
+        return FakeLocator(self.delays[selector])
+
+
+def test_locate_fails_fast_to_candidate():
+    page = FakePage({'#old': None, '#new': 0.01})
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        _, used = await locators.locate(page, ['#old', '#new'], timeout=5)
+        return used, loop.time() - started
+
+    used, elapsed = asyncio.run(main())
+    assert used == '#new'
+    assert elapsed < 1
+
+
+def test_locate_raises_when_nothing_matches():
+    page = FakePage({'#a': None})
+    with pytest.raises(locators.ElementNotFound):
+        asyncio.run(locators.locate(page, ['#a'], timeout=0.05))
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def engine(scheduler):
+    # 会话表只在引擎循环里访问，这些接口需要循环在运行；scheduler.shutdown 负责停止
+    scheduler.engine.start()
+    return scheduler.engine
+
+
+def test_get_selector_without_session_keeps_old_shape(client, engine):
+    assert client.get('/get_selector').json() == {'status': 'waiting'}
+
+
+def test_unknown_session_is_404(client, engine):
+    assert client.get('/picker/missing').status_code == 404
+    assert client.get('/get_selector', params={'session_id': 'missing'}).status_code == 404
+
+
+def test_picker_stats_run_on_engine(client, engine):
+    assert client.get('/browser_pool').json()['picker']['active_sessions'] == 0
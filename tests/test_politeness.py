@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.politeness import HostLimiter, parse_retry_after
+
+
+NOW = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('120', 120.0),
+    (' 1.5 ', 1.5),
+    ('-3', 0.0),
+    ('Mon, 01 Jan 2024 12:01:30 GMT', 90.0),
+    ('Mon, 01 Jan 2024 11:00:00 GMT', 0.0),
+    ('', None),
+    (None, None),
+    ('soon', None),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, now=NOW) == expected
+
+
+def test_per_host_interval_after_burst():
+    clock = Clock()
+    limiter = HostLimiter(rate=0.5, burst=2, clock=clock)
+    assert limiter.try_acquire('a.example') == 0
+    assert limiter.try_acquire('a.example') == 0
+    # 令牌用完后按 rate 每 2 秒补一个
+    assert limiter.try_acquire('a.example') == pytest.approx(2.0)
+    # 其他域名互不影响
+    assert limiter.try_acquire('b.example') == 0
+    clock.now += 2.0
+    assert limiter.try_acquire('a.example') == 0
+
+
+def test_overrides_apply_to_subdomains():
+    clock = Clock()
+    limiter = HostLimiter(rate=10, burst=1, overrides={'example.com': {'rate': 0.1, 'burst': 1}}, clock=clock)
+    assert limiter.try_acquire('www.example.com') == 0
+    assert limiter.try_acquire('www.example.com') == pytest.approx(10.0)
+    assert limiter.try_acquire('other.org') == 0
+    assert limiter.try_acquire('other.org') == pytest.approx(0.1)
+
+
+def test_penalize_extends_wait():
+    clock = Clock()
+    limiter = HostLimiter(rate=1, burst=2, clock=clock)
+    limiter.penalize('a.example', 30)
+    assert limiter.try_acquire('a.example') == pytest.approx(30.0)
+    # 更短的惩罚不会缩短已有的暂停
+    limiter.penalize('a.example', 5)
+    clock.now += 10
+    assert limiter.try_acquire('a.example') == pytest.approx(20.0)
+    assert limiter.stats()['paused_hosts'] == {'a.example': 20.0}
+    clock.now += 20
+    assert limiter.try_acquire('a.example') == 0
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from backend import retention
+from backend.blobstore import BlobStore
+from backend.storage import Database
+
+from conftest import insert_task
+
+
+CRON = {'days': [0], 'hour': 8, 'minute': 0}
+
+
+def _result(db, blobs, task_id, timestamp, content=None, error=None):
+    with db.connection() as conn:
+        c = conn.cursor()
+        digest = blobs.put(c, content) if content is not None else None
+        c.execute('''INSERT INTO results (task_id, blob_digest, content_hash, error, timestamp)
+                    VALUES (?, ?, ?, ?, ?)''',
+                  (task_id, digest, 'h' if content is not None else None, error, timestamp))
+        conn.commit()
+        return c.lastrowid
+
+
+def _ids(db, table='results', column='id'):
+    with db.connection() as conn:
+        return {row[0] for row in conn.execute(f'SELECT {column} FROM {table}')}
+
+
+def _set(db, task_id, **columns):
+    with db.connection() as conn:
+        for column, value in columns.items():
+            conn.execute(f'UPDATE tasks SET {column} = ? WHERE id = ?', (value, task_id))
+        conn.commit()
+
+
+@pytest.fixture
+def blobs():
+    return BlobStore()
+
+
+def test_keep_last_keeps_latest_success(db, blobs):
+    task_id = insert_task(db, CRON)
+    success = _result(db, blobs, task_id, '2024-01-01 00:00:00', content='<p>a</p>')
+    errors = [_result(db, blobs, task_id, f'2024-01-0{day} 00:00:00', error='x') for day in (2, 3, 4)]
+    stats = retention.compact(db, blobs, keep_last=2, keep_days=0, runs_days=0)
+    # 最近两条是错误，最近一次成功的结果仍要保留，它引用的 blob 也不能删
+    assert _ids(db) == {success, errors[1], errors[2]}
+    assert stats['results_deleted'] == 1
+    assert stats['blobs_deleted'] == 0
+
+
+def test_keep_days_and_per_task_override(db, blobs):
+    old_task, new_task = insert_task(db, CRON), insert_task(db, CRON)
+    _set(db, old_task, retention_days=30, retention_keep_last=0)
+    stale = _result(db, blobs, old_task, '2000-01-01 00:00:00', content='<p>stale</p>')
+    latest = _result(db, blobs, old_task, '2000-01-02 00:00:00', content='<p>latest</p>')
+    recent = _result(db, blobs, old_task, '2999-01-01 00:00:00', error='x')
+    kept = [_result(db, blobs, new_task, f'2000-01-0{day} 00:00:00', content=f'<p>{day}</p>')
+            for day in (1, 2, 3)]
+    stats = retention.compact(db, blobs, keep_last=100, keep_days=0, runs_days=0)
+    assert _ids(db) == {latest, recent, *kept}
+    assert stale not in _ids(db)
+    # stale 独占的 blob 被清掉，其余仍被引用
+    assert stats['blobs_deleted'] == 1
+    assert len(_ids(db, 'blobs', 'digest')) == 4
+
+
+def test_results_of_deleted_tasks_and_shared_blobs(db, blobs):
+    kept_task, deleted_task = insert_task(db, CRON), insert_task(db, CRON)
+    shared = _result(db, blobs, kept_task, '2024-01-01 00:00:00', content='<p>same</p>')
+    _result(db, blobs, deleted_task, '2024-01-01 00:00:00', content='<p>same</p>')
+    _result(db, blobs, deleted_task, '2024-01-02 00:00:00', content='<p>only</p>')
+    with db.connection() as conn:
+        conn.execute('DELETE FROM tasks WHERE id = ?', (deleted_task,))
+        conn.commit()
+    stats = retention.compact(db, blobs, keep_last=100, keep_days=0, runs_days=0)
+    assert _ids(db) == {shared}
+    assert stats['blobs_deleted'] == 1
+    assert len(_ids(db, 'blobs', 'digest')) == 1
+
+
+def test_orphan_blob_cleanup_waits_for_writer(tmp_path, blobs):
+    db = Database(str(tmp_path / 'race.db'), pool_size=2, timeout=0.2)
+    db.migrate()
+    try:
+        task_id = insert_task(db, CRON)
+        first = _result(db, blobs, task_id, '2024-01-01 00:00:00', content='<p>same</p>')
+        with db.connection() as conn:
+            conn.execute('DELETE FROM results WHERE id = ?', (first,))
+            conn.commit()
+        # 写入方复用了已存在的 blob，但 results 还没提交；这时 blob 在整理看来是孤立的
+        with db.connection() as writer:
+            c = writer.cursor()
+            digest = blobs.put(c, '<p>same</p>')
+            with pytest.raises(sqlite3.OperationalError):
+                retention._drop_orphan_blobs(db)
+            c.execute('INSERT INTO results (task_id, blob_digest, content_hash) VALUES (?, ?, ?)',
+                      (task_id, digest, 'h'))
+            writer.commit()
+        assert retention._drop_orphan_blobs(db) == 0
+        with db.connection() as conn:
+            assert blobs.get(conn.cursor(), digest) == '<p>same</p>'
+    finally:
+        db.close()
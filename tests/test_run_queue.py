@@ -0,0 +1,57 @@
+from backend.run_queue import RunQueue
+
+from conftest import insert_task
+
+
+CRON = {'days': [0], 'hour': 8, 'minute': 0}
+
+
+def _expire(db, run_id):
+    # 模拟持有者退出后租约过期
+    with db.connection() as conn:
+        conn.execute('UPDATE runs SET lease_expires_at = 0 WHERE id = ?', (run_id,))
+        conn.commit()
+
+
+def _run(db, run_id):
+    with db.connection() as conn:
+        return dict(conn.execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone())
+
+
+def test_claimed_run_is_not_claimed_twice(db):
+    a, b = RunQueue(db, owner='a'), RunQueue(db, owner='b')
+    run_id, _ = a.enqueue(insert_task(db, CRON), 'manual')
+    assert [row[0] for row in a.claim_due(10)] == [run_id]
+    assert b.claim_due(10) == []
+
+
+def test_expired_lease_is_reclaimed_by_another_owner(db):
+    a, b = RunQueue(db, owner='a'), RunQueue(db, owner='b')
+    run_id, _ = a.enqueue(insert_task(db, CRON), 'manual')
+    a.claim_due(10)
+    _expire(db, run_id)
+    assert [row[0] for row in b.claim_due(10)] == [run_id]
+    assert _run(db, run_id)['lease_owner'] == 'b'
+    # 原持有者不能再交还别人的租约
+    a.release(run_id)
+    assert _run(db, run_id)['lease_owner'] == 'b'
+
+
+def test_recover_requeues_interrupted_runs_until_max_attempts(db):
+    queue = RunQueue(db, owner='a', max_attempts=2)
+    run_id, _ = queue.enqueue(insert_task(db, CRON), 'manual', claim=True)
+    with db.connection() as conn:
+        conn.execute("UPDATE runs SET status = 'running' WHERE id = ?", (run_id,))
+        conn.commit()
+    _expire(db, run_id)
+    assert queue.recover() == 1
+    run = _run(db, run_id)
+    assert (run['status'], run['lease_owner'], run['attempts']) == ('queued', None, 1)
+
+    queue.claim_due(10)
+    with db.connection() as conn:
+        conn.execute("UPDATE runs SET status = 'running' WHERE id = ?", (run_id,))
+        conn.commit()
+    _expire(db, run_id)
+    assert queue.recover() == 0
+    assert _run(db, run_id)['status'] == 'failed'
@@ -0,0 +1,71 @@
+import sqlite3
+
+from backend.fingerprint import content_digest
+from backend.storage import MIGRATIONS, Database, column_names
+
+
+def _names(c, kind):
+    c.execute('SELECT name FROM sqlite_master WHERE type = ?', (kind,))
+    return {row[0] for row in c.fetchall()}
+
+
+def test_migrations_from_empty_database(db):
+    with db.connection() as conn:
+        c = conn.cursor()
+        assert c.execute('PRAGMA user_version').fetchone()[0] == MIGRATIONS[-1][0]
+        assert c.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert {'tasks', 'results', 'prompts', 'runs', 'summary_cache', 'blobs', 'http_validators',
+                'workers'} <= _names(c, 'table')
+        assert {'idx_results_task_time', 'idx_results_task_new', 'idx_runs_queue',
+                'idx_tasks_next_run'} <= _names(c, 'index')
+        assert {'trg_tasks_version', 'trg_tasks_created'} <= _names(c, 'trigger')
+        assert {'version', 'updated_at', 'selector_candidates', 'next_run_at',
+                'interval_seconds'} <= column_names(c, 'tasks')
+        # 取最新结果走 (task_id, timestamp) 索引，不扫全表
+        plan = ' '.join(row[3] for row in c.execute('''EXPLAIN QUERY PLAN
+            SELECT id FROM results WHERE task_id = ? ORDER BY timestamp DESC LIMIT 1''', (1,)))
+        assert 'idx_results_task_time' in plan
+
+
+def test_migrate_is_idempotent(db):
+    db.migrate()
+    with db.connection() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == MIGRATIONS[-1][0]
+
+
+def test_migrates_legacy_database(tmp_path):
+    # 旧版本 init_database 建出的库：没有 user_version，content_hash 是 Python hash()
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL,
+                    selector TEXT NOT NULL, schedule TEXT NOT NULL, active INTEGER DEFAULT 1)''')
+    conn.execute('''CREATE TABLE results (id INTEGER PRIMARY KEY AUTOINCREMENT, task_id INTEGER,
+                    content TEXT, content_hash TEXT, summary TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, is_new BOOLEAN DEFAULT 1)''')
+    conn.execute("INSERT INTO tasks (url, selector, schedule) VALUES ('https://a.example', '#a', '{}')")
+    conn.execute("INSERT INTO results (task_id, content, content_hash) VALUES (1, '<p>x</p>', '-123')")
+    conn.commit()
+    conn.close()
+
+    db = Database(path, pool_size=1)
+    try:
+        db.migrate()
+        with db.connection() as conn:
+            row = conn.execute('SELECT content_hash FROM results').fetchone()
+            assert row[0] == content_digest('<p>x</p>')
+            task = conn.execute('SELECT version, summary_mode FROM tasks').fetchone()
+            assert tuple(task) == (0, 'full')
+    finally:
+        db.close()
+
+
+def test_last_result_breaks_timestamp_ties_by_id(scheduler):
+    from conftest import insert_task
+    task_id = insert_task(scheduler.db, {'days': [0], 'hour': 8, 'minute': 0}, active=0)
+    with scheduler.db.connection() as conn:
+        # 同一秒内写入的两条结果（重试、手动执行与定时执行重叠）
+        for content_hash in ('first', 'second'):
+            conn.execute('''INSERT INTO results (task_id, content, content_hash, timestamp)
+                            VALUES (?, ?, ?, '2024-01-01 00:00:00')''', (task_id, content_hash, content_hash))
+        conn.commit()
+    assert scheduler._last_result(task_id) == ('second', 'second')
@@ -0,0 +1,65 @@
+import asyncio
+
+from backend.summary_cache import SummaryCache, summary_key
+
+from conftest import insert_task
+
+
+def test_key_covers_text_prompts_and_model():
+    key = summary_key('新闻  标题\n正文', '自定义', '基础', 'model-a')
+    # 只有空白不同的内容共用一个键
+    assert summary_key(' 新闻 标题 正文 ', '自定义', '基础', 'model-a') == key
+    assert summary_key('新闻 标题 正文!', '自定义', '基础', 'model-a') != key
+    assert summary_key('新闻 标题 正文', '其他', '基础', 'model-a') != key
+    assert summary_key('新闻 标题 正文', '自定义', '其他', 'model-a') != key
+    assert summary_key('新闻 标题 正文', '自定义', '基础', 'model-b') != key
+    # 分隔符保证拼接不产生歧义
+    assert summary_key('ab', 'c', '', '') != summary_key('a', 'bc', '', '')
+
+
+def test_get_put_counts_hits_and_misses(db):
+    cache = SummaryCache(db)
+    key = summary_key('内容', '', '基础', 'm')
+    assert cache.get(key) is None
+    cache.put(key, '总结', 'm')
+    cache.put(summary_key('x', '', '', ''), None)
+    assert cache.get(key) == '总结'
+    assert cache.get(key) == '总结'
+    with db.connection() as conn:
+        assert conn.execute('SELECT hits, model FROM summary_cache WHERE key = ?', (key,)).fetchone()[:] == (2, 'm')
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 2, 1)
+
+
+def test_prune_by_size_and_age(db):
+    cache = SummaryCache(db, max_entries=2, max_age_days=30)
+    for i in range(4):
+        cache.put(f'k{i}', f's{i}')
+    with db.connection() as conn:
+        conn.execute("UPDATE summary_cache SET last_used_at = datetime('now', '-60 days') WHERE key = 'k3'")
+        conn.commit()
+    assert cache.prune() == 2
+    with db.connection() as conn:
+        assert {row[0] for row in conn.execute('SELECT key FROM summary_cache')} == {'k1', 'k2'}
+
+
+def test_generate_summary_reuses_cached_summary(scheduler, monkeypatch):
+    calls = []
+
+    async def fake_generate(prompt):
+        calls.append(prompt)
+        return '缓存的总结'
+
+    monkeypatch.setattr(scheduler.llm, 'generate', fake_generate)
+    schedule = {'days': [0], 'hour': 8, 'minute': 0}
+    first = insert_task(scheduler.db, schedule, url='https://a.example/', active=0)
+    second = insert_task(scheduler.db, schedule, url='https://a.example/', active=0)
+    content = '<ul><li>只在缓存测试里出现的条目</li></ul>'
+
+    async def main():
+        return [await scheduler.generate_summary(first, content),
+                await scheduler.generate_summary(second, content)]
+
+    # 不同任务的相同内容只调用一次大模型
+    assert asyncio.run(main()) == ['缓存的总结', '缓存的总结']
+    assert len(calls) == 1